@@ -0,0 +1,153 @@
+"""
+Benchmark of the SQLite access pattern of one chat message: per-call connections vs. the connection pool.
+
+Every simulated message does what a chat handler does: look up the user's thread,
+store the user message, read the history and store the assistant reply. The baseline
+opens a new aiosqlite connection (and background thread) for every call, as the
+repository did before ConnectionPool. The pooled runs use GptThreadRepository, once writing
+every message in its own transaction (synchronous) and once with write-behind group commits, as the bot does.
+
+Usage (from the project root, with the bot's .env in place):
+    PYTHONPATH=src poetry run python benchmarks/db_pool.py --messages 2000 --concurrency 16
+
+Main Components:
+- PerCallRepository: The previous repository behaviour, one connection per call.
+- run_workload: Runs the simulated messages against a repository and returns operations per second.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import aiosqlite
+
+from db.compression import MESSAGE_TEXT_FUNCTION, MessageCodec
+from db.initializer import DatabaseInitializer
+from db.pool import ConnectionPool
+from db.repository import GptThreadRepository
+
+# Repository calls made per simulated chat message
+OPS_PER_MESSAGE = 4
+
+
+class PerCallRepository:
+    """
+    Baseline repository opening a new connection for every call.
+
+    Attributes:
+        _db_path (Path): Path to the SQLite database.
+        _codec (MessageCodec): Decoder registered for the schema's triggers (no compression).
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        Args:
+            db_path (Path): Path to the SQLite database.
+        """
+        self._db_path = db_path
+        self._codec = MessageCodec(db_path, enabled=False)
+
+    async def get_thread_id(self, tg_user_id: int, mode: str) -> Optional[str]:
+        async with aiosqlite.connect(self._db_path) as db:
+            await db.execute("PRAGMA foreign_keys = ON;")
+            cursor = await db.execute(
+                "SELECT openai_thread_id FROM gpt_sessions WHERE tg_user_id = ? AND mode = ?",
+                (tg_user_id, mode)
+            )
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+    async def create_thread(self, tg_user_id: int, mode: str, openai_thread_id: str) -> None:
+        async with aiosqlite.connect(self._db_path) as db:
+            await db.execute("PRAGMA foreign_keys = ON;")
+            await db.execute(
+                "INSERT INTO gpt_sessions (tg_user_id, mode, openai_thread_id) VALUES (?, ?, ?)",
+                (tg_user_id, mode, openai_thread_id)
+            )
+            await db.commit()
+
+    async def add_message(self, openai_thread_id: str, role: str, content: str) -> None:
+        async with aiosqlite.connect(self._db_path) as db:
+            await db.create_function(MESSAGE_TEXT_FUNCTION, 1, self._codec.decode, deterministic=True)
+            await db.execute(
+                "INSERT INTO gpt_messages (openai_thread_id, role, content) VALUES (?, ?, ?)",
+                (openai_thread_id, role, content)
+            )
+            await db.commit()
+
+    async def get_messages(self, openai_thread_id: str) -> List[dict]:
+        async with aiosqlite.connect(self._db_path) as db:
+            cursor = await db.execute(
+                "SELECT role, content FROM gpt_messages WHERE openai_thread_id = ? ORDER BY created_at",
+                (openai_thread_id,)
+            )
+            rows = await cursor.fetchall()
+        return [{"role": row[0], "content": row[1]} for row in rows]
+
+
+async def run_workload(repository, messages: int, users: int, concurrency: int) -> float:
+    """
+    Simulates chat messages from `users` users and measures repository throughput.
+
+    Args:
+        repository: GptThreadRepository or PerCallRepository.
+        messages (int): Number of simulated chat messages.
+        users (int): Number of distinct users (one thread each).
+        concurrency (int): Messages processed at the same time.
+
+    Returns:
+        float: Repository operations per second.
+    """
+    for user_id in range(users):
+        await repository.create_thread(user_id, "gpt", f"thread_{user_id}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handle_message(n: int) -> None:
+        async with semaphore:
+            thread_id = await repository.get_thread_id(n % users, "gpt")
+            await repository.add_message(thread_id, "user", f"Question {n}")
+            await repository.get_messages(thread_id)
+            await repository.add_message(thread_id, "assistant", f"Answer {n} " * 20)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handle_message(n) for n in range(messages)))
+    elapsed = time.perf_counter() - started
+    return messages * OPS_PER_MESSAGE / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--messages", type=int, default=2000, help="simulated chat messages per run")
+    parser.add_argument("--users", type=int, default=200, help="distinct users")
+    parser.add_argument("--concurrency", type=int, default=16, help="messages processed at the same time")
+    parser.add_argument("--pool-size", type=int, default=4, help="connections in the pool")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        per_call_path = Path(tmp) / "per_call.db"
+        DatabaseInitializer(per_call_path).migrate()
+        per_call = await run_workload(PerCallRepository(per_call_path), args.messages, args.users, args.concurrency)
+
+        results = {}
+        for name, synchronous in (("connection pool", True), ("pool + write-behind", False)):
+            db_path = Path(tmp) / f"pooled_{synchronous}.db"
+            DatabaseInitializer(db_path).migrate()
+            pool = ConnectionPool(db_path, size=args.pool_size)
+            repository = GptThreadRepository(pool, synchronous=synchronous)
+            try:
+                results[name] = await run_workload(repository, args.messages, args.users, args.concurrency)
+            finally:
+                await repository.close()
+                await pool.close()
+
+    print(f"{'per-call connections':22}{per_call:10.0f} ops/s")
+    for name, ops in results.items():
+        print(f"{name:22}{ops:10.0f} ops/s  ({ops / per_call:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
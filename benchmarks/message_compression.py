@@ -0,0 +1,195 @@
+"""
+Benchmark of message compression: bytes stored and read latency before and after the online migration.
+
+Each run fills a database with uncompressed messages shaped like the bot's own
+(quiz payloads, resume drafts, chat replies), measures it, compresses the stored rows the
+way the bot's background job does (GptThreadRepository.compress_stored_messages, after
+training a dictionary if requested) and measures again.
+
+Usage (from the project root, with the bot's .env in place):
+    PYTHONPATH=src poetry run python benchmarks/message_compression.py --messages 20000
+
+Main Components:
+- make_corpus: Generates messages resembling the stored history.
+- measure: Reports stored bytes, file size and read latency of a database.
+- run: Fills, measures, migrates and measures one database.
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from db.compression import MessageCodec
+from db.initializer import DatabaseInitializer
+from db.pool import ConnectionPool
+from db.repository import GptThreadRepository
+
+THREADS = 200
+RECENT_MESSAGES = 20
+
+WORDS = (
+    "the a of to and in is for that with on as it be by this are from at an or can which "
+    "when use your you will more data system model time code team project user performance "
+    "design build support manage develop improve process service application network client "
+    "result value history science energy light theory question answer world people language "
+    "quickly often usually important different several simple modern common large small new"
+).split()
+
+HEADINGS = ["Summary", "Experience", "Education", "Skills", "Languages", "Projects", "Contacts"]
+
+
+def sentence(rng: random.Random) -> str:
+    """
+    Returns a random sentence of 6 to 18 common words.
+    """
+    words = rng.choices(WORDS, k=rng.randint(6, 18))
+    return " ".join(words).capitalize() + "."
+
+
+def make_corpus(messages: int, seed: int = 1) -> list[tuple[str, str, str]]:
+    """
+    Generates messages resembling the stored history.
+
+    Args:
+        messages (int): Number of messages.
+        seed (int): Random seed.
+
+    Returns:
+        list[tuple[str, str, str]]: Messages as (thread ID, role, content).
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(messages):
+        thread_id = f"thread_{n % THREADS}"
+        kind = rng.random()
+        if kind < 0.3:
+            options = {letter: sentence(rng)[:40] for letter in "ABCD"}
+            content = (
+                f"question = {sentence(rng)},\noptions = {options},\n"
+                f"correct_answer = {rng.choice('ABCD')}"
+            )
+            role = "assistant"
+        elif kind < 0.4:
+            sections = [
+                f"{heading}:\n" + " ".join(sentence(rng) for _ in range(rng.randint(3, 8)))
+                for heading in HEADINGS
+            ]
+            content = "Resume\n\n" + "\n\n".join(sections)
+            role = "assistant"
+        elif kind < 0.7:
+            content = " ".join(sentence(rng) for _ in range(rng.randint(1, 3)))
+            role = "user"
+        else:
+            content = "\n\n".join(" ".join(sentence(rng) for _ in range(4)) for _ in range(rng.randint(2, 6)))
+            role = "assistant"
+        corpus.append((thread_id, role, content))
+    return corpus
+
+
+async def measure(repository: GptThreadRepository, pool: ConnectionPool) -> dict:
+    """
+    Measures stored bytes, file size and read latency.
+
+    Args:
+        repository (GptThreadRepository): Repository over the database.
+        pool (ConnectionPool): Its connection pool.
+
+    Returns:
+        dict: 'content_bytes', 'file_bytes', 'recent_ms' (mean of get_recent_messages over
+            all threads) and 'scan_ms' (iter_messages over one thread per ten).
+    """
+    await repository.flush()
+    async with pool.acquire() as db:
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        async with db.execute("SELECT SUM(LENGTH(CAST(content AS BLOB))) FROM gpt_messages") as cursor:
+            content_bytes = (await cursor.fetchone())[0]
+        async with db.execute("SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()") as cursor:
+            file_bytes = (await cursor.fetchone())[0]
+
+    started = time.perf_counter()
+    for n in range(THREADS):
+        await repository.get_recent_messages(f"thread_{n}", RECENT_MESSAGES)
+    recent_ms = (time.perf_counter() - started) * 1000 / THREADS
+
+    started = time.perf_counter()
+    for n in range(0, THREADS, 10):
+        async for _ in repository.iter_messages(f"thread_{n}"):
+            pass
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    return {"content_bytes": content_bytes, "file_bytes": file_bytes, "recent_ms": recent_ms, "scan_ms": scan_ms}
+
+
+async def run(
+    db_path: Path,
+    corpus: list[tuple[str, str, str]],
+    dictionary: bool,
+    batch_size: int
+) -> tuple[dict, dict, float]:
+    """
+    Fills a database with uncompressed messages, measures it, compresses it online and measures again.
+
+    Args:
+        db_path (Path): Path of the new database.
+        corpus (list[tuple[str, str, str]]): Messages to store.
+        dictionary (bool): Train a dictionary before compressing.
+        batch_size (int): Messages re-encoded per batch.
+
+    Returns:
+        tuple[dict, dict, float]: Measurements before and after, and migration time in seconds.
+    """
+    DatabaseInitializer(db_path).migrate()
+    codec = MessageCodec(db_path, enabled=False)
+    pool = ConnectionPool(db_path, codec=codec)
+    repository = GptThreadRepository(pool, batch_size=1000)
+    try:
+        for n in range(THREADS):
+            await repository.create_thread(n, "gpt", f"thread_{n}")
+        for thread_id, role, content in corpus:
+            await repository.add_message(thread_id, role, content)
+        before = await measure(repository, pool)
+
+        codec.enabled = True
+        started = time.perf_counter()
+        if dictionary:
+            await repository.train_compression_dictionary()
+        after_id = 0
+        while after_id is not None:
+            after_id = await repository.compress_stored_messages(after_id, batch_size=batch_size)
+        migration_s = time.perf_counter() - started
+
+        async with pool.acquire() as db:
+            await db.execute("VACUUM;")
+        after = await measure(repository, pool)
+    finally:
+        await repository.close()
+        await pool.close()
+    return before, after, migration_s
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--messages", type=int, default=20000, help="stored messages")
+    parser.add_argument("--batch-size", type=int, default=500, help="messages re-encoded per batch")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, dictionary in (("zlib", False), ("zlib + dictionary", True)):
+            results[name] = await run(Path(tmp) / f"{dictionary}.db", corpus, dictionary, args.batch_size)
+
+    before = next(iter(results.values()))[0]
+    print(f"{'':20}{'content':>12}{'file':>12}{'recent':>10}{'scan':>10}{'migration':>11}")
+    print(f"{'uncompressed':20}{before['content_bytes']:12,}{before['file_bytes']:12,}"
+          f"{before['recent_ms']:8.2f}ms{before['scan_ms']:8.1f}ms")
+    for name, (_, after, migration_s) in results.items():
+        print(f"{name:20}{after['content_bytes']:12,}{after['file_bytes']:12,}"
+              f"{after['recent_ms']:8.2f}ms{after['scan_ms']:8.1f}ms{migration_s:10.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
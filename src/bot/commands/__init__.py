@@ -6,3 +6,4 @@ from .talk import talk_conv_handler
 from .quiz import quiz_conv_handler
 from .translate import translate_conv_handler
 from .resume import resume_handler
+from .history import history, history_page
@@ -29,10 +29,10 @@ from telegram.ext import (
 )
 from db.repository import GptThreadRepository
 from db.enums import SessionMode, MessageRole
-from bot.message_sender import send_html_message, send_image_bytes
-from bot.resource_loader import load_message, load_image
-from bot.sanitize_html import sanitize_html
-from services import OpenAIClient
+from bot.message_sender import GuardedTransform, send_html_message, send_intro, send_streamed_message
+from bot.resource_loader import load_message
+from bot.sanitize_html import ABNORMAL_OUTPUT_REPLY, is_abnormal_output, sanitize_html
+from services import OpenAIClient, RequestCancelledError, RequestMergedError
 from settings import config, get_logger
 
 
@@ -59,10 +59,8 @@ async def gpt_intro(update: Update, context: ContextTypes.DEFAULT_TYPE):
         - Displays GPT-specific menu buttons.
     """
     intro = await load_message("gpt")
-    image_bytes = await load_image("gpt")
 
-    await send_image_bytes(update=update, context=context, image_bytes=image_bytes)
-    await send_html_message(update=update, context=context, text=intro)
+    await send_intro(update=update, context=context, image="gpt", text=intro)
 
     return GPT_MESSAGE
 
@@ -86,10 +84,11 @@ async def gpt_handle_user_message(update: Update, context: ContextTypes.DEFAULT_
 
     Returns:
         GPT_MESSAGE (str): state of gpt_conv_handler
+            (ConversationHandler.END if /stop cancelled the reply)
 
     Side Effects:
         - Sets context.user_data["mode"] to SessionMode.GPT.
-        - Sends a message back to the user containing the assistant's reply.
+        - Sends a message back to the user and edits it while the assistant's reply is streamed.
         - Stores both the user message and assistant reply in the SQLite database.
         - Creates a new OpenAI thread if one doesn't exist for the current user and mode.
     """
@@ -104,48 +103,49 @@ async def gpt_handle_user_message(update: Update, context: ContextTypes.DEFAULT_
     tg_user_id = update.effective_user.id
     mode = SessionMode.GPT.value
 
-    thread_id = await thread_repository.get_thread_id(tg_user_id, mode)
-
-    if thread_id is None:
-        thread = await openai_client.create_thread()
-        thread_id = thread.id
-        await thread_repository.create_thread(tg_user_id, mode, thread_id)
+    thread_id = await thread_repository.get_or_create_thread(tg_user_id, mode, openai_client.acquire_thread_id)
 
     # Saving users message in DB
     await thread_repository.add_message(thread_id, role=MessageRole.USER.value, content=user_message)
 
     assistant_id = config.ai_assistant_gpt_mileshkin_id
 
-    # Get response from assistant
+    # Stream the assistant's response to the user as it is generated, hiding it if it turns abnormal
+    guard = GuardedTransform(sanitize_html, is_abnormal_output, ABNORMAL_OUTPUT_REPLY)
     try:
-        reply = await openai_client.ask(
-            assistant_id=assistant_id,
-            thread_id=thread_id,
-            user_message=user_message
+        _, reply = await send_streamed_message(
+            update=update,
+            context=context,
+            chunks=openai_client.ask_stream(
+                assistant_id=assistant_id,
+                thread_id=thread_id,
+                user_message=user_message,
+                mode=mode,
+                tg_user_id=tg_user_id
+            ),
+            transform=guard
         )
+    except RequestMergedError:
+        logger.info("Message merged into a later request in /gpt")
+        return GPT_MESSAGE
+    except RequestCancelledError as e:
+        logger.info("Request cancelled in /gpt")
+        # PTB ignores what /stop returns while this handler is pending, so the chat is ended here
+        return GPT_MESSAGE if e.superseded else ConversationHandler.END
     except OpenAIError as e:
         logger.warning(f"Assistant failed in /gpt: {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
         return GPT_MESSAGE
-
-    reply = sanitize_html(reply)
-
-    if len(reply) > 1000 or any(bad in reply for bad in ["<?", "</", "{%", ">>>", "==", "***", "<script", "###"]):
-        logger.warning("Abnormal model output")
-        await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=reply)
-        reply = "Sorry, something went wrong. Please rephrase your question and try again."
-    else:
-        await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=reply)
-
-
-    # Sending the assistant's response to the user
-    try:
-        await send_html_message(update=update, context=context,text=reply)
     except BadRequest as e:
         logger.warning(f"Error sending HTML message in /gpt: {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
         return GPT_MESSAGE
 
+    if guard.tripped:
+        logger.warning("Abnormal model output")
+
+    await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=sanitize_html(reply))
+
     return GPT_MESSAGE
 
 
@@ -162,8 +162,12 @@ async def gpt_end_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ConversationHandler.END: terminates the gpt_conv_handler
 
     Side Effects:
+        - Cancels the answer still being generated, if any.
         - Sends a message to the user that the chat is over.
     """
+    # Stop the answer still being generated, if any
+    openai_client: OpenAIClient = context.bot_data["openai_client"]
+    await openai_client.cancel_runs(update.effective_user.id, SessionMode.GPT.value)
 
     await send_html_message(
         update=update,
@@ -181,6 +185,7 @@ Entry Points:
 
 States:
 - GPT_MESSAGE: Handles incoming user messages and sends them to the GPT assistant.
+- WAITING: While an answer is generated, /stop ends the chat and a newer message replaces the request.
 
 Fallbacks:
 - /stop command ends the conversation and resets the state.
@@ -189,9 +194,15 @@ gpt_conv_handler = ConversationHandler(
     entry_points=[CommandHandler("gpt", gpt_intro)],
     states={
         GPT_MESSAGE: [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, gpt_handle_user_message),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, gpt_handle_user_message, block=False),
+            CommandHandler("stop", gpt_end_chat)
+        ],
+        ConversationHandler.WAITING: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, gpt_handle_user_message, block=False),
             CommandHandler("stop", gpt_end_chat)
         ]
     },
-    fallbacks=[CommandHandler("stop", gpt_end_chat)]
+    fallbacks=[CommandHandler("stop", gpt_end_chat)],
+    name="gpt",
+    persistent=True
 )
@@ -0,0 +1,147 @@
+"""
+This module implements the /history command: full-text search over the user's stored conversations.
+
+The search runs against the FTS5 index of the message history, covers every mode the user
+has chatted in and never returns other users' messages. Results are shown a page at a time,
+with inline buttons to move between pages.
+
+Main Components:
+- history: Handles /history <query> and shows the first page of results.
+- history_page: Handles the page buttons by editing the results message.
+- render_results: Formats a page of results as HTML.
+"""
+
+import html
+import re
+
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+
+from bot.keyboards import get_history_page_buttons
+from db.repository import GptThreadRepository, HIGHLIGHT_START, HIGHLIGHT_END
+from settings import config, get_logger
+
+
+logger = get_logger(__name__)
+
+
+def render_results(query: str, results: list[dict], page: int) -> str:
+    """
+    Formats a page of search results as Telegram HTML.
+
+    Snippets are reduced to plain text (stored replies may contain escaped HTML)
+    and the matched words are shown in bold.
+
+    Args:
+        query (str): The user's search text.
+        results (list[dict]): Results of GptThreadRepository.search_messages.
+        page (int): Index of the page, starting at 0.
+
+    Returns:
+        str: HTML text of the message.
+    """
+    lines = [f"🔎 Results for <b>{html.escape(query)}</b> · page {page + 1}"]
+    for result in results:
+        snippet = re.sub(r"<[^>]*>", "", html.unescape(result["snippet"]))
+        snippet = html.escape(snippet).replace(HIGHLIGHT_START, "<b>").replace(HIGHLIGHT_END, "</b>")
+        author = "You" if result["role"] == "user" else "Assistant"
+        lines.append(f"\n<i>/{result['mode']} · {author} · {result['created_at']}</i>\n{snippet}")
+    return "\n".join(lines)
+
+
+async def _search_page(
+    context: ContextTypes.DEFAULT_TYPE,
+    tg_user_id: int,
+    query: str,
+    page: int
+) -> tuple[list[dict], bool]:
+    """
+    Reads one page of results, plus one row to know whether a next page exists.
+
+    Args:
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
+        tg_user_id (int): Telegram user ID.
+        query (str): The user's search text.
+        page (int): Index of the page, starting at 0.
+
+    Returns:
+        tuple[list[dict], bool]: The results of the page and whether more results follow.
+    """
+    thread_repository: GptThreadRepository = context.bot_data["thread_repository"]
+    page_size = config.history_page_size
+
+    results = await thread_repository.search_messages(
+        tg_user_id,
+        query,
+        limit=page_size + 1,
+        offset=page * page_size
+    )
+    return results[:page_size], len(results) > page_size
+
+
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles the /history <query> command and shows the best matching messages.
+
+    Args:
+        update (telegram.Update): The incoming update from the Telegram user.
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
+
+    Side Effects:
+        - Stores the query in context.user_data["history_query"] for the page buttons.
+        - Sends the first page of results with page buttons.
+    """
+    query = " ".join(context.args or []).strip()
+    if not query:
+        await update.message.reply_text("Usage: /history <words to search for>")
+        return
+
+    context.user_data["history_query"] = query
+
+    results, has_next = await _search_page(context, update.effective_user.id, query, 0)
+    if not results:
+        await update.message.reply_text("Nothing found in your conversations.")
+        return
+
+    await update.message.reply_text(
+        render_results(query, results, 0),
+        parse_mode=ParseMode.HTML,
+        reply_markup=get_history_page_buttons(0, has_next)
+    )
+
+
+async def history_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles the page buttons of /history results by editing the results message.
+
+    Args:
+        update (telegram.Update): The incoming update from the Telegram user.
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
+
+    Side Effects:
+        - Replaces the results message with the requested page.
+    """
+    callback_query = update.callback_query
+    await callback_query.answer()
+
+    query = context.user_data.get("history_query")
+    if query is None:
+        await callback_query.edit_message_text("This search has expired. Send /history <query> again.")
+        return
+
+    page = int(callback_query.data.split(":", 1)[1])
+    results, has_next = await _search_page(context, update.effective_user.id, query, page)
+    if not results:
+        await callback_query.edit_message_text("No more results.")
+        return
+
+    try:
+        await callback_query.edit_message_text(
+            render_results(query, results, page),
+            parse_mode=ParseMode.HTML,
+            reply_markup=get_history_page_buttons(page, has_next)
+        )
+    except BadRequest as e:
+        logger.warning(f"Error showing /history page {page}: {e}")
@@ -7,13 +7,15 @@ and gets feedback based on their answer. The user's score is tracked during the
 
 Features:
 - Topic selection with inline buttons (science, sport, art, cinema).
-- Questions are dynamically generated by an OpenAI assistant.
+- Questions are served from a pre-generated bank (see bot/quiz_bank.py); an OpenAI assistant
+  generates a question live only when the bank has nothing new for the user.
 - Answers are parsed and checked; scores are updated accordingly.
 - The assistant and conversation threads are managed via SQLite.
 
 Main Components:
 - choose_topic: Sends an introductory message and lets the user choose a quiz topic.
-- get_question: Asks OpenAI to generate a quiz question and parses it to present to the user.
+- generate_question: Asks OpenAI to generate a quiz question when the bank has none left for the user.
+- get_question: Serves the next unseen question from the bank (or generates one) and presents it to the user.
 - handle_answer: Handles the user's answer, checks correctness, and shows the result and score.
 - next_question_quiz: Triggers the next question using the saved topic.
 - change_topic_quiz: Allows the user to choose a new topic.
@@ -29,13 +31,13 @@ from telegram.ext import (
     CommandHandler,
     CallbackQueryHandler
 )
-import re
-from bot.keyboards import get_quiz_choose_topic_button, get_quiz_menu_button
-from bot.message_sender import send_html_message, send_image_bytes
-from bot.resource_loader import load_message, load_image
+from bot.keyboards import keyboards, get_quiz_choose_topic_button, get_quiz_menu_button
+from bot.message_sender import send_html_message, send_intro
+from bot.quiz_bank import QuizBank, parse_quiz_question
+from bot.resource_loader import load_message
 from db.repository import GptThreadRepository
 from db.enums import SessionMode, MessageRole
-from services import OpenAIClient
+from services import OpenAIClient, RequestCancelledError, RequestMergedError
 from settings import config, get_logger
 from .start import start
 
@@ -44,47 +46,6 @@ logger = get_logger(__name__)
 QUIZ_MESSAGE = SessionMode.QUIZ.value
 
 
-def parse_quiz_question(text: str):
-    """
-    Parses the question and answer options from the ChatGPT answer.
-    Expected format:
-
-        Question: <question text>
-
-        A) <option 1>
-        B) <option 2>
-        C) <option 3>
-        D) <option 4>
-
-        Correct Answer: <letter (A, B, C, D)>
-
-    Args:
-        text (str): Raw text from OpenAI containing the quiz question and answer options.
-
-    Returns:
-        tuple[str, dict[str, str], str]:
-            - The question text,
-            - A dictionary of answer options,
-            - The correct answer letter (A, B, C, or D)
-
-    Raises:
-        ValueError: If the response does not contain all required elements.
-    """
-    question_match = re.search(r"Question:\s*(.+)", text, re.IGNORECASE)
-    options_match = re.findall(r"([A-D])\)\s*(.+)", text)
-    correct_answer_match = re.search(r"Correct Answer:\s*([A-D])", text, re.IGNORECASE)
-
-    if not question_match or len(options_match) != 4 or not correct_answer_match:
-        logger.warning(f"\quiz, parse_quiz_question(). Response format is incorrect or missing elements.")
-        raise ValueError("\quiz, parse_quiz_question(). Response format is incorrect or missing elements.")
-
-    question = question_match.group(1).strip()
-    options = {key: value.strip() for key, value in options_match}
-    correct_answer_letter = correct_answer_match.group(1).strip()
-
-    return question, options, correct_answer_letter
-
-
 def update_quiz_score(context: ContextTypes.DEFAULT_TYPE, user_id: int, user_answer: str) -> tuple[bool, int]:
     """
     Compares user's answer with the correct one and updates their score.
@@ -134,59 +95,40 @@ async def choose_topic(update: Update, context: ContextTypes.DEFAULT_TYPE):
         QUIZ_MESSAGE (str): The state where the bot expects topic selection.
     """
     intro = await load_message("quiz")
-    image_bytes = await load_image("quiz")
-
-    await send_image_bytes(update=update, context=context, image_bytes=image_bytes)
-    await send_html_message(update=update, context=context, text=intro)
 
-    await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        text="What topic do you want to get the first question about?",
+    await send_intro(
+        update=update,
+        context=context,
+        image="quiz",
+        text=f"{intro}\n\nWhat topic do you want to get the first question about?",
         reply_markup=get_quiz_choose_topic_button()
     )
 
     return QUIZ_MESSAGE
 
 
-async def get_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def generate_question(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    quiz_topic: str
+) -> tuple[str, dict[str, str], str] | None:
     """
-    Generates a quiz question using the selected topic.
+    Asks OpenAI to generate a quiz question on the topic and parses it.
 
-    Interacts with OpenAI to generate a multiple-choice question,
-    parses it, stores it, and displays it to the user with answer options.
+    Used when the question bank has no unseen question for the user.
 
     Args:
         update (telegram.Update): The incoming update from the Telegram user.
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
+        quiz_topic (str): Selected quiz topic.
 
     Returns:
-        QUIZ_MESSAGE (str): The state where the bot waits for an answer.
+        tuple[str, dict[str, str], str] | None: Question text, answer options and correct answer letter,
+            or None if the assistant failed (the user has already been notified).
 
-    Side Effects:
-        - Sets context.user_data["mode"] to SessionMode.QUIZ.
-        - Dynamically create buttons with answer options.
-        - Send the user buttons with answer options
+    Raises:
+        RequestCancelledError: If the request was cancelled before it was answered.
     """
-    context.user_data["mode"] = None
-    query = update.callback_query
-    quiz_topic = query.data
-
-    await query.answer()
-
-    # Check if the quiz topic has been selected earlier
-    if quiz_topic == "next_question_quiz":
-        quiz_topic = context.user_data.get("quiz_topic", None)
-    else:
-        context.user_data["quiz_topic"] = quiz_topic
-
-    if not quiz_topic:
-        await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text="⚠️ Quiz topic not found. Please select topic again."
-        )
-        return QUIZ_MESSAGE
-
-
     # Connecting the assistant and DB
     openai_client: OpenAIClient = context.bot_data["openai_client"]
     assistant_id = config.ai_assistant_quiz_mileshkin_id
@@ -195,12 +137,7 @@ async def get_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tg_user_id = update.effective_user.id
     mode = SessionMode.QUIZ.value
 
-    thread_id = await thread_repository.get_thread_id(tg_user_id, mode)
-
-    if thread_id is None:
-        thread = await openai_client.create_thread()
-        thread_id = thread.id
-        await thread_repository.create_thread(tg_user_id, mode, thread_id)
+    thread_id = await thread_repository.get_or_create_thread(tg_user_id, mode, openai_client.acquire_thread_id)
 
 
     user_message = f"Generate an interesting mid-level question on the topic: {quiz_topic}"
@@ -210,26 +147,31 @@ async def get_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply = await openai_client.ask(
             assistant_id=assistant_id,
             thread_id=thread_id,
-            user_message=user_message
+            user_message=user_message,
+            mode=mode,
+            tg_user_id=tg_user_id
         )
+    except RequestMergedError:
+        logger.info("Message merged into a later request in /quiz, generate_question()")
+        return None
     except OpenAIError as e:
-        logger.warning(f"Assistant failed to respond in /quiz, get_question(): {e}")
+        logger.warning(f"Assistant failed to respond in /quiz, generate_question(): {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
-        return QUIZ_MESSAGE
+        return None
 
 
     # Parse the question
     try:
         question, options, correct_answer = parse_quiz_question(reply)
     except ValueError as e:
-        logger.warning(f"\quiz, get_question(). OpenAI response is incorrect. Parsing error: {e}\nResponse from OpenAI:\n{reply}")
+        logger.warning(f"\quiz, generate_question(). OpenAI response is incorrect. Parsing error: {e}\nResponse from OpenAI:\n{reply}")
         print(f"❌ Parsing error: {e}")
         print(f"🔍 Response from OpenAI:\n{reply}")
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text=f"⚠️ Error processing question. Try again.\n\n{e}"
         )
-        return QUIZ_MESSAGE
+        return None
 
 
     # Save the question, options and correct answer in DB
@@ -239,6 +181,75 @@ async def get_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
         content=f"question = {question},\noptions = {options},\ncorrect_answer = {correct_answer}"
     )
 
+    return question, options, correct_answer
+
+
+async def get_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Shows the next quiz question on the selected topic.
+
+    Takes the next question the user has not seen from the question bank
+    (or generates one if there is none) and displays it with answer options.
+    If the topic's stock is low, a background refill is scheduled on the JobQueue.
+
+    Args:
+        update (telegram.Update): The incoming update from the Telegram user.
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
+
+    Returns:
+        QUIZ_MESSAGE (str): The state where the bot waits for an answer,
+            or ConversationHandler.END if the quiz was ended while a question was generated.
+
+    Side Effects:
+        - Sets context.user_data["mode"] to SessionMode.QUIZ.
+        - Dynamically create buttons with answer options.
+        - Send the user buttons with answer options
+    """
+    context.user_data["mode"] = None
+    query = update.callback_query
+    quiz_topic = query.data
+
+    await query.answer()
+
+    # Check if the quiz topic has been selected earlier
+    if quiz_topic == "next_question_quiz":
+        quiz_topic = context.user_data.get("quiz_topic", None)
+    else:
+        context.user_data["quiz_topic"] = quiz_topic
+
+    if not quiz_topic:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="⚠️ Quiz topic not found. Please select topic again."
+        )
+        return QUIZ_MESSAGE
+
+
+    quiz_bank: QuizBank = context.bot_data["quiz_bank"]
+    tg_user_id = update.effective_user.id
+
+    # Serve the next unseen question from the bank
+    stored = await quiz_bank.next_question(tg_user_id, quiz_topic)
+
+    if stored is not None:
+        question, options, correct_answer = stored["question"], stored["options"], stored["correct_answer"]
+    else:
+        # The user has seen every stored question: generate one live
+        try:
+            generated = await generate_question(update, context, quiz_topic)
+        except RequestCancelledError as e:
+            logger.info("Request cancelled in /quiz, get_question()")
+            # PTB ignores what end_quiz returns while this handler is pending, so the quiz is ended here
+            return QUIZ_MESSAGE if e.superseded else ConversationHandler.END
+        if generated is None:
+            return QUIZ_MESSAGE
+        question, options, correct_answer = generated
+        await quiz_bank.add_served_question(tg_user_id, quiz_topic, generated)
+
+    # Refill the topic in the background if its stock is low
+    if await quiz_bank.needs_top_up(quiz_topic):
+        context.job_queue.run_once(quiz_bank.top_up_job, when=0, data=quiz_topic)
+
     context.user_data["correct_answer"] = correct_answer
 
     # Create buttons with answer options
@@ -339,12 +350,17 @@ async def end_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
 
     Returns:
-        The start command handler to display the main menu.
+        ConversationHandler.END: Terminates the quiz_conv_handler.
     """
     query = update.callback_query
     await query.answer()
 
-    return await start(update, context)
+    # Stop the answer still being generated, if any
+    openai_client: OpenAIClient = context.bot_data["openai_client"]
+    await openai_client.cancel_runs(update.effective_user.id, SessionMode.QUIZ.value)
+
+    await start(update, context)
+    return ConversationHandler.END
 
 
 """
@@ -362,6 +378,7 @@ Entry points:
     
 States:
     QUIZ_MESSAGE: Handles quiz interaction steps based on callbacks.
+    WAITING: While a question is generated, completing the quiz cancels the request.
 
 Fallbacks:
     - Restart quiz or return to main menu via callbacks.
@@ -372,16 +389,21 @@ quiz_conv_handler = ConversationHandler(
     ],
     states={
         QUIZ_MESSAGE: [
-            CallbackQueryHandler(get_question, pattern="^(science|sport|art|cinema)$"),
+            CallbackQueryHandler(get_question, pattern=keyboards.pattern("quiz_topic"), block=False),
             CallbackQueryHandler(handle_answer, pattern="^[ABCD]$"),
-            CallbackQueryHandler(next_question_quiz, pattern="^next_question_quiz$"),
+            CallbackQueryHandler(next_question_quiz, pattern="^next_question_quiz$", block=False),
             CallbackQueryHandler(change_topic_quiz, pattern="^change_topic_quiz$"),
             CallbackQueryHandler(end_quiz, pattern="^end_quiz$")
+        ],
+        ConversationHandler.WAITING: [
+            CallbackQueryHandler(end_quiz, pattern="^(end_quiz|start)$")
         ]
     },
     fallbacks=[
         CallbackQueryHandler(end_quiz, pattern="^(start)$"),
         CallbackQueryHandler(next_question_quiz, pattern="^(get_question)$"),
         CallbackQueryHandler(change_topic_quiz, pattern="^(choose_topic)$")
-    ]
+    ],
+    name="quiz",
+    persistent=True
 )
\ No newline at end of file
@@ -3,45 +3,33 @@ from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 from openai import OpenAIError
 
-from bot.message_sender import send_html_message, send_image_bytes
-from bot.resource_loader import load_message, load_image
+from bot.fact_pool import FACT_PROMPT, FactPool
+from bot.message_sender import send_html_message, send_image, send_intro
+from bot.resource_loader import load_message
 from bot.keyboards import get_random_menu_button
 from bot.sanitize_html import sanitize_html
 from db.repository import GptThreadRepository
 from db.enums import SessionMode, MessageRole
-from services import OpenAIClient
+from services import OpenAIClient, RequestCancelledError, RequestMergedError
 from settings import config, get_logger
 
 logger = get_logger(__name__)
 
 
-async def random(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def ask_fact(update: Update, context: ContextTypes.DEFAULT_TYPE) -> str | None:
     """
-    Handles the /random command to fetch a surprising technical fact.
+    Asks the assistant for a fact in the user's random-mode thread.
 
-    Ensures the user has a dedicated OpenAI thread for the random mode.
-    Sends a technical trivia fact using the assistant, formats the response, and logs it to the database.
+    Used when the fact pool has nothing new for the user.
 
     Args:
         update (telegram.Update): The incoming update from the Telegram user.
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
 
-    Raises:
-        openai.OpenAIError: If the assistant fails to respond or run the completion.
-
-    Side Effects:
-        - Resets context.user_data["mode"] to None.
-        - Sends a formatted fact as an HTML message and image.
-        - Records the user message and assistant reply in the database.
-        - Creates a new OpenAI thread if one doesn't exist.
+    Returns:
+        str | None: The assistant's reply, or None if there is nothing to show
+            (the user has already been notified or the request was merged).
     """
-    context.user_data["mode"] = None
-
-    intro = await load_message("random")
-    image_bytes = await load_image("random")
-
-    await send_image_bytes(update=update, context=context, image_bytes=image_bytes)
-
     # Connecting the assistant and DB
     openai_client: OpenAIClient = context.bot_data["openai_client"]
     thread_repository: GptThreadRepository = context.bot_data["thread_repository"]
@@ -49,14 +37,9 @@ async def random(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tg_user_id = update.effective_user.id
     mode = SessionMode.RANDOM.value
 
-    thread_id = await thread_repository.get_thread_id(tg_user_id, mode)
-
-    if thread_id is None:
-        thread = await openai_client.create_thread()
-        thread_id = thread.id
-        await thread_repository.create_thread(tg_user_id, mode, thread_id)
+    thread_id = await thread_repository.get_or_create_thread(tg_user_id, mode, openai_client.acquire_thread_id)
 
-    user_message = "Give me a random interesting technical fact."
+    user_message = FACT_PROMPT
 
     # Saving users message in DB
     await thread_repository.add_message(thread_id, role=MessageRole.USER.value, content=user_message)
@@ -68,29 +51,94 @@ async def random(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply = await openai_client.ask(
             assistant_id=assistant_id,
             thread_id=thread_id,
-            user_message=user_message
+            user_message=user_message,
+            mode=mode,
+            tg_user_id=tg_user_id
         )
+    except RequestMergedError:
+        logger.info("Message merged into a later request in /random")
+        return None
+    except RequestCancelledError:
+        logger.info("Request cancelled in /random")
+        return None
     except OpenAIError as e:
         logger.warning(f"Assistant failed in /random: {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
-        return
-
-    reply = sanitize_html(reply)
+        return None
 
     # Saving assistants message in DB
-    await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=reply)
+    await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=sanitize_html(reply))
+
+    return reply
 
-    combined = f"{intro}\n\n{reply}"
 
-    # Sending the assistant's response to the user
+async def random(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles the /random command to fetch a surprising technical fact.
+
+    Takes a prefetched fact the user has not seen recently from the fact pool.
+    If the pool has none, ensures the user has a dedicated OpenAI thread for the random mode,
+    gets a fact from the assistant and logs it to the database.
+
+    Args:
+        update (telegram.Update): The incoming update from the Telegram user.
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
+
+    Raises:
+        openai.OpenAIError: If the assistant fails to respond or run the completion.
+
+    Side Effects:
+        - Resets context.user_data["mode"] to None.
+        - Sends the image with the formatted fact and the menu as its caption (a prefetched fact),
+          or the image first and then the fact (a pool miss).
+        - Records the user message and assistant reply in the database (pool misses only).
+        - Creates a new OpenAI thread if one doesn't exist (pool misses only).
+    """
+    context.user_data["mode"] = None
+
+    intro = await load_message("random")
+
+    fact_pool: FactPool = context.bot_data["fact_pool"]
+    tg_user_id = update.effective_user.id
+
+    # Serve a prefetched fact; fall back to the assistant if the pool has nothing new
+    reply = fact_pool.take(tg_user_id)
+    prefetched = reply is not None
+
+    if not prefetched:
+        # The image shows right away while the assistant is working
+        await send_image(update=update, context=context, name="random")
+        reply = await ask_fact(update, context)
+        if reply is None:
+            return
+        fact_pool.remember(tg_user_id, reply)
+
+    reply = sanitize_html(reply)
+
+    combined = f"{intro}\n\n{reply}\n\nChoose your next step:"
+
+    # Sending the assistant's response to the user, with the image if not sent yet
     try:
-        await send_html_message(update=update, context=context, text=combined)
+        if prefetched:
+            await send_intro(
+                update=update,
+                context=context,
+                image="random",
+                text=combined,
+                reply_markup=get_random_menu_button()
+            )
+        else:
+            await send_html_message(
+                update=update,
+                context=context,
+                text=combined,
+                reply_markup=get_random_menu_button()
+            )
     except BadRequest as e:
         logger.warning(f"Error sending HTML message in /random: {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
-
-    await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        text="Choose your next step:",
-        reply_markup=get_random_menu_button()
-    )
\ No newline at end of file
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="Choose your next step:",
+            reply_markup=get_random_menu_button()
+        )
\ No newline at end of file
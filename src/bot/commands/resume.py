@@ -25,14 +25,14 @@ from telegram.ext import (
     MessageHandler,
     filters
 )
-from bot.message_sender import send_html_message, send_image_bytes
-from bot.resource_loader import load_message, load_image
-from bot.keyboards import get_resume_button, get_resume_format_file_button, get_resume_format_file_button_end
+from bot.message_sender import send_html_message, send_intro
+from bot.resource_loader import load_message
+from bot.keyboards import keyboards, get_resume_button, get_resume_format_file_button, get_resume_format_file_button_end
 from bot.sanitize_html import sanitize_html
 from bot.file_converter import convert_to_file
 from db.repository import GptThreadRepository
 from db.enums import SessionMode, MessageRole
-from services import OpenAIClient
+from services import OpenAIClient, RequestCancelledError, RequestMergedError
 from settings import config, get_logger
 from .start import start
 
@@ -63,11 +63,13 @@ async def get_position(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
 
     intro = await load_message("resume")
-    image_bytes = await load_image("resume")
 
-    await send_image_bytes(update=update, context=context, image_bytes=image_bytes)
-    await send_html_message(update=update, context=context, text=f"{intro}")
-    await send_html_message(update=update, context=context, text=f"\n\nWrite what <b>position</b> you are applying for:")
+    await send_intro(
+        update=update,
+        context=context,
+        image="resume",
+        text=f"{intro}\n\nWrite what <b>position</b> you are applying for:"
+    )
 
     return POSITION
 
@@ -256,7 +258,8 @@ async def generate_resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object.
 
     Returns:
-        FORMAT_FILE (str): State to handle file format selection.
+        FORMAT_FILE (str): State to handle file format selection
+            (ConversationHandler.END if the resume flow was ended while the resume was generated).
     """
 
     context.user_data["mode"] = None
@@ -271,12 +274,7 @@ async def generate_resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tg_user_id = update.effective_user.id
     mode = SessionMode.RESUME.value
 
-    thread_id = await thread_repository.get_thread_id(tg_user_id, mode)
-
-    if thread_id is None:
-        thread = await openai_client.create_thread()
-        thread_id = thread.id
-        await thread_repository.create_thread(tg_user_id, mode, thread_id)
+    thread_id = await thread_repository.get_or_create_thread(tg_user_id, mode, openai_client.acquire_thread_id)
 
 
     edit_user_data = context.user_data
@@ -291,8 +289,17 @@ async def generate_resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply = await openai_client.ask(
             assistant_id=assistant_id,
             thread_id=thread_id,
-            user_message=user_message
+            user_message=user_message,
+            mode=mode,
+            tg_user_id=tg_user_id
         )
+    except RequestMergedError:
+        logger.info("Message merged into a later request in /resume, generate_resume()")
+        return FORMAT_FILE
+    except RequestCancelledError as e:
+        logger.info("Request cancelled in /resume, generate_resume()")
+        # PTB ignores what end_resume returns while this handler is pending, so the resume flow is ended here
+        return FORMAT_FILE if e.superseded else ConversationHandler.END
     except OpenAIError as e:
         logger.warning(f"Assistant failed to respond in /resume, generate_resume(): {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
@@ -376,13 +383,18 @@ async def end_resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object.
 
     Returns:
-        Command start() output.
+        ConversationHandler.END: Terminates the resume_handler.
     """
+    # Stop the answer still being generated, if any
+    openai_client: OpenAIClient = context.bot_data["openai_client"]
+    await openai_client.cancel_runs(update.effective_user.id, SessionMode.RESUME.value)
 
     query = update.callback_query
-    await query.answer()
+    if query:
+        await query.answer()
 
-    return await start(update, context)
+    await start(update, context)
+    return ConversationHandler.END
 
 
 """
@@ -401,6 +413,7 @@ States:
     POSITION → ADDITIONAL_INFORMATION: Collects resume data step-by-step
     CONFIRM: Shows summary and awaits confirmation or editing
     FORMAT_FILE: Converts text into file and offers re-download
+    WAITING: While the resume is generated, /stop or the main menu button cancels it
 
 Fallbacks:
     - None
@@ -416,16 +429,21 @@ resume_handler = ConversationHandler(
         SKILLS: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_additional_information)],
         ADDITIONAL_INFORMATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, confirm_data)],
         CONFIRM: [
-            CallbackQueryHandler(generate_resume, pattern="^confirm$"),
+            CallbackQueryHandler(generate_resume, pattern="^confirm$", block=False),
             CallbackQueryHandler(finalize_resume, pattern="^edit$")
         ],
         FORMAT_FILE: [
-            CallbackQueryHandler(convert_text_to_file, pattern="^PDF$"),
-            CallbackQueryHandler(convert_text_to_file, pattern="^DOCX$"),
+            CallbackQueryHandler(convert_text_to_file, pattern=keyboards.pattern("resume_format")),
             CallbackQueryHandler(start, pattern="^complete$")
+        ],
+        ConversationHandler.WAITING: [
+            CommandHandler("stop", end_resume),
+            CallbackQueryHandler(end_resume, pattern="^start$")
         ]
     },
-    fallbacks=[]
+    fallbacks=[],
+    name="resume",
+    persistent=True
 )
 
 
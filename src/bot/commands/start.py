@@ -1,7 +1,8 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-from bot.message_sender import send_html_message, send_image_bytes, show_menu
-from bot.resource_loader import load_message, load_image, load_menu
+from bot.message_sender import send_intro, show_menu
+from bot.resource_loader import load_message, load_menu
+from services import OpenAIClient
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -9,7 +10,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Handles the /start command and displays the main menu.
 
     Loads and sends the main welcome message, image, and keyboard with available bot commands.
-    Also resets the user's current session mode.
+    Also resets the user's current session mode and cancels answers still being generated in any mode.
 
     Args:
         update (telegram.Update): The incoming update from the Telegram user.
@@ -19,11 +20,13 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         - Sends a welcome image and message.
         - Displays a button-based menu to the user.
         - Resets context.user_data["mode"] to None.
+        - Cancels the user's OpenAI requests in flight.
     """
+    openai_client: OpenAIClient = context.bot_data["openai_client"]
+    await openai_client.cancel_runs(update.effective_user.id)
+
     text = await load_message("main")
-    image_bytes = await load_image("main")
     menu_commands = await load_menu("main")
 
-    await send_image_bytes(update=update, context=context, image_bytes=image_bytes)
-    await send_html_message(update=update, context=context, text=text)
+    await send_intro(update=update, context=context, image="main", text=text)
     await show_menu(update=update, context=context, commands=menu_commands)
\ No newline at end of file
@@ -29,13 +29,13 @@ from telegram.ext import (
     CallbackQueryHandler,
     filters
 )
-from bot.keyboards import get_talk_menu_button, get_end_chat_button
-from bot.message_sender import send_html_message, send_image_bytes
-from bot.resource_loader import load_message, load_image
-from bot.sanitize_html import sanitize_html
+from bot.keyboards import keyboards, get_talk_menu_button, get_end_chat_button
+from bot.message_sender import GuardedTransform, send_html_message, send_intro, send_streamed_message
+from bot.resource_loader import load_message
+from bot.sanitize_html import ABNORMAL_OUTPUT_REPLY, is_abnormal_output, sanitize_html
 from db.repository import GptThreadRepository
 from db.enums import SessionMode, MessageRole
-from services import OpenAIClient
+from services import OpenAIClient, RequestCancelledError, RequestMergedError
 from settings import config, get_logger
 from .start import start
 
@@ -58,14 +58,12 @@ async def choose_personality(update: Update, context: ContextTypes.DEFAULT_TYPE)
         CHOOSE_PERSONALITY (str): The state where the bot expects a personality selection.
     """
     intro = await load_message("talk")
-    image_bytes = await load_image("talk")
 
-    await send_image_bytes(update=update, context=context, image_bytes=image_bytes)
-    await send_html_message(update=update, context=context, text=intro)
-
-    await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        text="Who would you like to ask a question?",
+    await send_intro(
+        update=update,
+        context=context,
+        image="talk",
+        text=f"{intro}\n\nWho would you like to ask a question?",
         reply_markup=get_talk_menu_button()
     )
     return CHOOSE_PERSONALITY
@@ -117,15 +115,16 @@ async def chat_with_personality(update: Update, context: ContextTypes.DEFAULT_TY
     """
     Handles user messages and sends them to the selected assistant.
 
-    Fetches or creates an OpenAI thread, stores the user's message, and gets a response
-    from the corresponding assistant. The assistant's response is also saved and sent.
+    Fetches or creates an OpenAI thread, stores the user's message, and streams a response
+    from the corresponding assistant. The assistant's response is also saved.
 
     Args:
         update (telegram.Update): The incoming update from the Telegram user.
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
 
     Returns:
-        TALK_MESSAGE (str): Keeps the conversation ongoing in this state.
+        TALK_MESSAGE (str): Keeps the conversation ongoing in this state
+            (ConversationHandler.END if the chat was ended while the reply was generated).
 
     Raises:
         OpenAIError: If the assistant fails to respond.
@@ -142,12 +141,7 @@ async def chat_with_personality(update: Update, context: ContextTypes.DEFAULT_TY
     tg_user_id = update.effective_user.id
     mode = SessionMode.TALK.value
 
-    thread_id = await thread_repository.get_thread_id(tg_user_id, mode)
-
-    if thread_id is None:
-        thread = await openai_client.create_thread()
-        thread_id = thread.id
-        await thread_repository.create_thread(tg_user_id, mode, thread_id)
+    thread_id = await thread_repository.get_or_create_thread(tg_user_id, mode, openai_client.acquire_thread_id)
 
     # Saving users message in DB
     await thread_repository.add_message(thread_id, role=MessageRole.USER.value, content=user_message)
@@ -156,35 +150,42 @@ async def chat_with_personality(update: Update, context: ContextTypes.DEFAULT_TY
     attribute_name = f"ai_assistant_talk_{personality}_mileshkin_id"
     assistant_id = getattr(config, attribute_name)
 
-    # Get response from assistant
+    # Stream the assistant's response to the user as it is generated, hiding it if it turns abnormal
+    guard = GuardedTransform(sanitize_html, is_abnormal_output, ABNORMAL_OUTPUT_REPLY)
     try:
-        reply = await openai_client.ask(
-            assistant_id=assistant_id,
-            thread_id=thread_id,
-            user_message=user_message
+        _, reply = await send_streamed_message(
+            update=update,
+            context=context,
+            chunks=openai_client.ask_stream(
+                assistant_id=assistant_id,
+                thread_id=thread_id,
+                user_message=user_message,
+                mode=mode,
+                tg_user_id=tg_user_id
+            ),
+            transform=guard
         )
+    except RequestMergedError:
+        logger.info("Message merged into a later request in /talk")
+        return TALK_MESSAGE
+    except RequestCancelledError as e:
+        logger.info("Request cancelled in /talk")
+        # PTB ignores what end_chat returns while this handler is pending, so the chat is ended here
+        return TALK_MESSAGE if e.superseded else ConversationHandler.END
     except OpenAIError as e:
         logger.warning(f"Assistant failed in /talk: {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
         return TALK_MESSAGE
-
-    reply = sanitize_html(reply)
-
-    if len(reply) > 1000 or any(bad in reply for bad in ["<?", "</", "{%", ">>>", "==", "***", "<script", "###"]):
-        logger.warning("Abnormal model output")
-        await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=reply)
-        reply = "Sorry, something went wrong. Please rephrase your question and try again."
-    else:
-        await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=reply)
-
-    # Sending the assistant's response to the user
-    try:
-        await send_html_message(update, context, reply)
     except BadRequest as e:
         logger.warning(f"Error sending HTML message in /talk: {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
         return TALK_MESSAGE
 
+    if guard.tripped:
+        logger.warning("Abnormal model output")
+
+    await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=sanitize_html(reply))
+
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
         text="You can end the chat or ask the next question",
@@ -203,10 +204,16 @@ async def end_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object containing bot and user data.
 
     Returns:
-        Result of start(): main menu message.
+        ConversationHandler.END: Terminates the talk_conv_handler.
     """
-    await update.callback_query.answer()
-    return await start(update, context)
+    # Stop the answer still being generated, if any
+    openai_client: OpenAIClient = context.bot_data["openai_client"]
+    await openai_client.cancel_runs(update.effective_user.id, SessionMode.TALK.value)
+
+    if update.callback_query:
+        await update.callback_query.answer()
+    await start(update, context)
+    return ConversationHandler.END
 
 
 """
@@ -221,6 +228,7 @@ Entry Points:
 States:
 - CHOOSE_PERSONALITY: Waits for personality selection.
 - TALK_MESSAGE: Handles free-form user questions and returns assistant replies.
+- WAITING: While an answer is generated, ending the chat cancels it and a newer message replaces it.
 
 Fallbacks:
 - /stop command or "End chat" button ends the session.
@@ -231,11 +239,16 @@ talk_conv_handler = ConversationHandler(
     ],
     states={
         CHOOSE_PERSONALITY: [
-            CallbackQueryHandler(start_dialogue, pattern="^(einstein|napoleon|king|mercury)$"),
+            CallbackQueryHandler(start_dialogue, pattern=keyboards.pattern("personality")),
             MessageHandler(filters.TEXT & ~filters.COMMAND, choose_personality_warning)
         ],
         TALK_MESSAGE: [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, chat_with_personality),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, chat_with_personality, block=False),
+            CommandHandler("stop", end_chat),
+            CallbackQueryHandler(end_chat, pattern="^end_chat$")
+        ],
+        ConversationHandler.WAITING: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, chat_with_personality, block=False),
             CommandHandler("stop", end_chat),
             CallbackQueryHandler(end_chat, pattern="^end_chat$")
         ]
@@ -243,5 +256,7 @@ talk_conv_handler = ConversationHandler(
     fallbacks=[
         CallbackQueryHandler(end_chat, pattern="^end_chat$"),
         CommandHandler("stop", end_chat)
-    ]
+    ],
+    name="talk",
+    persistent=True
 )
@@ -10,7 +10,8 @@ It allows users to:
 Main Components:
 - choose_language: Sends an introductory message and shows language selection buttons.
 - get_user_message: Handles language selection and asks for the message to translate.
-- translate_user_message: Translates the provided user message using OpenAI and returns the result.
+- translate_user_message: Translates the provided user message (from the translation cache or
+  using OpenAI) and returns the result.
 - change_language: Lets the user change the translation language.
 - end_translate: Ends the translation session and returns to the main menu.
 - translate_conv_handler: Handles the full conversation flow of the translation feature.
@@ -27,14 +28,15 @@ from telegram.ext import (
     CallbackQueryHandler,
     filters
 )
-from bot.message_sender import send_html_message, send_image_bytes
-from bot.resource_loader import load_message, load_image
+from bot.message_sender import send_html_message, send_intro, send_streamed_message
+from bot.resource_loader import load_message
 from bot.sanitize_html import sanitize_html
-from bot.keyboards import get_choose_language_button, get_translate_menu_button
+from bot.keyboards import keyboards, get_choose_language_button, get_translate_menu_button
 from bot.commands.start import start
 from db.repository import GptThreadRepository
+from db.translation_cache import TranslationCache
 from db.enums import SessionMode, MessageRole
-from services import OpenAIClient
+from services import OpenAIClient, RequestCancelledError, RequestMergedError
 from settings import config, get_logger
 
 
@@ -54,14 +56,12 @@ async def choose_language(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
 
     intro = await load_message("translate")
-    image_bytes = await load_image("translate")
 
-    await send_image_bytes(update, context, image_bytes)
-    await send_html_message(update, context, intro)
-
-    await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        text="What language do you want to translate into?",
+    await send_intro(
+        update,
+        context,
+        "translate",
+        f"{intro}\n\nWhat language do you want to translate into?",
         reply_markup=get_choose_language_button()
     )
 
@@ -96,15 +96,18 @@ async def translate_user_message(update: Update, context: ContextTypes.DEFAULT_T
     """
     Translates the user's message using OpenAI assistant and returns the result.
 
-    Creates a new OpenAI thread if one doesn't exist, stores messages in the database,
-    and updates the Telegram user with the translated text.
+    Identical requests (same normalized text, language and prompt) are answered from
+    the translation cache without calling OpenAI. Otherwise creates a new OpenAI thread
+    if one doesn't exist, stores messages in the database, streams the translated text
+    to the Telegram user and caches it.
 
     Args:
         update (telegram.Update): User text message.
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object.
 
     Returns:
-        TRANSLATE_MESSAGE (str): Keeps the conversation in the same state for further translations.
+        TRANSLATE_MESSAGE (str): Keeps the conversation in the same state for further translations
+            (ConversationHandler.END if the session was ended while the translation was generated).
 
     Raises:
         OpenAIError: If OpenAI assistant fails.
@@ -124,47 +127,81 @@ async def translate_user_message(update: Update, context: ContextTypes.DEFAULT_T
     openai_client: OpenAIClient = context.bot_data["openai_client"]
     assistant_id = config.ai_assistant_translate_mileshkin_id
     thread_repository: GptThreadRepository = context.bot_data["thread_repository"]
+    translation_cache: TranslationCache = context.bot_data["translation_cache"]
 
     tg_user_id = update.effective_user.id
-    mode = SessionMode.QUIZ.value
+    mode = SessionMode.TRANSLATE.value
 
-    thread_id = await thread_repository.get_thread_id(tg_user_id, mode)
+    user_message_to_translate = f"Translate the text after 3 line breaks into {language}\n\n\n{user_message}"
 
-    if thread_id is None:
-        thread = await openai_client.create_thread()
-        thread_id = thread.id
-        await thread_repository.create_thread(tg_user_id, mode, thread_id)
+    # Answer repeated texts from the cache without calling OpenAI
+    cache_key = translation_cache.make_key(user_message, language, assistant_id)
+    cached = await translation_cache.get(cache_key)
+
+    if cached is not None:
+        try:
+            await send_html_message(update, context, cached)
+        except BadRequest as e:
+            logger.warning(f"Error sending HTML message in /translate, translate_user_message(): {e}")
+            await update.message.reply_text("Assistant failed to respond. Please try again later.")
+            return TRANSLATE_MESSAGE
+
+        # Keep the history complete if the user already has a thread
+        thread_id = await thread_repository.get_thread_id(tg_user_id, mode)
+        if thread_id is not None:
+            await thread_repository.add_message(thread_id, role=MessageRole.USER.value, content=user_message_to_translate)
+            await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=cached)
+
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="Send the following text for translation or:",
+            reply_markup=get_translate_menu_button()
+        )
+        return TRANSLATE_MESSAGE
 
+    thread_id = await thread_repository.get_or_create_thread(tg_user_id, mode, openai_client.acquire_thread_id)
 
-    user_message_to_translate = f"Translate the text after 3 line breaks into {language}\n\n\n{user_message}"
 
     # Saving users message in DB
     await thread_repository.add_message(thread_id, role=MessageRole.USER.value, content=user_message_to_translate)
 
-    # Get translate from assistant
+    # Stream the translation to the user as it is generated
     try:
-        reply = await openai_client.ask(
-            assistant_id=assistant_id,
-            thread_id=thread_id,
-            user_message=user_message_to_translate
+        _, reply = await send_streamed_message(
+            update=update,
+            context=context,
+            chunks=openai_client.ask_stream(
+                assistant_id=assistant_id,
+                thread_id=thread_id,
+                user_message=user_message_to_translate,
+                mode=mode,
+                tg_user_id=tg_user_id
+            ),
+            transform=sanitize_html
         )
+    except RequestMergedError:
+        logger.info("Message merged into a later request in /translate, translate_user_message()")
+        return TRANSLATE_MESSAGE
+    except RequestCancelledError as e:
+        logger.info("Request cancelled in /translate, translate_user_message()")
+        # PTB ignores what end_translate returns while this handler is pending, so the session is ended here
+        return TRANSLATE_MESSAGE if e.superseded else ConversationHandler.END
     except OpenAIError as e:
         logger.warning(f"Assistant failed to respond in /translate, translate_user_message(): {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
         return TRANSLATE_MESSAGE
+    except BadRequest as e:
+        logger.warning(f"Error sending HTML message in /translate, translate_user_message(): {e}")
+        await update.message.reply_text("Assistant failed to respond. Please try again later.")
+        return TRANSLATE_MESSAGE
 
     reply = sanitize_html(reply)
 
     # Saving assistants message in DB
     await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=reply)
 
-    # Sending the assistant's response to the user
-    try:
-        await send_html_message(update, context, reply)
-    except BadRequest as e:
-        logger.warning(f"Error sending HTML message in /translate, translate_user_message(): {e}")
-        await update.message.reply_text("Assistant failed to respond. Please try again later.")
-        return TRANSLATE_MESSAGE
+    if reply:
+        await translation_cache.put(cache_key, language, reply)
 
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
@@ -201,12 +238,17 @@ async def end_translate(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context (telegram.ext.ContextTypes.DEFAULT_TYPE): Context object.
 
     Returns:
-        start (function): Calls the start handler.
+        ConversationHandler.END: Terminates the translate_conv_handler.
     """
     query = update.callback_query
     await query.answer()
 
-    return await start(update, context)
+    # Stop the answer still being generated, if any
+    openai_client: OpenAIClient = context.bot_data["openai_client"]
+    await openai_client.cancel_runs(update.effective_user.id, SessionMode.TRANSLATE.value)
+
+    await start(update, context)
+    return ConversationHandler.END
 
 
 """
@@ -224,6 +266,7 @@ Entry points:
 
 States:
     TRANSLATE_MESSAGE: Handles message input, translation, language switching, and menu interaction.
+    WAITING: While a translation is generated, a newer message replaces it and completing cancels it.
 
 Fallbacks:
     - Change language or return to main menu via callbacks.
@@ -231,19 +274,25 @@ Fallbacks:
 translate_conv_handler = ConversationHandler(
     entry_points=[
         CommandHandler("translate", choose_language),
-        CallbackQueryHandler(get_user_message, pattern="^(english|french|german|italian|spanish|ukrainian)$")
+        CallbackQueryHandler(get_user_message, pattern=keyboards.pattern("language"))
     ],
     states={
         TRANSLATE_MESSAGE: [
-            CallbackQueryHandler(get_user_message, pattern="^(english|french|german|italian|spanish|ukrainian)$"),
-            MessageHandler(filters.TEXT & ~filters.COMMAND, translate_user_message),
+            CallbackQueryHandler(get_user_message, pattern=keyboards.pattern("language")),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, translate_user_message, block=False),
             CallbackQueryHandler(change_language, pattern="^change_language$"),
             CallbackQueryHandler(end_translate, pattern="^end_translate$")
+        ],
+        ConversationHandler.WAITING: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, translate_user_message, block=False),
+            CallbackQueryHandler(end_translate, pattern="^end_translate$")
         ]
     },
     fallbacks=[
         CallbackQueryHandler(change_language, pattern="^change_language$"),
         CallbackQueryHandler(end_translate, pattern="^end_translate$"),
         CommandHandler("start", start)
-    ]
+    ],
+    name="translate",
+    persistent=True
 )
\ No newline at end of file
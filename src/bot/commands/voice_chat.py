@@ -20,13 +20,13 @@ import uuid
 from pathlib import Path
 import os
 from bot.audio_converter_stt import  convert_audio_for_stt
-from bot.resource_loader import load_message, load_image
-from bot.message_sender import send_html_message, send_image_bytes
-from bot.sanitize_html import sanitize_html
+from bot.resource_loader import load_message
+from bot.message_sender import send_intro
+from bot.sanitize_html import ABNORMAL_OUTPUT_REPLY, is_abnormal_output, sanitize_html
 from db.repository import GptThreadRepository
 from db.enums import SessionMode, MessageRole
 from settings import config, get_logger
-from services import OpenAIClient, SpeechToText, TextToSpeech
+from services import OpenAIClient, RequestCancelledError, RequestMergedError, SpeechToText, TextToSpeech
 
 
 logger = get_logger(__name__)
@@ -46,10 +46,8 @@ async def voice_chat_intro(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
 
     intro = await load_message("voice_chat")
-    image_bytes = await load_image("voice_chat")
 
-    await send_image_bytes(update=update, context=context, image_bytes=image_bytes)
-    await send_html_message(update=update, context=context, text=intro)
+    await send_intro(update=update, context=context, image="voice_chat", text=intro)
 
 
 async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -127,12 +125,7 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
     tg_user_id = update.effective_user.id
     mode = SessionMode.VOICE_CHAT.value
 
-    thread_id = await thread_repository.get_thread_id(tg_user_id, mode)
-
-    if thread_id is None:
-        thread = await openai_client.create_thread()
-        thread_id = thread.id
-        await thread_repository.create_thread(tg_user_id, mode, thread_id)
+    thread_id = await thread_repository.get_or_create_thread(tg_user_id, mode, openai_client.acquire_thread_id)
 
 
     # Saving users message in DB
@@ -145,8 +138,16 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
         reply = await openai_client.ask(
             assistant_id=assistant_id,
             thread_id=thread_id,
-            user_message=user_message
+            user_message=user_message,
+            mode=mode,
+            tg_user_id=tg_user_id
         )
+    except RequestMergedError:
+        logger.info("Message merged into a later request in /voice_chat, handle_voice_message()")
+        return
+    except RequestCancelledError:
+        logger.info("Request cancelled in /voice_chat, handle_voice_message()")
+        return
     except OpenAIError as e:
         logger.warning(f"Assistant failed to respond in /voice_chat, handle_voice_message(): {e}")
         await update.message.reply_text("Assistant failed to respond. Please try again later.")
@@ -154,10 +155,10 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
 
     reply = sanitize_html(reply)
 
-    if len(reply) > 1000 or any(bad in reply for bad in ["<?", "</", "{%", ">>>", "==", "***", "<script", "###"]):
+    if is_abnormal_output(reply):
         logger.warning("Abnormal model output")
         await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=reply)
-        reply = "Sorry, something went wrong. Please rephrase your question and try again."
+        reply = ABNORMAL_OUTPUT_REPLY
     else:
         await thread_repository.add_message(thread_id, role=MessageRole.ASSISTANT.value, content=reply)
 
@@ -0,0 +1,299 @@
+"""
+This module implements the prefetched fact pool used by the /random command.
+
+Facts are generated in the background and kept ready in memory (and in a JSON file,
+so they survive restarts). Pressing "I want another fact" takes a fact from the pool
+instead of waiting for an OpenAI round trip; the pool refills itself as it drains.
+
+Main Components:
+- FactPool: Holds ready facts, filters out facts each user has seen recently, refills
+  asynchronously below a watermark and counts hits and misses.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Optional
+
+import aiofiles
+from openai import OpenAIError
+
+from db.enums import SessionMode
+from services import OpenAIClient
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+FACT_PROMPT = "Give me a random interesting technical fact."
+
+
+def fact_hash(text: str) -> str:
+    """
+    Returns a short fingerprint of a fact, insensitive to case and whitespace.
+
+    Args:
+        text (str): Fact text.
+
+    Returns:
+        str: First 16 hex digits of the SHA-256 of the normalized text.
+    """
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+class FactPool:
+    """
+    Pool of pre-generated facts served to users without an OpenAI round trip.
+
+    Each fact is served once. For every user the fingerprints of recently served facts
+    are remembered, so the model repeating itself does not show the user the same fact twice.
+
+    Attributes:
+        _openai_client (OpenAIClient): Client used to generate facts.
+        _assistant_id (str): ID of the random fact assistant.
+        _path (Path): JSON file the pool is persisted to.
+        _size (int): Number of facts kept ready.
+        _low_watermark (int): Number of facts below which a refill starts.
+        _refill_concurrency (int): Number of facts generated in parallel during a refill.
+        _user_history (int): Number of recent facts remembered per user.
+        _max_users (int): Number of users whose history is kept (least recently served are dropped).
+        _facts (deque[str]): Ready facts, oldest first.
+        _recent (OrderedDict[int, deque[str]]): Fingerprints of recently served facts by user ID.
+        _refill_task (asyncio.Task | None): Running refill, if any.
+        _save_task (asyncio.Task | None): Pending save, if any.
+        hits (int): Requests answered from the pool.
+        misses (int): Requests the pool could not answer.
+    """
+
+    def __init__(
+        self,
+        openai_client: OpenAIClient,
+        assistant_id: str,
+        path: Path,
+        size: int = 20,
+        low_watermark: int = 10,
+        refill_concurrency: int = 2,
+        user_history: int = 50,
+        max_users: int = 10000
+    ):
+        """
+        Initializes an empty pool. Call `load` to restore persisted facts and start filling.
+
+        Args:
+            openai_client (OpenAIClient): Client used to generate facts.
+            assistant_id (str): ID of the random fact assistant.
+            path (Path): JSON file the pool is persisted to.
+            size (int): Number of facts kept ready.
+            low_watermark (int): Number of facts below which a refill starts.
+            refill_concurrency (int): Number of facts generated in parallel during a refill.
+            user_history (int): Number of recent facts remembered per user.
+            max_users (int): Number of users whose history is kept.
+        """
+        self._openai_client = openai_client
+        self._assistant_id = assistant_id
+        self._path = path
+        self._size = size
+        self._low_watermark = low_watermark
+        self._refill_concurrency = refill_concurrency
+        self._user_history = user_history
+        self._max_users = max_users
+
+        self._facts: deque[str] = deque()
+        self._recent: OrderedDict[int, deque[str]] = OrderedDict()
+        self._refill_task: asyncio.Task | None = None
+        self._save_task: asyncio.Task | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self._generated = 0
+        self._duplicates = 0
+
+    async def load(self) -> None:
+        """
+        Restores facts and user histories from disk and starts filling the pool.
+        """
+        if self._path.exists():
+            try:
+                async with aiofiles.open(self._path, mode="r", encoding="utf-8") as file:
+                    data = json.loads(await file.read())
+                self._facts = deque(data.get("facts", [])[:self._size])
+                for user_id, hashes in data.get("recent", {}).items():
+                    self._recent[int(user_id)] = deque(hashes, maxlen=self._user_history)
+                logger.info(f"Fact pool: loaded {len(self._facts)} facts from {self._path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Fact pool: could not load {self._path}: {e}")
+
+        self._start_refill()
+
+    def take(self, tg_user_id: int) -> Optional[str]:
+        """
+        Takes a ready fact the user has not seen recently.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+
+        Returns:
+            Optional[str]: Fact text, or None if the pool has nothing new for the user.
+        """
+        recent = self._recent.get(tg_user_id)
+        fact = None
+        for candidate in self._facts:
+            if recent is None or fact_hash(candidate) not in recent:
+                fact = candidate
+                break
+
+        if fact is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._facts.remove(fact)
+            self.remember(tg_user_id, fact)
+
+        if len(self._facts) < self._low_watermark:
+            self._start_refill()
+        self._schedule_save()
+        return fact
+
+    def remember(self, tg_user_id: int, fact: str) -> None:
+        """
+        Records a fact as seen by the user (also used for facts generated live).
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            fact (str): Fact text shown to the user.
+        """
+        recent = self._recent.pop(tg_user_id, None) or deque(maxlen=self._user_history)
+        recent.append(fact_hash(fact))
+        self._recent[tg_user_id] = recent
+        while len(self._recent) > self._max_users:
+            self._recent.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        """
+        Returns pool statistics.
+
+        Returns:
+            dict: Ready facts, hits, misses, hit ratio, generated facts and dropped duplicates.
+        """
+        requests = self.hits + self.misses
+        return {
+            "ready": len(self._facts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests, 3) if requests else 0.0,
+            "generated": self._generated,
+            "duplicates": self._duplicates,
+        }
+
+    async def close(self) -> None:
+        """
+        Stops refilling and writes the pool to disk.
+        """
+        for task in (self._refill_task, self._save_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        await self._save()
+
+    def _start_refill(self) -> None:
+        """
+        Starts a background refill unless one is already running.
+        """
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        """
+        Generates facts until the pool is full, a few at a time.
+
+        Stops early if a round produced nothing new (e.g. OpenAI is failing),
+        the next `take` below the watermark starts it again. Failed generations
+        are logged and count as producing nothing.
+        """
+        while len(self._facts) < self._size:
+            missing = min(self._refill_concurrency, self._size - len(self._facts))
+            results = await asyncio.gather(
+                *(self._generate() for _ in range(missing)),
+                return_exceptions=True
+            )
+
+            added = 0
+            for result in results:
+                if isinstance(result, OpenAIError):
+                    logger.warning(f"Fact pool: generation failed: {result}")
+                elif isinstance(result, Exception):
+                    # Nothing awaits this task, so a raised error would only be lost
+                    logger.exception(f"Fact pool: unexpected error while generating: {result}", exc_info=result)
+                elif isinstance(result, BaseException):
+                    raise result
+                elif result and self._add(result):
+                    added += 1
+
+            if added == 0:
+                break
+
+        logger.info(f"Fact pool: {len(self._facts)} facts ready")
+        self._schedule_save()
+
+    async def _generate(self) -> str:
+        """
+        Asks the random fact assistant for one fact.
+
+        Returns:
+            str: Generated fact.
+        """
+        reply = await self._openai_client.generate(
+            assistant_id=self._assistant_id,
+            user_message=FACT_PROMPT,
+            mode=SessionMode.RANDOM.value
+        )
+        self._generated += 1
+        return reply.strip()
+
+    def _add(self, fact: str) -> bool:
+        """
+        Adds a fact to the pool unless the same fact is already waiting.
+
+        Args:
+            fact (str): Generated fact.
+
+        Returns:
+            bool: True if the fact was added.
+        """
+        digest = fact_hash(fact)
+        if any(fact_hash(existing) == digest for existing in self._facts):
+            self._duplicates += 1
+            return False
+        self._facts.append(fact)
+        return True
+
+    def _schedule_save(self) -> None:
+        """
+        Writes the pool to disk in the background, coalescing saves requested meanwhile.
+        """
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save())
+
+    async def _save(self) -> None:
+        """
+        Writes facts and user histories to the JSON file atomically.
+        """
+        data = {
+            "facts": list(self._facts),
+            "recent": {str(user_id): list(hashes) for user_id, hashes in self._recent.items()},
+        }
+        tmp_path = self._path.with_suffix(".tmp")
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            async with aiofiles.open(tmp_path, mode="w", encoding="utf-8") as file:
+                await file.write(json.dumps(data, ensure_ascii=False))
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning(f"Fact pool: could not save {self._path}: {e}")
@@ -1,152 +1,212 @@
+import re
+from typing import Any, Mapping
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from settings import resources
+
+
+class KeyboardRegistry:
+    """
+    Inline keyboards declared in `resources/menus/keyboards.json`, each built once and shared.
+
+    The file maps a keyboard name to its rows; a button is an object with its `text`,
+    its callback `data` and optionally a `group`. Buttons of a group (e.g. the quiz
+    topics) are choices of the same kind, and `pattern` gives the CallbackQueryHandler
+    regex matching them, so a new choice is added in the file only.
+
+    Markups are Telegram objects, immutable once built, so one instance serves every message.
+    The definitions are read when the registry is created (handler patterns are fixed at import).
+
+    Attributes:
+        _markups (dict[str, InlineKeyboardMarkup]): Prebuilt markup by keyboard name.
+        _groups (dict[str, list[str]]): Callback data of the buttons of each group, in file order.
+    """
+
+    def __init__(self, definitions: Mapping[str, Any]):
+        """
+        Builds every keyboard.
+
+        Args:
+            definitions (Mapping[str, Any]): Rows of buttons by keyboard name (the parsed JSON file).
+
+        Raises:
+            ValueError: If a definition is malformed.
+        """
+        self._markups: dict[str, InlineKeyboardMarkup] = {}
+        self._groups: dict[str, list[str]] = {}
+
+        for name, rows in definitions.items():
+            try:
+                keyboard = []
+                for row in rows:
+                    buttons = []
+                    for button in row:
+                        buttons.append(InlineKeyboardButton(button["text"], callback_data=button["data"]))
+                        if "group" in button:
+                            group = self._groups.setdefault(button["group"], [])
+                            if button["data"] not in group:
+                                group.append(button["data"])
+                    keyboard.append(buttons)
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Malformed keyboard '{name}': {e!r}") from e
+            self._markups[name] = InlineKeyboardMarkup(keyboard)
+
+    def get(self, name: str) -> InlineKeyboardMarkup:
+        """
+        Returns a prebuilt keyboard.
+
+        Args:
+            name (str): Keyboard name in the definitions.
+
+        Returns:
+            InlineKeyboardMarkup: The shared markup.
+
+        Raises:
+            KeyError: If there is no such keyboard.
+        """
+        return self._markups[name]
+
+    def choices(self, group: str) -> list[str]:
+        """
+        Returns the callback data of the buttons of a group.
+
+        Args:
+            group (str): Group name (e.g. "quiz_topic").
+
+        Returns:
+            list[str]: Callback data, in the order of the definitions.
+
+        Raises:
+            KeyError: If no button belongs to the group.
+        """
+        return list(self._groups[group])
+
+    def pattern(self, group: str) -> str:
+        """
+        Returns the CallbackQueryHandler pattern matching the buttons of a group.
+
+        Args:
+            group (str): Group name (e.g. "quiz_topic").
+
+        Returns:
+            str: Regex matching exactly the callback data of the group.
+
+        Raises:
+            KeyError: If no button belongs to the group.
+        """
+        return "^(" + "|".join(re.escape(data) for data in self._groups[group]) + ")$"
+
+
+keyboards = KeyboardRegistry(resources.menu("keyboards"))
 
 
 def get_random_menu_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for random fact generation.
+    Returns the inline keyboard for random fact generation.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("🏠 Main Menu", callback_data="start"),
-        InlineKeyboardButton("I want another fact", callback_data="random")]
-    ])
+    return keyboards.get("random_menu")
 
 def get_talk_menu_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for choose famous personality.
+    Returns the inline keyboard for choosing a famous personality.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Albert Einstein", callback_data="einstein"),
-        InlineKeyboardButton("Napoleon Bonaparte", callback_data="napoleon")],
-        [InlineKeyboardButton("Stephen King", callback_data="king"),
-         InlineKeyboardButton("Freddie Mercury", callback_data="mercury")],
-        [InlineKeyboardButton("🏠 Main Menu", callback_data="start")]
-    ])
+    return keyboards.get("talk_menu")
 
 def get_end_chat_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for ending a chat.
+    Returns the inline keyboard for ending a chat.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("End chat", callback_data="end_chat")]
-    ])
+    return keyboards.get("end_chat")
 
 def get_quiz_choose_topic_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for choose quiz topic.
+    Returns the inline keyboard for choosing a quiz topic.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Science", callback_data="science"),
-        InlineKeyboardButton("Sport", callback_data="sport")],
-        [InlineKeyboardButton("Art", callback_data="art"),
-         InlineKeyboardButton("Cinema", callback_data="cinema")]
-    ])
+    return keyboards.get("quiz_choose_topic")
 
 def get_quiz_menu_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for quiz menu.
+    Returns the inline keyboard for the quiz menu.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Next question", callback_data="next_question_quiz"),
-        InlineKeyboardButton("Change topic", callback_data="change_topic_quiz"),
-        InlineKeyboardButton("Complete quiz", callback_data="end_quiz")]
-    ])
+    return keyboards.get("quiz_menu")
 
 def get_choose_language_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for choose language.
+    Returns the inline keyboard for choosing a language.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("English", callback_data="english"),
-        InlineKeyboardButton("French", callback_data="french")],
-        [InlineKeyboardButton("German", callback_data="german"),
-         InlineKeyboardButton("Italian", callback_data="italian")],
-        [InlineKeyboardButton("Spanish", callback_data="spanish"),
-         InlineKeyboardButton("Ukrainian", callback_data="ukrainian")],
-        [InlineKeyboardButton("🏠 Main Menu", callback_data="start")]
-    ])
+    return keyboards.get("choose_language")
 
 def get_translate_menu_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for selecting an action after translating text.
+    Returns the inline keyboard for selecting an action after translating text.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Change language", callback_data="change_language"),
-        InlineKeyboardButton("Complete translate", callback_data="end_translate")]
-    ])
+    return keyboards.get("translate_menu")
 
 def get_resume_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for selecting an action after input data.
+    Returns the inline keyboard for selecting an action after input data.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Confirm", callback_data="confirm"),
-        InlineKeyboardButton("Edit", callback_data="edit")]
-    ])
+    return keyboards.get("resume")
 
 def get_resume_format_file_button() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for choose the resume file format.
+    Returns the inline keyboard for choosing the resume file format.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("PDF", callback_data="PDF"),
-        InlineKeyboardButton("DOCX", callback_data="DOCX")]
-    ])
+    return keyboards.get("resume_format_file")
 
 def get_resume_format_file_button_end() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for selecting an action after output resume.
+    Returns the inline keyboard for selecting an action after output resume.
 
     Returns:
         InlineKeyboardMarkup: Telegram markup object containing the buttons.
     """
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("PDF", callback_data="PDF"),
-        InlineKeyboardButton("DOCX", callback_data="DOCX")],
-        [InlineKeyboardButton("Complete", callback_data="complete")]
-    ])
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    return keyboards.get("resume_format_file_end")
 
+def get_history_page_buttons(page: int, has_next: bool) -> InlineKeyboardMarkup:
+    """
+    Creates an inline keyboard markup for paging through /history search results.
 
+    Args:
+        page (int): Index of the page shown, starting at 0.
+        has_next (bool): Whether there are more results after this page.
 
+    Returns:
+        InlineKeyboardMarkup: Telegram markup object containing the buttons.
+    """
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("◀ Previous", callback_data=f"history:{page - 1}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton("Next ▶", callback_data=f"history:{page + 1}"))
 
+    return InlineKeyboardMarkup([
+        navigation,
+        [InlineKeyboardButton("🏠 Main Menu", callback_data="start")]
+    ])
@@ -1,18 +1,38 @@
+import asyncio
+import hashlib
+import html
+import json
+import re
+from typing import AsyncIterator, Callable, Mapping
 from telegram import (
+    Bot,
     Update,
+    Message,
     InputFile,
     BotCommand,
     BotCommandScopeChat,
+    InlineKeyboardMarkup,
     MenuButtonCommands
 )
-from telegram.constants import ParseMode
+from telegram.constants import MessageLimit, ParseMode
+from telegram.error import BadRequest, RetryAfter, TelegramError
 from telegram.ext import ContextTypes
+from bot.resource_loader import image_hash, load_image
+from db.chat_menus import ChatMenuCache
+from db.media_cache import MediaCache
+from settings import config, get_logger
+
+
+logger = get_logger(__name__)
+
+_HTML_TAG = re.compile(r"<[^>]+>")
 
 
 async def send_html_message(
         update: Update,
         context: ContextTypes.DEFAULT_TYPE,
         text: str,
+        reply_markup: InlineKeyboardMarkup | None = None,
 ) -> None:
     """
     Sends an HTML-formatted message to the current chat.
@@ -21,14 +41,129 @@ async def send_html_message(
         update (Update): Telegram update containing chat context.
         context (ContextTypes.DEFAULT_TYPE): Telegram context for bot interaction.
         text (str): HTML-formatted text to send.
+        reply_markup (InlineKeyboardMarkup, optional): Keyboard attached to the message.
     """
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
         text=text,
         parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup,
     )
 
 
+class GuardedTransform:
+    """
+    Transform for `send_streamed_message` that hides a reply once it looks abnormal.
+
+    The text is rendered with `transform` and checked with `is_abnormal`. From the first
+    rendering that fails the check on, `fallback` is returned instead, so the message is
+    edited to the fallback once and then left alone even if later chunks look normal again.
+
+    Attributes:
+        tripped (bool): Whether the check has failed.
+    """
+
+    def __init__(self, transform: Callable[[str], str], is_abnormal: Callable[[str], bool], fallback: str):
+        """
+        Args:
+            transform (Callable[[str], str]): Applied to the accumulated text (e.g. sanitize_html).
+            is_abnormal (Callable[[str], bool]): Check run on the transformed text.
+            fallback (str): Text shown instead once the check fails.
+        """
+        self._transform = transform
+        self._is_abnormal = is_abnormal
+        self._fallback = fallback
+        self.tripped = False
+
+    def __call__(self, text: str) -> str:
+        if not self.tripped:
+            rendered = self._transform(text)
+            if not self._is_abnormal(rendered):
+                return rendered
+            self.tripped = True
+        return self._fallback
+
+
+async def send_streamed_message(
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        chunks: AsyncIterator[str],
+        transform: Callable[[str], str] | None = None,
+        placeholder: str = "…",
+        edit_interval_ms: int | None = None,
+) -> tuple[Message, str]:
+    """
+    Sends a placeholder message and progressively edits it as text chunks arrive.
+
+    Edits are rate-limited to at most one every `edit_interval_ms` milliseconds,
+    and the final text is always written once the stream is exhausted. If Telegram
+    rejects the final HTML, the text is written without markup instead, so the caller
+    still gets the reply back. If the stream fails, the placeholder is deleted and the
+    error is re-raised.
+
+    Args:
+        update (Update): Telegram update containing chat context.
+        context (ContextTypes.DEFAULT_TYPE): Telegram context for bot interaction.
+        chunks (AsyncIterator[str]): Stream of text pieces (e.g. from OpenAIClient.ask_stream).
+        transform (Callable[[str], str], optional): Applied to the accumulated text before
+            each edit (e.g. sanitize_html, or a GuardedTransform to hide abnormal output).
+        placeholder (str, optional): Text shown until the first chunk arrives.
+        edit_interval_ms (int, optional): Minimum delay between edits.
+            Defaults to `config.stream_edit_interval_ms`.
+
+    Returns:
+        tuple[Message, str]: The sent message and the full raw (untransformed) text.
+
+    Raises:
+        telegram.error.BadRequest: If the placeholder cannot be sent.
+    """
+    interval = (edit_interval_ms if edit_interval_ms is not None else config.stream_edit_interval_ms) / 1000
+    render = transform or (lambda value: value)
+    loop = asyncio.get_running_loop()
+
+    message = await context.bot.send_message(chat_id=update.effective_chat.id, text=placeholder)
+    shown = placeholder
+    text = ""
+    last_edit = loop.time()
+
+    try:
+        async for chunk in chunks:
+            text += chunk
+            if loop.time() - last_edit < interval:
+                continue
+
+            rendered = render(text)
+            if rendered and rendered != shown:
+                try:
+                    await message.edit_text(rendered, parse_mode=ParseMode.HTML)
+                    shown = rendered
+                except (BadRequest, RetryAfter):
+                    # Intermediate edits are best-effort; the final edit below is what matters
+                    pass
+                last_edit = loop.time()
+    except Exception:
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+        try:
+            await message.delete()
+        except TelegramError:
+            pass
+        raise
+
+    rendered = render(text)
+    if rendered and rendered != shown:
+        try:
+            await message.edit_text(rendered, parse_mode=ParseMode.HTML)
+        except BadRequest as e:
+            logger.warning(f"Final streamed edit rejected, retrying without markup: {e}")
+            try:
+                await message.edit_text(html.unescape(_HTML_TAG.sub("", rendered)))
+            except TelegramError as e:
+                logger.warning(f"Error editing streamed message: {e}")
+
+    return message, text
+
+
 async def send_image_bytes(
         update: Update,
         context: ContextTypes.DEFAULT_TYPE,
@@ -56,23 +191,175 @@ async def send_image_bytes(
     )
 
 
+async def send_image(
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        name: str,
+        caption: str | None = None,
+        parse_mode: str = ParseMode.HTML,
+        reply_markup: InlineKeyboardMarkup | None = None
+) -> None:
+    """
+    Sends an image from the images directory, uploading it only the first time.
+
+    The `file_id` Telegram returns for the upload is kept in the MediaCache
+    (`bot_data["media_cache"]`) under the image name and content hash, and later sends
+    reuse it. Editing the file changes the hash, so the new content is uploaded once.
+    A `file_id` Telegram rejects is dropped and the image uploaded again.
+
+    Args:
+        update (Update): Telegram update containing chat context.
+        context (ContextTypes.DEFAULT_TYPE): Telegram context for bot interaction.
+        name (str): The base filename (without extension) of the image (e.g. "quiz").
+        caption (str, optional): Optional caption to include with the image.
+        parse_mode (str, optional): Parsing mode for caption formatting. Defaults to HTML.
+        reply_markup (InlineKeyboardMarkup, optional): Keyboard attached to the photo.
+
+    Raises:
+        telegram.error.BadRequest: If Telegram rejects the message (e.g. the caption).
+    """
+    media_cache: MediaCache = context.bot_data["media_cache"]
+    content_hash = await image_hash(name)
+
+    file_id = await media_cache.get(name, content_hash)
+    if file_id is not None:
+        try:
+            await context.bot.send_photo(
+                chat_id=update.effective_chat.id,
+                photo=file_id,
+                caption=caption,
+                parse_mode=parse_mode if caption else None,
+                reply_markup=reply_markup
+            )
+            return
+        except BadRequest as e:
+            if "file" not in e.message.lower():
+                raise
+            logger.warning(f"Cached file_id of image '{name}' rejected, uploading again: {e}")
+            await media_cache.drop(name, content_hash)
+
+    message = await context.bot.send_photo(
+        chat_id=update.effective_chat.id,
+        photo=InputFile(await load_image(name), filename=f"{name}.jpg"),
+        caption=caption,
+        parse_mode=parse_mode if caption else None,
+        reply_markup=reply_markup
+    )
+    await media_cache.put(name, content_hash, message.photo[-1].file_id)
+
+
+def caption_length(text: str) -> int:
+    """
+    Returns the length Telegram counts for an HTML caption: the text without tags,
+    entities decoded and surrounding whitespace trimmed, in UTF-16 code units.
+
+    Args:
+        text (str): HTML-formatted text.
+
+    Returns:
+        int: Caption length.
+    """
+    visible = html.unescape(_HTML_TAG.sub("", text)).strip()
+    return len(visible.encode("utf-16-le")) // 2
+
+
+async def send_intro(
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        image: str,
+        text: str,
+        reply_markup: InlineKeyboardMarkup | None = None
+) -> None:
+    """
+    Sends a mode's intro, the image, HTML text and optional keyboard, in as few Bot API calls as possible.
+
+    The text goes in the photo's caption together with the keyboard (one call). If it
+    is longer than a caption may be, the photo is sent alone and the text follows as a
+    message carrying the keyboard (two calls).
+
+    Args:
+        update (Update): Telegram update containing chat context.
+        context (ContextTypes.DEFAULT_TYPE): Telegram context for bot interaction.
+        image (str): The base filename (without extension) of the image (e.g. "quiz").
+        text (str): HTML-formatted intro text.
+        reply_markup (InlineKeyboardMarkup, optional): Keyboard shown under the intro.
+
+    Raises:
+        telegram.error.BadRequest: If Telegram rejects the text (e.g. invalid HTML).
+    """
+    if caption_length(text) <= MessageLimit.CAPTION_LENGTH:
+        try:
+            await send_image(update, context, image, caption=text, reply_markup=reply_markup)
+            return
+        except BadRequest as e:
+            if "too long" not in e.message.lower():
+                raise
+            logger.warning(f"Intro caption of '{image}' rejected as too long, sending it separately")
+
+    await send_image(update, context, image)
+    await send_html_message(update, context, text, reply_markup=reply_markup)
+
+
+def menu_hash(commands: Mapping[str, str]) -> str:
+    """
+    Returns a fingerprint of a command menu (names, descriptions and order).
+
+    Args:
+        commands (Mapping[str, str]): Command names and their descriptions.
+
+    Returns:
+        str: First 16 hex digits of the SHA-256 of the menu.
+    """
+    payload = json.dumps(list(commands.items()), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+async def register_default_menu(bot: Bot, commands: Mapping[str, str], chat_menus: ChatMenuCache) -> None:
+    """
+    Registers the command menu shown in every chat without a menu of its own (called at startup).
+
+    Args:
+        bot (Bot): The bot.
+        commands (Mapping[str, str]): Command names and their descriptions.
+        chat_menus (ChatMenuCache): Menu state of the chats; its default hash is updated.
+    """
+    await bot.set_my_commands([BotCommand(cmd, desc) for cmd, desc in commands.items()])
+    await bot.set_chat_menu_button(menu_button=MenuButtonCommands())
+    chat_menus.default_hash = menu_hash(commands)
+
+
 async def show_menu(
         update: Update,
         context: ContextTypes.DEFAULT_TYPE,
-        commands: dict[str, str]
+        commands: Mapping[str, str]
 ) -> None:
     """
     Sets a custom menu of commands for the current chat session.
 
+    The hash of the menu last pushed to each chat is kept in the ChatMenuCache
+    (`bot_data["chat_menus"]`), and nothing is sent when the chat already shows this
+    menu. The default menu is registered once at startup (see `register_default_menu`),
+    so a chat getting it only has its own menu removed, once.
+
     Args:
         update (Update): Telegram update containing chat context.
         context (ContextTypes.DEFAULT_TYPE): Telegram context for bot interaction.
-        commands (dict[str, str]): Dictionary where keys are command names
+        commands (Mapping[str, str]): Mapping where keys are command names
             and values are their descriptions.
     """
-
-    command_list = [BotCommand(cmd, desc) for cmd, desc in commands.items()]
+    chat_menus: ChatMenuCache = context.bot_data["chat_menus"]
     chat_id = update.effective_chat.id
+    current_hash = menu_hash(commands)
+
+    if await chat_menus.get(chat_id) == current_hash:
+        return
+
+    if current_hash == chat_menus.default_hash:
+        # Menus pushed to the chat earlier would hide the default one
+        await context.bot.delete_my_commands(scope=BotCommandScopeChat(chat_id=chat_id))
+    else:
+        command_list = [BotCommand(cmd, desc) for cmd, desc in commands.items()]
+        await context.bot.set_my_commands(command_list, scope=BotCommandScopeChat(chat_id=chat_id))
+        await context.bot.set_chat_menu_button(chat_id=chat_id, menu_button=MenuButtonCommands())
 
-    await context.bot.set_my_commands(command_list, scope=BotCommandScopeChat(chat_id=chat_id))
-    await context.bot.set_chat_menu_button(chat_id=chat_id, menu_button=MenuButtonCommands())
+    await chat_menus.put(chat_id, current_hash)
@@ -0,0 +1,231 @@
+"""
+This module implements the quiz question bank used by the "Quiz" feature.
+
+Questions are generated in bulk ahead of time and stored in SQLite, so pressing a topic
+or "next question" is answered with a single local query instead of an OpenAI round trip.
+A JobQueue task tops up every topic whose stock of unseen questions falls below a watermark.
+
+Main Components:
+- parse_quiz_question: Parses one question, its options and the correct answer from assistant output.
+- parse_quiz_questions: Parses a bulk reply containing several questions.
+- QuizBank: Serves questions to users and refills the bank in the background.
+"""
+
+import re
+from typing import Optional
+
+from openai import OpenAIError
+from telegram.ext import ContextTypes
+
+from db.enums import SessionMode
+from db.quiz_repository import QuizQuestionRepository
+from services import OpenAIClient
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+
+def parse_quiz_question(text: str):
+    """
+    Parses the question and answer options from the ChatGPT answer.
+    Expected format:
+
+        Question: <question text>
+
+        A) <option 1>
+        B) <option 2>
+        C) <option 3>
+        D) <option 4>
+
+        Correct Answer: <letter (A, B, C, D)>
+
+    Args:
+        text (str): Raw text from OpenAI containing the quiz question and answer options.
+
+    Returns:
+        tuple[str, dict[str, str], str]:
+            - The question text,
+            - A dictionary of answer options,
+            - The correct answer letter (A, B, C, or D)
+
+    Raises:
+        ValueError: If the response does not contain all required elements.
+    """
+    question_match = re.search(r"Question:\s*(.+)", text, re.IGNORECASE)
+    options_match = re.findall(r"([A-D])\)\s*(.+)", text)
+    correct_answer_match = re.search(r"Correct Answer:\s*([A-D])", text, re.IGNORECASE)
+
+    if not question_match or len(options_match) != 4 or not correct_answer_match:
+        logger.warning(f"\quiz, parse_quiz_question(). Response format is incorrect or missing elements.")
+        raise ValueError("\quiz, parse_quiz_question(). Response format is incorrect or missing elements.")
+
+    question = question_match.group(1).strip()
+    options = {key: value.strip() for key, value in options_match}
+    correct_answer_letter = correct_answer_match.group(1).strip()
+
+    return question, options, correct_answer_letter
+
+
+def parse_quiz_questions(text: str) -> list[tuple[str, dict[str, str], str]]:
+    """
+    Parses a reply containing several questions in the `parse_quiz_question` format.
+
+    Malformed questions are skipped.
+
+    Args:
+        text (str): Raw text from OpenAI with one or more quiz questions.
+
+    Returns:
+        list[tuple[str, dict[str, str], str]]: Parsed questions, in reply order.
+    """
+    questions = []
+    for block in re.split(r"(?=Question:)", text, flags=re.IGNORECASE):
+        if not block.strip():
+            continue
+        try:
+            questions.append(parse_quiz_question(block))
+        except ValueError:
+            continue
+    return questions
+
+
+class QuizBank:
+    """
+    Serves pre-generated quiz questions and keeps every topic stocked.
+
+    Attributes:
+        _repository (QuizQuestionRepository): Storage of questions and per-user progress.
+        _openai_client (OpenAIClient): Client used to generate new questions.
+        _assistant_id (str): ID of the quiz assistant.
+        _topics (list[str]): Topics kept in stock.
+        _low_watermark (int): Stock below which a topic is refilled.
+        _batch_size (int): Number of questions requested per refill.
+        _refilling (set[str]): Topics with a refill in progress.
+    """
+
+    def __init__(
+        self,
+        repository: QuizQuestionRepository,
+        openai_client: OpenAIClient,
+        assistant_id: str,
+        topics: list[str],
+        low_watermark: int = 10,
+        batch_size: int = 10
+    ):
+        """
+        Initializes the question bank.
+
+        Args:
+            repository (QuizQuestionRepository): Storage of questions and per-user progress.
+            openai_client (OpenAIClient): Client used to generate new questions.
+            assistant_id (str): ID of the quiz assistant.
+            topics (list[str]): Topics kept in stock.
+            low_watermark (int): Stock below which a topic is refilled.
+            batch_size (int): Number of questions requested per refill.
+        """
+        self._repository = repository
+        self._openai_client = openai_client
+        self._assistant_id = assistant_id
+        self._topics = topics
+        self._low_watermark = low_watermark
+        self._batch_size = batch_size
+        self._refilling: set[str] = set()
+
+    async def next_question(self, tg_user_id: int, topic: str) -> Optional[dict]:
+        """
+        Returns the next stored question the user has not seen.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            topic (str): Quiz topic.
+
+        Returns:
+            Optional[dict]: Question with 'id', 'question', 'options' and 'correct_answer',
+                or None if the bank has no unseen question for the user.
+        """
+        return await self._repository.next_question(tg_user_id, topic)
+
+    async def add_served_question(
+        self,
+        tg_user_id: int,
+        topic: str,
+        question: tuple[str, dict[str, str], str]
+    ) -> None:
+        """
+        Stores a question generated live for a user and marks it as seen by them.
+
+        Bank questions the user has not seen yet are still served, even if a refill
+        stored them while this question was being generated.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            topic (str): Quiz topic.
+            question (tuple[str, dict[str, str], str]): Question text, options and correct answer.
+        """
+        [question_id] = await self._repository.add_questions(topic, [question])
+        await self._repository.mark_seen(tg_user_id, topic, question_id)
+
+    async def needs_top_up(self, topic: str) -> bool:
+        """
+        Checks whether the topic's stock has fallen below the watermark.
+
+        Args:
+            topic (str): Quiz topic.
+
+        Returns:
+            bool: True if the topic should be refilled and no refill is running.
+        """
+        if topic in self._refilling:
+            return False
+        return await self._repository.count_stock(topic) < self._low_watermark
+
+    async def top_up(self, topic: str) -> int:
+        """
+        Generates a batch of questions for the topic and stores them.
+
+        Args:
+            topic (str): Quiz topic.
+
+        Returns:
+            int: Number of questions parsed from the reply (duplicates are not stored twice).
+        """
+        if topic in self._refilling:
+            return 0
+
+        self._refilling.add(topic)
+        try:
+            user_message = (
+                f"Generate {self._batch_size} different interesting mid-level questions on the topic: {topic}. "
+                f"Use the required format for each question and separate them with a blank line."
+            )
+            reply = await self._openai_client.generate(
+                assistant_id=self._assistant_id,
+                user_message=user_message,
+                mode=SessionMode.QUIZ.value
+            )
+            questions = parse_quiz_questions(reply)
+            if questions:
+                await self._repository.add_questions(topic, questions)
+            logger.info(f"Quiz bank: added {len(questions)} questions for topic '{topic}'")
+            return len(questions)
+        except OpenAIError as e:
+            logger.warning(f"Quiz bank: failed to generate questions for topic '{topic}': {e}")
+            return 0
+        finally:
+            self._refilling.discard(topic)
+
+    async def top_up_job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        JobQueue callback that refills low topics.
+
+        If the job was scheduled with a topic in `job.data`, only that topic is checked,
+        otherwise all topics are.
+
+        Args:
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): Job context.
+        """
+        topics = [context.job.data] if context.job and context.job.data else self._topics
+        for topic in topics:
+            if await self.needs_top_up(topic):
+                await self.top_up(topic)
@@ -1,11 +1,10 @@
-import json
-import aiofiles
-from settings import config
+from typing import Any, Mapping
+from settings import resources
 
 
 async def load_message(name: str) -> str:
     """
-    Loads an HTML-formatted message from the messages' directory.
+    Returns an HTML-formatted message from the messages' directory (kept in memory, see ResourceBundle).
 
     Args:
         name (str): The base filename (without extension) of the HTML message to load.
@@ -13,14 +12,12 @@ async def load_message(name: str) -> str:
     Returns:
         str: The contents of the HTML file as a string.
     """
-    path = config.path_to_messages / f"{name}.html"
-    async with aiofiles.open(path, mode="r", encoding="utf-8") as file:
-        return await file.read()
+    return resources.message(name)
 
 
 async def load_image(name: str) -> bytes:
     """
-    Loads an image as bytes from the images directory.
+    Returns an image as bytes from the images directory (kept in memory, see ResourceBundle).
 
     Args:
         name (str): The base filename (without extension) of the image to load.
@@ -28,22 +25,30 @@ async def load_image(name: str) -> bytes:
     Returns:
         bytes: The image content in bytes, suitable for sending to Telegram.
     """
-    path = config.path_to_images / f"{name}.jpg"
-    async with aiofiles.open(path, mode="rb") as file:
-        return await file.read()
+    return resources.image(name)
 
 
-async def load_menu(name: str) -> dict:
+async def image_hash(name: str) -> str:
     """
-    Loads a JSON menu definition from the menus' directory.
+    Returns a hash of an image's content, which changes when the file is edited.
+
+    Args:
+        name (str): The base filename (without extension) of the image.
+
+    Returns:
+        str: Hex SHA-256 of the image content.
+    """
+    return resources.image_hash(name)
+
+
+async def load_menu(name: str) -> Mapping[str, Any]:
+    """
+    Returns a JSON menu definition from the menus' directory (kept in memory, see ResourceBundle).
 
     Args:
         name (str): The base filename (without extension) of the menu JSON to load.
 
     Returns:
-        dict: The parsed JSON content as a dictionary of command-label pairs.
+        Mapping[str, Any]: Read-only mapping of the parsed menu JSON.
     """
-    path = config.path_to_menus / f"{name}.json"
-    async with aiofiles.open(path, encoding="utf-8") as file:
-        content = await file.read()
-        return json.loads(content)
\ No newline at end of file
+    return resources.menu(name)
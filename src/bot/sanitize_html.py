@@ -1,6 +1,11 @@
 import re
 
 
+ABNORMAL_OUTPUT_REPLY = "Sorry, something went wrong. Please rephrase your question and try again."
+
+_ABNORMAL_MARKERS = ("<?", "</", "{%", ">>>", "==", "***", "<script", "###")
+
+
 def sanitize_html(text: str) -> str:
     """
     Limits the length and cleans incoming HTML messages from tags that are not allowed for output in Telegram.
@@ -26,4 +31,17 @@ def sanitize_html(text: str) -> str:
     if len(text) > max_length:
         text = text[:max_length - 4] + "..."
 
-    return text.strip()
\ No newline at end of file
+    return text.strip()
+
+
+def is_abnormal_output(text: str) -> bool:
+    """
+    Checks a sanitized assistant reply for signs of broken or unwanted output (too long, code or markup).
+
+    Attributes:
+        text (str): sanitized reply
+
+    Returns:
+        bool: True if the reply should not be shown to the user
+    """
+    return len(text) > 1000 or any(marker in text for marker in _ABNORMAL_MARKERS)
@@ -0,0 +1,92 @@
+import time
+from typing import Optional
+import aiosqlite
+from db.pool import ConnectionPool
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class ChatMenuCache:
+    """
+    Hash of the command menu last pushed to each chat, kept in memory in front of a SQLite table.
+
+    `show_menu` compares the menu it is about to push with the stored hash and skips
+    the Bot API calls when they match. The table keeps the state across restarts, so
+    chats are not written to again after every deploy.
+
+    Attributes:
+        _pool (ConnectionPool): Pool of connections to the SQLite database.
+        default_hash (Optional[str]): Hash of the menu registered for the default scope
+            at startup, if any.
+        _memory (dict[int, str]): Menu hash by chat ID.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        """
+        Initializes the cache with the given connection pool.
+
+        Args:
+            pool (ConnectionPool): Pool of connections to the SQLite database.
+        """
+        self._pool = pool
+        self.default_hash: Optional[str] = None
+        self._memory: dict[int, str] = {}
+
+    async def get(self, chat_id: int) -> Optional[str]:
+        """
+        Returns the hash of the menu last pushed to a chat.
+
+        Args:
+            chat_id (int): Telegram chat ID.
+
+        Returns:
+            Optional[str]: The menu hash, or None if nothing was recorded for the chat.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        menu_hash = self._memory.get(chat_id)
+        if menu_hash is not None:
+            return menu_hash
+
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute("SELECT menu_hash FROM chat_menus WHERE chat_id = ?", (chat_id,)) as cursor:
+                    row = await cursor.fetchone()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (chat_menus.get): {e}")
+            raise
+
+        if row is None:
+            return None
+        self._memory[chat_id] = row[0]
+        return row[0]
+
+    async def put(self, chat_id: int, menu_hash: str) -> None:
+        """
+        Records the menu pushed to a chat.
+
+        Args:
+            chat_id (int): Telegram chat ID.
+            menu_hash (str): Hash of the menu (see `message_sender.menu_hash`).
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                await db.execute(
+                    """
+                    INSERT INTO chat_menus (chat_id, menu_hash, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT(chat_id) DO UPDATE SET menu_hash = excluded.menu_hash, updated_at = excluded.updated_at
+                    """,
+                    (chat_id, menu_hash, time.time())
+                )
+                await db.commit()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (chat_menus.put): {e}")
+            raise
+
+        self._memory[chat_id] = menu_hash
@@ -0,0 +1,260 @@
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, Optional, Union
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+# SQL function decoding stored message content; used by the search view and the FTS triggers
+MESSAGE_TEXT_FUNCTION = "message_text"
+
+# First byte of compressed content: the format version
+FORMAT_ZLIB = 1
+FORMAT_ZLIB_DICTIONARY = 2
+
+# zlib back-references reach at most 32 KiB, so a longer preset dictionary is never used
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+_TOKEN = re.compile(r"\s*\S+")
+
+
+class MessageCodec:
+    """
+    Transparent compression of message content stored in `gpt_messages`.
+
+    Text shorter than `threshold_bytes` (in UTF-8) is stored as TEXT unchanged, so rows
+    written before compression existed need no conversion to be read. Longer text is
+    stored as a BLOB whose first byte is the format version:
+
+    - FORMAT_ZLIB: raw deflate stream.
+    - FORMAT_ZLIB_DICTIONARY: 4-byte big-endian dictionary ID, then a raw deflate stream
+      primed with that preset dictionary (see `train_dictionary`).
+
+    Compressed output is only kept when it is smaller than the text. Dictionaries live
+    in the `message_dictionaries` table; they are read on first use and re-read when
+    content refers to one not seen yet (e.g. trained by another process). Encoding always
+    uses the newest dictionary. `decode` is thread-safe and is also registered as the SQL
+    function MESSAGE_TEXT_FUNCTION on every connection.
+
+    Attributes:
+        _db_path (Path): Path to the SQLite database holding the dictionaries.
+        enabled (bool): Whether `encode` compresses (decoding always works).
+        _threshold_bytes (int): Minimum size of text worth compressing, in bytes.
+        _level (int): zlib compression level.
+        _dictionaries (dict[int, bytes]): Known preset dictionaries by ID.
+        _loaded (bool): Whether the dictionaries have been read from the database.
+        _load_lock (threading.Lock): Serializes reading the dictionaries.
+    """
+
+    def __init__(self, db_path: Path, enabled: bool = True, threshold_bytes: int = 256, level: int = 6):
+        """
+        Args:
+            db_path (Path): Path to the SQLite database holding the dictionaries.
+            enabled (bool): Whether `encode` compresses.
+            threshold_bytes (int): Minimum size of text worth compressing, in bytes.
+            level (int): zlib compression level (1-9).
+        """
+        self._db_path = db_path
+        self.enabled = enabled
+        self._threshold_bytes = threshold_bytes
+        self._level = level
+
+        self._dictionaries: dict[int, bytes] = {}
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    @property
+    def dictionary_id(self) -> Optional[int]:
+        """
+        Optional[int]: ID of the dictionary used for encoding, or None if there is none.
+        """
+        self._ensure_loaded()
+        return max(self._dictionaries) if self._dictionaries else None
+
+    def encode(self, text: str) -> Union[str, bytes]:
+        """
+        Converts message text to the value stored in `gpt_messages.content`.
+
+        Args:
+            text (str): Message text.
+
+        Returns:
+            Union[str, bytes]: The text itself, or the compressed BLOB if that is smaller.
+        """
+        data = text.encode("utf-8")
+        if not self.enabled or len(data) < self._threshold_bytes:
+            return text
+
+        dictionary_id = self.dictionary_id
+        if dictionary_id is None:
+            compressor = zlib.compressobj(self._level, zlib.DEFLATED, -15)
+            header = bytes([FORMAT_ZLIB])
+        else:
+            compressor = zlib.compressobj(self._level, zlib.DEFLATED, -15, zdict=self._dictionaries[dictionary_id])
+            header = bytes([FORMAT_ZLIB_DICTIONARY]) + dictionary_id.to_bytes(4, "big")
+
+        value = header + compressor.compress(data) + compressor.flush()
+        return value if len(value) < len(data) else text
+
+    def decode(self, value: Union[str, bytes, None]) -> Optional[str]:
+        """
+        Converts a stored `gpt_messages.content` value back to the message text.
+
+        Args:
+            value (Union[str, bytes, None]): Stored value.
+
+        Returns:
+            Optional[str]: The message text (None stays None, for SQL NULL).
+
+        Raises:
+            ValueError: If the format version or the dictionary is unknown, or the data is corrupt.
+        """
+        if value is None or isinstance(value, str):
+            return value
+
+        value = bytes(value)
+        if not value:
+            return ""
+
+        try:
+            if value[0] == FORMAT_ZLIB:
+                return zlib.decompress(value[1:], -15).decode("utf-8")
+
+            if value[0] == FORMAT_ZLIB_DICTIONARY:
+                dictionary_id = int.from_bytes(value[1:5], "big")
+                decompressor = zlib.decompressobj(-15, zdict=self._get_dictionary(dictionary_id))
+                return (decompressor.decompress(value[5:]) + decompressor.flush()).decode("utf-8")
+        except (zlib.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Corrupt message content: {e}") from e
+
+        raise ValueError(f"Unknown message content format: {value[0]}")
+
+    def needs_encoding(self, value: Union[str, bytes]) -> bool:
+        """
+        Tells whether re-encoding a stored value would change it
+        (e.g. raw text above the threshold, or compressed without the newest dictionary).
+
+        Args:
+            value (Union[str, bytes]): Stored value.
+
+        Returns:
+            bool: True if the value is worth re-encoding.
+        """
+        if not self.enabled:
+            return False
+        if isinstance(value, str):
+            return len(value.encode("utf-8")) >= self._threshold_bytes
+
+        dictionary_id = self.dictionary_id
+        if dictionary_id is None:
+            return False
+        return not (
+            value[0] == FORMAT_ZLIB_DICTIONARY
+            and int.from_bytes(value[1:5], "big") == dictionary_id
+        )
+
+    def add_dictionary(self, dictionary_id: int, data: bytes) -> None:
+        """
+        Makes a dictionary known (e.g. right after storing it), so it is used for encoding
+        if it is the newest.
+
+        Args:
+            dictionary_id (int): ID of the dictionary in `message_dictionaries`.
+            data (bytes): Dictionary content.
+        """
+        self._ensure_loaded()
+        self._dictionaries[dictionary_id] = data
+
+    @staticmethod
+    def train_dictionary(samples: Iterable[str], size: int = MAX_DICTIONARY_SIZE) -> bytes:
+        """
+        Builds a zlib preset dictionary from sample messages.
+
+        Counts runs of one to six whitespace-led tokens (field names of quiz payloads,
+        resume headings, common phrases) and keeps those saving the most bytes overall,
+        skipping runs already contained in a kept one. The most valuable runs go last,
+        where back-references to them are shortest.
+
+        Args:
+            samples (Iterable[str]): Sample message texts.
+            size (int): Maximum dictionary size, in bytes (at most MAX_DICTIONARY_SIZE).
+
+        Returns:
+            bytes: The dictionary (empty if the samples repeat nothing).
+        """
+        size = min(size, MAX_DICTIONARY_SIZE)
+        counts: Counter[str] = Counter()
+        for text in samples:
+            tokens = _TOKEN.findall(text)
+            for n in range(1, 7):
+                for i in range(len(tokens) - n + 1):
+                    counts["".join(tokens[i:i + n])] += 1
+
+        candidates = sorted(
+            ((count - 1) * len(run.encode("utf-8")), run) for run, count in counts.items() if count > 1
+        )
+
+        chosen: list[bytes] = []
+        used = 0
+        kept = ""
+        for _, run in reversed(candidates):
+            data = run.encode("utf-8")
+            if used + len(data) > size:
+                continue
+            if run in kept:
+                continue
+            chosen.append(data)
+            kept += run
+            used += len(data)
+            if used >= size:
+                break
+
+        return b"".join(reversed(chosen))
+
+    def _get_dictionary(self, dictionary_id: int) -> bytes:
+        """
+        Returns a dictionary by ID, re-reading the table once if it is unknown.
+
+        Args:
+            dictionary_id (int): Dictionary ID from the content header.
+
+        Returns:
+            bytes: Dictionary content.
+
+        Raises:
+            ValueError: If the dictionary does not exist.
+        """
+        self._ensure_loaded()
+        if dictionary_id not in self._dictionaries:
+            self._load()
+        try:
+            return self._dictionaries[dictionary_id]
+        except KeyError:
+            raise ValueError(f"Unknown compression dictionary: {dictionary_id}") from None
+
+    def _ensure_loaded(self) -> None:
+        """
+        Reads the dictionaries on first use.
+        """
+        if not self._loaded:
+            self._load()
+
+    def _load(self) -> None:
+        """
+        Reads all dictionaries from `message_dictionaries` (a missing table means none).
+        """
+        with self._load_lock:
+            try:
+                with closing(sqlite3.connect(self._db_path)) as conn:
+                    rows = conn.execute("SELECT id, data FROM message_dictionaries").fetchall()
+            except sqlite3.OperationalError as e:
+                logger.debug(f"No compression dictionaries loaded: {e}")
+                rows = []
+            self._dictionaries.update({row[0]: bytes(row[1]) for row in rows})
+            self._loaded = True
@@ -1,60 +1,480 @@
 import sqlite3
+from contextlib import closing
 from pathlib import Path
+from typing import Callable
+from db.compression import MESSAGE_TEXT_FUNCTION, MessageCodec
+from db.sharding import shard_paths
+from settings import get_logger
+
+
+logger = get_logger(__name__)
 
 
 class DatabaseInitializer:
     """
-    Initializes the SQLite database and creates necessary tables.
+    Initializes the SQLite database and keeps its schema up to date.
 
-    This class sets up the required schema for managing GPT conversation sessions
-    and storing message history, including OpenAI thread associations.
+    The schema version is stored in `PRAGMA user_version`. `migrate` applies the
+    steps in `MIGRATIONS` that the database has not seen yet, in order, each in its
+    own transaction together with the version bump, so an interrupted upgrade
+    resumes from the last completed step. With several shards, every shard file
+    (see `db.sharding.shard_paths`) gets the full schema. New files are also created
+    with `auto_vacuum = INCREMENTAL` for DatabaseMaintenance; existing files are
+    converted offline (see `db.maintenance.enable_incremental_vacuum`).
 
     Attributes:
-        _db_path (Path): Path to the SQLite database file.
+        _db_path (Path): Path to the SQLite database file (shard 0).
+        _paths (list[Path]): Database files to migrate, one per shard.
     """
 
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, shards: int = 1):
         """
         Initializes the DatabaseInitializer.
 
         Args:
             db_path (Path): Path to the SQLite database file.
+            shards (int): Number of database files the chat history is spread over.
         """
         self._db_path = db_path
+        self._paths = shard_paths(db_path, shards)
+
+    def migrate(self) -> int:
+        """
+        Creates the database files if needed and applies all pending migrations to each.
+
+        Returns:
+            int: Schema version after the migration (the lowest over the shards).
+
+        Raises:
+            sqlite3.Error: If a migration step fails (the step is rolled back).
+        """
+        return min(self._migrate_file(path) for path in self._paths)
 
-    def create_tables(self) -> None:
+    def _migrate_file(self, db_path: Path) -> int:
         """
-        Creates the `gpt_sessions` and `gpt_messages` tables if they don't exist.
+        Applies the pending migrations to one database file.
+
+        Args:
+            db_path (Path): Path to the SQLite database file.
 
-        - `gpt_sessions` stores user IDs, conversation modes, and OpenAI thread IDs.
-        - `gpt_messages` stores messages associated with a thread (user/system/assistant).
+        Returns:
+            int: Schema version of the file after the migration.
 
         Raises:
-            sqlite3.Error: If an error occurs during table creation.
-        """
-        with sqlite3.connect(self._db_path) as conn:
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS gpt_sessions (
-                    id INTEGER PRIMARY KEY,
-                    tg_user_id INTEGER NOT NULL,
-                    mode TEXT NOT NULL,
-                    openai_thread_id TEXT NOT NULL UNIQUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(tg_user_id, mode)
-                );
-            """)
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS gpt_messages (
-                    id INTEGER PRIMARY KEY,
-                    openai_thread_id TEXT NOT NULL,
-                    role TEXT NOT NULL CHECK(role IN ('user', 'assistant', 'system')),
-                    content TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(openai_thread_id) REFERENCES gpt_sessions(openai_thread_id) ON DELETE CASCADE
-                );
-            """)
-
-            conn.commit()
\ No newline at end of file
+            sqlite3.Error: If a migration step fails (the step is rolled back).
+        """
+        with closing(sqlite3.connect(db_path, isolation_level=None)) as conn:
+            # Before anything writes the file header, which fixes the auto-vacuum mode of a new file
+            self._check_incremental_vacuum(conn, db_path)
+            # WAL lets a long step (e.g. building an index) run without blocking readers
+            conn.execute("PRAGMA journal_mode = WAL;")
+            # Triggers and views on messages decode the content through this function
+            conn.create_function(MESSAGE_TEXT_FUNCTION, 1, MessageCodec(db_path).decode, deterministic=True)
+            version = conn.execute("PRAGMA user_version;").fetchone()[0]
+
+            if version > len(MIGRATIONS):
+                logger.warning(
+                    f"Database schema version {version} of {db_path} is newer than this code ({len(MIGRATIONS)})"
+                )
+                return version
+
+            for target, step in enumerate(MIGRATIONS[version:], start=version + 1):
+                conn.execute("BEGIN IMMEDIATE;")
+                try:
+                    step(conn)
+                    conn.execute(f"PRAGMA user_version = {target};")
+                    conn.execute("COMMIT;")
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK;")
+                    logger.error(f"Database Error (migration {target}, {step.__name__}): {e}")
+                    raise
+                logger.info(f"Database {db_path.name} migrated to version {target} ({step.__name__})")
+
+            return max(version, len(MIGRATIONS))
+
+    @staticmethod
+    def _check_incremental_vacuum(conn: sqlite3.Connection, db_path: Path) -> None:
+        """
+        Creates new files with `auto_vacuum = INCREMENTAL`, so DatabaseMaintenance can return
+        free pages to the file system in small steps.
+
+        An existing file would have to be rebuilt with VACUUM, which can take minutes on
+        a large database, so startup only logs how to convert it offline.
+
+        Args:
+            conn (sqlite3.Connection): Connection in autocommit mode.
+            db_path (Path): Path to the SQLite database file.
+        """
+        if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2:
+            return
+
+        # Takes effect only while the file is still empty
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2:
+            return
+
+        logger.warning(
+            f"Database {db_path.name} does not use incremental auto-vacuum, so freed space is not released; "
+            f"convert it with the bot stopped: cd src && python -m db.maintenance --enable-incremental-vacuum"
+        )
+
+
+def _create_tables(conn: sqlite3.Connection) -> None:
+    """
+    Version 1: creates the application tables if they don't exist.
+
+    - `gpt_sessions` stores user IDs, conversation modes, and OpenAI thread IDs.
+    - `gpt_messages` stores messages associated with a thread (user/system/assistant).
+    - `quiz_questions` stores pre-generated quiz questions by topic.
+    - `quiz_progress` stores, per user and topic, the ID of the last question served.
+    - `translation_cache` stores translations keyed by a hash of the request.
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS gpt_sessions (
+            id INTEGER PRIMARY KEY,
+            tg_user_id INTEGER NOT NULL,
+            mode TEXT NOT NULL,
+            openai_thread_id TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(tg_user_id, mode)
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS gpt_messages (
+            id INTEGER PRIMARY KEY,
+            openai_thread_id TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('user', 'assistant', 'system')),
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(openai_thread_id) REFERENCES gpt_sessions(openai_thread_id) ON DELETE CASCADE
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_questions (
+            id INTEGER PRIMARY KEY,
+            topic TEXT NOT NULL,
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_answer TEXT NOT NULL CHECK(correct_answer IN ('A', 'B', 'C', 'D')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(topic, question)
+        );
+    """)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_quiz_questions_topic_id ON quiz_questions(topic, id);
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_progress (
+            tg_user_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            last_question_id INTEGER NOT NULL,
+            PRIMARY KEY(tg_user_id, topic)
+        ) WITHOUT ROWID;
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS translation_cache (
+            key TEXT PRIMARY KEY,
+            language TEXT NOT NULL,
+            translation TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+    """)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_translation_cache_last_used ON translation_cache(last_used_at);
+    """)
+
+
+def _index_messages_by_thread(conn: sqlite3.Connection) -> None:
+    """
+    Version 2: indexes messages by thread, so reading and clearing one thread's
+    history no longer scans the whole table and is already in insertion order.
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_gpt_messages_thread_id ON gpt_messages(openai_thread_id, id);
+    """)
+
+
+def _add_session_usage(conn: sqlite3.Connection) -> None:
+    """
+    Version 3: adds `last_used_at` and `message_count` to sessions and fills them
+    from the stored messages (a lookup per session through the index of version 2).
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("ALTER TABLE gpt_sessions ADD COLUMN last_used_at TIMESTAMP;")
+    conn.execute("ALTER TABLE gpt_sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0;")
+    conn.execute("""
+        UPDATE gpt_sessions SET
+            message_count = (
+                SELECT COUNT(*) FROM gpt_messages
+                WHERE gpt_messages.openai_thread_id = gpt_sessions.openai_thread_id
+            ),
+            last_used_at = COALESCE(
+                (
+                    SELECT MAX(created_at) FROM gpt_messages
+                    WHERE gpt_messages.openai_thread_id = gpt_sessions.openai_thread_id
+                ),
+                created_at
+            );
+    """)
+
+
+def _index_message_text(conn: sqlite3.Connection) -> None:
+    """
+    Version 4: adds `gpt_messages_fts`, an FTS5 full-text index over message content.
+
+    Besides the content, every message is indexed with an `owner` token ("u<tg_user_id>"),
+    so a search can be restricted to one user's messages inside the index and ranks
+    only those. The index stores no copy of the text: it reads it back from the view
+    `gpt_messages_search`, and triggers keep it in sync with `gpt_messages`.
+
+    Deleting a session first deletes its messages, so the index triggers still find
+    the owner (a plain ON DELETE CASCADE would run after the session row is gone).
+
+    Messages already stored are not indexed here, which would block startup on a long
+    history: their ID range is recorded in `gpt_messages_fts_pending` and indexed in the
+    background by `GptThreadRepository.index_stored_messages`. The triggers leave rows
+    in that range to it, so no message is indexed twice or removed before it was indexed.
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS gpt_messages_fts_pending (
+            after_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL
+        );
+    """)
+    conn.execute("""
+        INSERT INTO gpt_messages_fts_pending (after_id, last_id)
+        SELECT 0, MAX(id) FROM gpt_messages HAVING MAX(id) IS NOT NULL;
+    """)
+
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS gpt_messages_search AS
+        SELECT gpt_messages.id AS id, gpt_messages.content AS content, 'u' || gpt_sessions.tg_user_id AS owner
+        FROM gpt_messages
+        JOIN gpt_sessions ON gpt_sessions.openai_thread_id = gpt_messages.openai_thread_id;
+    """)
+
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS gpt_messages_fts USING fts5(
+            content,
+            owner,
+            content='gpt_messages_search',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS gpt_messages_fts_insert AFTER INSERT ON gpt_messages BEGIN
+            INSERT INTO gpt_messages_fts(rowid, content, owner)
+            SELECT new.id, new.content, 'u' || tg_user_id FROM gpt_sessions
+            WHERE openai_thread_id = new.openai_thread_id
+            AND NOT EXISTS (SELECT 1 FROM gpt_messages_fts_pending WHERE new.id > after_id AND new.id <= last_id);
+        END;
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS gpt_messages_fts_delete AFTER DELETE ON gpt_messages BEGIN
+            INSERT INTO gpt_messages_fts(gpt_messages_fts, rowid, content, owner)
+            SELECT 'delete', old.id, old.content, 'u' || tg_user_id FROM gpt_sessions
+            WHERE openai_thread_id = old.openai_thread_id
+            AND NOT EXISTS (SELECT 1 FROM gpt_messages_fts_pending WHERE old.id > after_id AND old.id <= last_id);
+        END;
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS gpt_messages_fts_update AFTER UPDATE OF content ON gpt_messages BEGIN
+            INSERT INTO gpt_messages_fts(gpt_messages_fts, rowid, content, owner)
+            SELECT 'delete', old.id, old.content, 'u' || tg_user_id FROM gpt_sessions
+            WHERE openai_thread_id = old.openai_thread_id
+            AND NOT EXISTS (SELECT 1 FROM gpt_messages_fts_pending WHERE old.id > after_id AND old.id <= last_id);
+            INSERT INTO gpt_messages_fts(rowid, content, owner)
+            SELECT new.id, new.content, 'u' || tg_user_id FROM gpt_sessions
+            WHERE openai_thread_id = new.openai_thread_id
+            AND NOT EXISTS (SELECT 1 FROM gpt_messages_fts_pending WHERE new.id > after_id AND new.id <= last_id);
+        END;
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS gpt_sessions_delete_messages BEFORE DELETE ON gpt_sessions BEGIN
+            DELETE FROM gpt_messages WHERE openai_thread_id = old.openai_thread_id;
+        END;
+    """)
+
+
+def _compress_message_content(conn: sqlite3.Connection) -> None:
+    """
+    Version 5: prepares `gpt_messages.content` for compressed values (see MessageCodec).
+
+    Adds `message_dictionaries` for the preset compression dictionaries, and makes the
+    search view and the FTS triggers of version 4 read the content through the SQL
+    function `message_text`, which every connection registers. Re-encoding a message
+    (the same text, compressed) no longer touches the full-text index. Rows not yet
+    indexed (see version 4) are still left to the background indexing.
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS message_dictionaries (
+            id INTEGER PRIMARY KEY,
+            data BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+    conn.execute("DROP VIEW IF EXISTS gpt_messages_search;")
+    conn.execute("""
+        CREATE VIEW gpt_messages_search AS
+        SELECT gpt_messages.id AS id, message_text(gpt_messages.content) AS content,
+               'u' || gpt_sessions.tg_user_id AS owner
+        FROM gpt_messages
+        JOIN gpt_sessions ON gpt_sessions.openai_thread_id = gpt_messages.openai_thread_id;
+    """)
+
+    conn.execute("DROP TRIGGER IF EXISTS gpt_messages_fts_insert;")
+    conn.execute("""
+        CREATE TRIGGER gpt_messages_fts_insert AFTER INSERT ON gpt_messages BEGIN
+            INSERT INTO gpt_messages_fts(rowid, content, owner)
+            SELECT new.id, message_text(new.content), 'u' || tg_user_id FROM gpt_sessions
+            WHERE openai_thread_id = new.openai_thread_id
+            AND NOT EXISTS (SELECT 1 FROM gpt_messages_fts_pending WHERE new.id > after_id AND new.id <= last_id);
+        END;
+    """)
+
+    conn.execute("DROP TRIGGER IF EXISTS gpt_messages_fts_delete;")
+    conn.execute("""
+        CREATE TRIGGER gpt_messages_fts_delete AFTER DELETE ON gpt_messages BEGIN
+            INSERT INTO gpt_messages_fts(gpt_messages_fts, rowid, content, owner)
+            SELECT 'delete', old.id, message_text(old.content), 'u' || tg_user_id FROM gpt_sessions
+            WHERE openai_thread_id = old.openai_thread_id
+            AND NOT EXISTS (SELECT 1 FROM gpt_messages_fts_pending WHERE old.id > after_id AND old.id <= last_id);
+        END;
+    """)
+
+    conn.execute("DROP TRIGGER IF EXISTS gpt_messages_fts_update;")
+    conn.execute("""
+        CREATE TRIGGER gpt_messages_fts_update AFTER UPDATE OF content ON gpt_messages
+        WHEN message_text(old.content) IS NOT message_text(new.content) BEGIN
+            INSERT INTO gpt_messages_fts(gpt_messages_fts, rowid, content, owner)
+            SELECT 'delete', old.id, message_text(old.content), 'u' || tg_user_id FROM gpt_sessions
+            WHERE openai_thread_id = old.openai_thread_id
+            AND NOT EXISTS (SELECT 1 FROM gpt_messages_fts_pending WHERE old.id > after_id AND old.id <= last_id);
+            INSERT INTO gpt_messages_fts(rowid, content, owner)
+            SELECT new.id, message_text(new.content), 'u' || tg_user_id FROM gpt_sessions
+            WHERE openai_thread_id = new.openai_thread_id
+            AND NOT EXISTS (SELECT 1 FROM gpt_messages_fts_pending WHERE new.id > after_id AND new.id <= last_id);
+        END;
+    """)
+
+
+def _add_bot_persistence(conn: sqlite3.Connection) -> None:
+    """
+    Version 6: adds the tables of SqlitePersistence (user_data and conversation states).
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ptb_user_data (
+            user_id INTEGER PRIMARY KEY,
+            data BLOB NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ptb_conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID;
+    """)
+
+
+def _add_media_cache(conn: sqlite3.Connection) -> None:
+    """
+    Version 7: adds `media_cache`, the Telegram `file_id`s of uploaded images (see MediaCache).
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_cache (
+            name TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (name, content_hash)
+        ) WITHOUT ROWID;
+    """)
+
+
+def _add_chat_menus(conn: sqlite3.Connection) -> None:
+    """
+    Version 8: adds `chat_menus`, the hash of the command menu last pushed to each chat (see ChatMenuCache).
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chat_menus (
+            chat_id INTEGER PRIMARY KEY,
+            menu_hash TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+
+
+def _add_quiz_seen(conn: sqlite3.Connection) -> None:
+    """
+    Version 9: adds `quiz_seen`, questions a user has seen above their `quiz_progress` watermark.
+
+    A question generated live for a user can get a higher ID than bank questions the
+    user has not seen yet; it is recorded here instead of moving the watermark past them.
+
+    Args:
+        conn (sqlite3.Connection): Connection inside the migration transaction.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_seen (
+            tg_user_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            PRIMARY KEY(tg_user_id, topic, question_id)
+        ) WITHOUT ROWID;
+    """)
+
+# Ordered schema migrations: step N upgrades the database from version N-1 to N
+MIGRATIONS: list[Callable[[sqlite3.Connection], None]] = [
+    _create_tables,
+    _index_messages_by_thread,
+    _add_session_usage,
+    _index_message_text,
+    _compress_message_content,
+    _add_bot_persistence,
+    _add_media_cache,
+    _add_chat_menus,
+    _add_quiz_seen,
+]
@@ -0,0 +1,278 @@
+import argparse
+import os
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+import aiosqlite
+from db.pool import ConnectionPool
+from db.sharding import shard_paths
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class DatabaseMaintenance:
+    """
+    Housekeeping of one SQLite database: WAL checkpoints, incremental vacuum and planner statistics.
+
+    Every task runs on a connection of the pool and is bounded by a time budget, so it
+    only ever holds the database briefly:
+
+    - `checkpoint`: copies the WAL back into the database. PASSIVE never waits for
+      readers or writers; TRUNCATE also empties the WAL file, waiting at most the budget
+      for the database lock.
+    - `incremental_vacuum`: returns free pages to the file system a chunk at a time
+      (requires `auto_vacuum = INCREMENTAL`: new files get it from DatabaseInitializer,
+      existing ones from `enable_incremental_vacuum`).
+    - `optimize`: refreshes the statistics of the query planner with `PRAGMA optimize`,
+      sampling at most `analysis_limit` rows per index (a full ANALYZE the first time).
+
+    Each task logs its duration and the bytes it reclaimed.
+
+    Attributes:
+        _pool (ConnectionPool): Pool of connections to the database.
+        _budget_s (float): Time budget of each task, in seconds.
+        _vacuum_pages (int): Pages freed per incremental_vacuum step.
+        _analysis_limit (int): Rows sampled per index by ANALYZE.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        budget_ms: int = 200,
+        vacuum_pages: int = 256,
+        analysis_limit: int = 1000
+    ):
+        """
+        Args:
+            pool (ConnectionPool): Pool of connections to the database.
+            budget_ms (int): Time budget of each task, in milliseconds.
+            vacuum_pages (int): Pages freed per incremental_vacuum step.
+            analysis_limit (int): Rows sampled per index by ANALYZE.
+        """
+        self._pool = pool
+        self._budget_s = budget_ms / 1000
+        self._vacuum_pages = vacuum_pages
+        self._analysis_limit = analysis_limit
+
+    async def checkpoint(self, mode: str = "PASSIVE") -> int:
+        """
+        Checkpoints the WAL.
+
+        Args:
+            mode (str): "PASSIVE" (never waits) or "TRUNCATE" (empties the WAL file,
+                waiting at most the time budget for the lock).
+
+        Returns:
+            int: Bytes by which the WAL file shrank.
+
+        Raises:
+            ValueError: If the mode is not supported.
+            aiosqlite.Error: If a database error occurs.
+        """
+        if mode not in ("PASSIVE", "TRUNCATE"):
+            raise ValueError(f"Unsupported checkpoint mode: {mode}")
+
+        started = time.perf_counter()
+        try:
+            async with self._pool.acquire() as db:
+                wal_path = await self._wal_path(db)
+                wal_before = _file_size(wal_path)
+                async with db.execute("PRAGMA busy_timeout;") as cursor:
+                    busy_timeout_ms = (await cursor.fetchone())[0]
+                await db.execute(f"PRAGMA busy_timeout = {int(self._budget_s * 1000)};")
+                try:
+                    async with db.execute(f"PRAGMA wal_checkpoint({mode});") as cursor:
+                        busy, wal_pages, checkpointed = await cursor.fetchone()
+                finally:
+                    await db.execute(f"PRAGMA busy_timeout = {busy_timeout_ms};")
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (checkpoint): {e}")
+            raise
+
+        reclaimed = max(wal_before - _file_size(wal_path), 0)
+        logger.info(
+            f"Checkpoint {mode} in {(time.perf_counter() - started) * 1000:.0f} ms: "
+            f"{checkpointed}/{wal_pages} WAL pages copied{' (busy)' if busy else ''}, {reclaimed} bytes reclaimed"
+        )
+        return reclaimed
+
+    async def incremental_vacuum(self) -> int:
+        """
+        Releases free pages to the file system until none are left or the time budget is spent.
+
+        Returns:
+            int: Bytes released.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        started = time.perf_counter()
+        released = 0
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute("PRAGMA auto_vacuum;") as cursor:
+                    if (await cursor.fetchone())[0] != 2:
+                        logger.warning("Incremental vacuum skipped: auto_vacuum is not INCREMENTAL")
+                        return 0
+                async with db.execute("PRAGMA page_size;") as cursor:
+                    page_size = (await cursor.fetchone())[0]
+
+                while time.perf_counter() - started < self._budget_s:
+                    free_before = await self._freelist_count(db)
+                    if not free_before:
+                        break
+                    # Each step is its own short write transaction. executescript runs the pragma
+                    # to completion; a plain execute stops after the first page.
+                    await db.executescript(f"PRAGMA incremental_vacuum({int(self._vacuum_pages)});")
+                    freed = free_before - await self._freelist_count(db)
+                    if freed <= 0:
+                        break
+                    released += freed * page_size
+                remaining = await self._freelist_count(db)
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (incremental_vacuum): {e}")
+            raise
+
+        logger.info(
+            f"Incremental vacuum in {(time.perf_counter() - started) * 1000:.0f} ms: "
+            f"{released} bytes released, {remaining} free pages left"
+        )
+        return released
+
+    async def optimize(self) -> None:
+        """
+        Refreshes the statistics of the query planner (a sampled ANALYZE if there are none yet).
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        started = time.perf_counter()
+        try:
+            async with self._pool.acquire() as db:
+                await db.execute(f"PRAGMA analysis_limit = {int(self._analysis_limit)};")
+                async with db.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+                ) as cursor:
+                    has_statistics = await cursor.fetchone() is not None
+
+                await db.executescript("PRAGMA optimize;" if has_statistics else "ANALYZE;")
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (optimize): {e}")
+            raise
+
+        logger.info(
+            f"{'PRAGMA optimize' if has_statistics else 'ANALYZE'} in "
+            f"{(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    async def run_all(self) -> None:
+        """
+        Runs the off-peak tasks: truncating checkpoint, incremental vacuum, then statistics.
+        A failing task is logged and does not prevent the next ones.
+        """
+        for task in (lambda: self.checkpoint("TRUNCATE"), self.incremental_vacuum, self.optimize):
+            try:
+                await task()
+            except aiosqlite.Error:
+                continue
+
+    @staticmethod
+    async def _wal_path(db: aiosqlite.Connection) -> str:
+        """
+        Returns the path of the connection's WAL file.
+
+        Args:
+            db (aiosqlite.Connection): Open connection.
+
+        Returns:
+            str: Path of the `-wal` file next to the main database.
+        """
+        async with db.execute("PRAGMA database_list;") as cursor:
+            rows = await cursor.fetchall()
+        return next(row[2] for row in rows if row[1] == "main") + "-wal"
+
+    @staticmethod
+    async def _freelist_count(db: aiosqlite.Connection) -> int:
+        """
+        Returns the number of unused pages in the database file.
+
+        Args:
+            db (aiosqlite.Connection): Open connection.
+
+        Returns:
+            int: Free pages.
+        """
+        async with db.execute("PRAGMA freelist_count;") as cursor:
+            return (await cursor.fetchone())[0]
+
+
+def _file_size(path: str) -> int:
+    """
+    Returns the size of a file, 0 if it does not exist.
+
+    Args:
+        path (str): File path.
+
+    Returns:
+        int: Size in bytes.
+    """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def enable_incremental_vacuum(db_path: Path, shards: int = 1) -> int:
+    """
+    Switches every database file to `auto_vacuum = INCREMENTAL`, rebuilding it with VACUUM.
+
+    VACUUM rewrites the whole file under an exclusive lock, which can take minutes on a
+    large database, so run it with the bot stopped. Files already in this mode are skipped,
+    so running it again is safe.
+
+    Args:
+        db_path (Path): Path to the SQLite database file (shard 0).
+        shards (int): Number of database files the chat history is spread over.
+
+    Returns:
+        int: Number of files converted.
+
+    Raises:
+        sqlite3.Error: If VACUUM fails.
+    """
+    converted = 0
+    for path in shard_paths(db_path, shards):
+        if not path.exists():
+            continue
+        with closing(sqlite3.connect(path, isolation_level=None)) as conn:
+            if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2:
+                continue
+
+            started = time.perf_counter()
+            try:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+                conn.execute("VACUUM;")
+            except sqlite3.Error as e:
+                logger.error(f"Database Error (enable_incremental_vacuum, {path.name}): {e}")
+                raise
+        logger.info(f"Database {path.name} switched to incremental vacuum in {time.perf_counter() - started:.1f} s")
+        converted += 1
+    return converted
+
+
+if __name__ == "__main__":
+    from settings import config
+
+    parser = argparse.ArgumentParser(description="Offline maintenance of the bot's SQLite files (stop the bot first).")
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        required=True,
+        help="rebuild the files with auto_vacuum = INCREMENTAL, so daily maintenance can release free space"
+    )
+    args = parser.parse_args()
+
+    print(f"Converted {enable_incremental_vacuum(config.path_to_db, config.db_shards)} database files")
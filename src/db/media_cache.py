@@ -0,0 +1,124 @@
+import time
+from typing import Optional
+import aiosqlite
+from db.pool import ConnectionPool
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class MediaCache:
+    """
+    Telegram `file_id`s of uploaded media, kept in memory in front of a SQLite table.
+
+    Once a file has been uploaded, Telegram can send it again by `file_id` without the
+    bytes. Entries are keyed by resource name and a hash of the file content, so
+    editing the file on disk makes the old entry unreachable; storing the new `file_id`
+    deletes the entries of the older content.
+
+    Attributes:
+        _pool (ConnectionPool): Pool of connections to the SQLite database.
+        _memory (dict[tuple[str, str], str]): `file_id` by (name, content hash).
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        """
+        Initializes the cache with the given connection pool.
+
+        Args:
+            pool (ConnectionPool): Pool of connections to the SQLite database.
+        """
+        self._pool = pool
+        self._memory: dict[tuple[str, str], str] = {}
+
+    async def get(self, name: str, content_hash: str) -> Optional[str]:
+        """
+        Returns the `file_id` of a resource's current content, if it was uploaded before.
+
+        Args:
+            name (str): Resource name (e.g. "quiz").
+            content_hash (str): Hash of the file content.
+
+        Returns:
+            Optional[str]: The `file_id`, or None.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        file_id = self._memory.get((name, content_hash))
+        if file_id is not None:
+            return file_id
+
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    "SELECT file_id FROM media_cache WHERE name = ? AND content_hash = ?",
+                    (name, content_hash)
+                ) as cursor:
+                    row = await cursor.fetchone()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (media_cache.get): {e}")
+            raise
+
+        if row is None:
+            return None
+        self._memory[(name, content_hash)] = row[0]
+        return row[0]
+
+    async def put(self, name: str, content_hash: str, file_id: str) -> None:
+        """
+        Stores the `file_id` of a resource's content, replacing those of older content.
+
+        Args:
+            name (str): Resource name.
+            content_hash (str): Hash of the file content.
+            file_id (str): `file_id` returned by Telegram for the upload.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                await db.execute(
+                    "DELETE FROM media_cache WHERE name = ? AND content_hash != ?",
+                    (name, content_hash)
+                )
+                await db.execute(
+                    """
+                    INSERT INTO media_cache (name, content_hash, file_id, created_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(name, content_hash) DO UPDATE SET
+                        file_id = excluded.file_id, created_at = excluded.created_at
+                    """,
+                    (name, content_hash, file_id, time.time())
+                )
+                await db.commit()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (media_cache.put): {e}")
+            raise
+
+        self._memory = {key: value for key, value in self._memory.items() if key[0] != name}
+        self._memory[(name, content_hash)] = file_id
+
+    async def drop(self, name: str, content_hash: str) -> None:
+        """
+        Forgets a `file_id` Telegram no longer accepts (e.g. after the bot token changed).
+
+        Args:
+            name (str): Resource name.
+            content_hash (str): Hash of the file content.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        self._memory.pop((name, content_hash), None)
+        try:
+            async with self._pool.acquire() as db:
+                await db.execute(
+                    "DELETE FROM media_cache WHERE name = ? AND content_hash = ?",
+                    (name, content_hash)
+                )
+                await db.commit()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (media_cache.drop): {e}")
+            raise
@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import json
+import pickle
+import time
+from typing import Optional
+import aiosqlite
+from telegram.ext import BasePersistence, PersistenceInput
+from telegram.ext._utils.types import ConversationDict, ConversationKey, CDCData
+from db.pool import ConnectionPool
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+_UPSERT_USER_DATA = """
+    INSERT INTO ptb_user_data (user_id, data, updated_at) VALUES (?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+"""
+
+_UPSERT_CONVERSATION = """
+    INSERT INTO ptb_conversations (name, key, state, updated_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT(name, key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+"""
+
+
+def _digest(data: bytes) -> bytes:
+    """
+    Returns a short fingerprint of serialized data, to tell whether it changed.
+
+    Args:
+        data (bytes): Serialized data.
+
+    Returns:
+        bytes: 16-byte BLAKE2b digest.
+    """
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class SqlitePersistence(BasePersistence[dict, dict, dict]):
+    """
+    Persistence of `user_data` and conversation states in SQLite tables, written incrementally.
+
+    PTB hands over the data of the users touched since the last run every `update_interval`
+    seconds. Each user's data is pickled and compared with a fingerprint of what is
+    stored; only users whose data changed are kept as dirty, and all dirty users and
+    conversation states are written shortly after in one transaction. A flush therefore
+    costs in proportion to the users active in the interval, not to all users stored
+    (PicklePersistence rewrites the whole file).
+
+    Chat data, bot data (which holds the bot's services) and callback data are not stored.
+
+    Attributes:
+        _pool (ConnectionPool): Pool of connections to the SQLite database.
+        _flush_delay_s (float): Delay that gathers the updates of one persistence run into one write.
+        _stored (dict[int, bytes]): Fingerprint of the stored data of each user.
+        _dirty_users (dict[int, Optional[bytes]]): Pickled data to write by user ID (None deletes the row).
+        _dirty_conversations (dict[tuple[str, str], Optional[str]]): JSON state to write by
+            (conversation name, JSON key); None deletes the row.
+        _flush_task (asyncio.Task | None): Scheduled write, if any.
+        _flush_lock (asyncio.Lock): Serializes writes, so newer data is never overwritten by older.
+    """
+
+    def __init__(self, pool: ConnectionPool, update_interval: float = 60, flush_delay_ms: int = 100):
+        """
+        Args:
+            pool (ConnectionPool): Pool of connections to the SQLite database.
+            update_interval (float): Seconds between two runs of PTB's persistence job.
+            flush_delay_ms (int): Delay that gathers the updates of one persistence run into one write.
+        """
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self._pool = pool
+        self._flush_delay_s = flush_delay_ms / 1000
+
+        self._stored: dict[int, bytes] = {}
+        self._dirty_users: dict[int, Optional[bytes]] = {}
+        self._dirty_conversations: dict[tuple[str, str], Optional[str]] = {}
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    async def get_user_data(self) -> dict[int, dict]:
+        """
+        Loads the stored data of all users.
+
+        Returns:
+            dict[int, dict]: User data by user ID.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute("SELECT user_id, data FROM ptb_user_data") as cursor:
+                    rows = await cursor.fetchall()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (get_user_data): {e}")
+            raise
+
+        user_data = {}
+        for user_id, data in rows:
+            try:
+                user_data[user_id] = pickle.loads(data)
+            except Exception as e:
+                logger.warning(f"Persistence: dropping unreadable data of user {user_id}: {e}")
+                continue
+            self._stored[user_id] = _digest(data)
+        logger.info(f"Persistence: loaded data of {len(user_data)} users")
+        return user_data
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        """
+        Marks a user's data for writing if it differs from what is stored.
+
+        Args:
+            user_id (int): Telegram user ID.
+            data (dict): The user's current data.
+        """
+        try:
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.warning(f"Persistence: data of user {user_id} is not picklable: {e}")
+            return
+
+        if self._stored.get(user_id) == _digest(payload) and user_id not in self._dirty_users:
+            return
+        self._dirty_users[user_id] = payload
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        """
+        Marks a user's stored data for deletion.
+
+        Args:
+            user_id (int): Telegram user ID.
+        """
+        self._dirty_users[user_id] = None
+        self._schedule_flush()
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """
+        Does nothing: the data in memory is the reference, the table only mirrors it.
+        """
+
+    async def get_conversations(self, name: str) -> ConversationDict:
+        """
+        Loads the stored states of a conversation handler.
+
+        Args:
+            name (str): Name of the ConversationHandler.
+
+        Returns:
+            ConversationDict: State by conversation key.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute("SELECT key, state FROM ptb_conversations WHERE name = ?", (name,)) as cursor:
+                    rows = await cursor.fetchall()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (get_conversations): {e}")
+            raise
+
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        """
+        Marks a conversation state for writing (None, the conversation ended, deletes it).
+
+        Args:
+            name (str): Name of the ConversationHandler.
+            key (ConversationKey): Conversation key (chat and/or user IDs).
+            new_state (Optional[object]): New state (a JSON-serializable value).
+        """
+        state = None if new_state is None else json.dumps(new_state)
+        self._dirty_conversations[(name, json.dumps(list(key)))] = state
+        self._schedule_flush()
+
+    async def flush(self) -> None:
+        """
+        Writes the pending changes now (PTB calls this on shutdown).
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await asyncio.shield(self._write())
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        """
+        Chat data is not stored.
+        """
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        """
+        Chat data is not stored.
+        """
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        """
+        Chat data is not stored.
+        """
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        """
+        Chat data is not stored.
+        """
+
+    async def get_bot_data(self) -> dict:
+        """
+        Bot data is not stored (it holds the bot's services).
+        """
+        return {}
+
+    async def update_bot_data(self, data: dict) -> None:
+        """
+        Bot data is not stored.
+        """
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        """
+        Bot data is not stored.
+        """
+
+    async def get_callback_data(self) -> Optional[CDCData]:
+        """
+        Callback data is not stored.
+        """
+        return None
+
+    async def update_callback_data(self, data: CDCData) -> None:
+        """
+        Callback data is not stored.
+        """
+
+    def _schedule_flush(self) -> None:
+        """
+        Makes sure a write runs within `flush_delay_ms`.
+        """
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after())
+
+    async def _flush_after(self) -> None:
+        """
+        Waits for the rest of the persistence run, then writes.
+        """
+        await asyncio.sleep(self._flush_delay_s)
+        await asyncio.shield(self._write())
+
+    async def _write(self) -> None:
+        """
+        Writes the dirty users and conversation states in one transaction.
+
+        If the transaction fails, the changes are put back (unless newer ones arrived)
+        and retried with the next write.
+        """
+        async with self._flush_lock:
+            if not self._dirty_users and not self._dirty_conversations:
+                return
+            users, self._dirty_users = self._dirty_users, {}
+            conversations, self._dirty_conversations = self._dirty_conversations, {}
+
+            now = time.time()
+            try:
+                async with self._pool.acquire() as db:
+                    await db.executemany(
+                        _UPSERT_USER_DATA,
+                        [(user_id, data, now) for user_id, data in users.items() if data is not None]
+                    )
+                    await db.executemany(
+                        "DELETE FROM ptb_user_data WHERE user_id = ?",
+                        [(user_id,) for user_id, data in users.items() if data is None]
+                    )
+                    await db.executemany(
+                        _UPSERT_CONVERSATION,
+                        [(name, key, state, now) for (name, key), state in conversations.items() if state is not None]
+                    )
+                    await db.executemany(
+                        "DELETE FROM ptb_conversations WHERE name = ? AND key = ?",
+                        [(name, key) for (name, key), state in conversations.items() if state is None]
+                    )
+                    await db.commit()
+            except aiosqlite.Error as e:
+                logger.error(f"Database Error (persistence flush): {e}")
+                self._dirty_users = {**users, **self._dirty_users}
+                self._dirty_conversations = {**conversations, **self._dirty_conversations}
+                return
+
+            for user_id, data in users.items():
+                if data is None:
+                    self._stored.pop(user_id, None)
+                else:
+                    self._stored[user_id] = _digest(data)
+            logger.debug(f"Persistence: wrote {len(users)} users and {len(conversations)} conversation states")
@@ -0,0 +1,166 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional
+import aiosqlite
+from db.compression import MESSAGE_TEXT_FUNCTION, MessageCodec
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class ConnectionPool:
+    """
+    Pool of long-lived aiosqlite connections shared by the repositories.
+
+    Opening a connection starts a background thread and re-reads the schema, so the
+    repositories borrow open connections instead of connecting on every call. Each
+    connection is configured once: WAL journal mode (readers do not block the writer),
+    `synchronous=NORMAL`, foreign keys, a larger page cache and memory-mapped I/O.
+    Prepared statements are reused through the per-connection statement cache of sqlite3.
+    The codec of the stored message content is registered as an SQL function, which
+    the schema's search view and triggers call.
+
+    Attributes:
+        codec (MessageCodec): Codec of `gpt_messages.content`, shared with the repositories.
+        _db_path (Path): Path to the SQLite database.
+        _size (int): Number of connections.
+        _cache_size_kib (int): Page cache size per connection, in KiB.
+        _mmap_size (int): Bytes of the database file mapped into memory per connection.
+        _busy_timeout_s (float): How long a write waits for the database lock.
+        _cached_statements (int): Number of prepared statements cached per connection.
+        _connections (list[aiosqlite.Connection]): All open connections.
+        _idle (asyncio.Queue[aiosqlite.Connection] | None): Connections not currently borrowed.
+        _open_lock (asyncio.Lock): Makes concurrent `open` calls connect only once.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        size: int = 4,
+        cache_size_kib: int = 16 * 1024,
+        mmap_size: int = 64 * 1024 * 1024,
+        busy_timeout_s: float = 5.0,
+        cached_statements: int = 256,
+        codec: Optional[MessageCodec] = None
+    ):
+        """
+        Initializes the pool. Connections are opened by `open` (or by the first `acquire`).
+
+        Args:
+            db_path (Path): Path to the SQLite database.
+            size (int): Number of connections.
+            cache_size_kib (int): Page cache size per connection, in KiB.
+            mmap_size (int): Bytes of the database file mapped into memory per connection (0 disables mmap).
+            busy_timeout_s (float): How long a write waits for the database lock.
+            cached_statements (int): Number of prepared statements cached per connection.
+            codec (MessageCodec, optional): Codec of message content. Defaults to one that
+                decodes but does not compress.
+        """
+        self.codec = codec or MessageCodec(db_path, enabled=False)
+        self._db_path = db_path
+        self._size = size
+        self._cache_size_kib = cache_size_kib
+        self._mmap_size = mmap_size
+        self._busy_timeout_s = busy_timeout_s
+        self._cached_statements = cached_statements
+
+        self._connections: list[aiosqlite.Connection] = []
+        self._idle: asyncio.Queue[aiosqlite.Connection] | None = None
+        self._open_lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        """
+        Opens and configures the connections. Does nothing if the pool is already open.
+
+        Raises:
+            aiosqlite.Error: If a connection cannot be opened.
+        """
+        async with self._open_lock:
+            if self._idle is not None:
+                return
+
+            idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+            try:
+                for _ in range(self._size):
+                    db = await aiosqlite.connect(
+                        self._db_path,
+                        timeout=self._busy_timeout_s,
+                        cached_statements=self._cached_statements
+                    )
+                    self._connections.append(db)
+                    await self._configure(db)
+                    idle.put_nowait(db)
+            except aiosqlite.Error as e:
+                logger.error(f"Database Error (pool.open): {e}")
+                await self._close_connections()
+                raise
+
+            self._idle = idle
+            logger.info(f"Opened {self._size} SQLite connections to {self._db_path}")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Borrows a connection for the duration of the block.
+
+        A transaction left open by a failing block is rolled back before the
+        connection is returned, so the next borrower starts clean.
+
+        Yields:
+            aiosqlite.Connection: An open connection.
+
+        Raises:
+            aiosqlite.Error: If the pool has to be opened and a connection cannot be opened.
+        """
+        if self._idle is None:
+            await self.open()
+
+        idle = self._idle
+        db = await idle.get()
+        try:
+            yield db
+        except BaseException:
+            if db.in_transaction:
+                try:
+                    await db.rollback()
+                except aiosqlite.Error as e:
+                    logger.warning(f"Database Error (pool.rollback): {e}")
+            raise
+        finally:
+            idle.put_nowait(db)
+
+    async def close(self) -> None:
+        """
+        Closes all connections. The pool can be opened again afterwards.
+        """
+        async with self._open_lock:
+            self._idle = None
+            await self._close_connections()
+
+    async def _configure(self, db: aiosqlite.Connection) -> None:
+        """
+        Applies the connection settings.
+
+        Args:
+            db (aiosqlite.Connection): Newly opened connection.
+        """
+        await db.execute("PRAGMA journal_mode = WAL;")
+        await db.execute("PRAGMA synchronous = NORMAL;")
+        await db.execute("PRAGMA foreign_keys = ON;")
+        await db.execute("PRAGMA temp_store = MEMORY;")
+        await db.execute(f"PRAGMA cache_size = {-int(self._cache_size_kib)};")
+        await db.execute(f"PRAGMA mmap_size = {int(self._mmap_size)};")
+        await db.create_function(MESSAGE_TEXT_FUNCTION, 1, self.codec.decode, deterministic=True)
+
+    async def _close_connections(self) -> None:
+        """
+        Closes every open connection, logging failures.
+        """
+        connections, self._connections = self._connections, []
+        for db in connections:
+            try:
+                await db.close()
+            except aiosqlite.Error as e:
+                logger.warning(f"Database Error (pool.close): {e}")
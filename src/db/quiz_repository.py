@@ -0,0 +1,201 @@
+import json
+from typing import Optional
+import aiosqlite
+from db.pool import ConnectionPool
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class QuizQuestionRepository:
+    """
+    Repository for the persistent quiz question bank in SQLite.
+
+    Questions are stored per topic and served to each user in insertion order.
+    The set of questions a user has seen is kept compactly as a watermark per
+    (user, topic), the ID of the last question served in order, plus the few
+    questions seen above it (`quiz_seen`, e.g. questions generated live for the user).
+    New questions always get higher IDs, so a user never receives the same question
+    twice and never skips one stored while another was being generated.
+
+    Attributes:
+        _pool (ConnectionPool): Pool of connections to the SQLite database.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        """
+        Initializes the repository with the given connection pool.
+
+        Args:
+            pool (ConnectionPool): Pool of connections to the SQLite database.
+        """
+        self._pool = pool
+
+    async def add_questions(self, topic: str, questions: list[tuple[str, dict[str, str], str]]) -> list[int]:
+        """
+        Adds generated questions to the bank, skipping ones already stored for the topic.
+
+        Args:
+            topic (str): Quiz topic (e.g. "science").
+            questions (list[tuple[str, dict[str, str], str]]): Tuples of question text,
+                answer options and the correct answer letter.
+
+        Returns:
+            list[int]: IDs of the stored questions, in the given order (existing duplicates included).
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                await db.executemany(
+                    """
+                    INSERT OR IGNORE INTO quiz_questions (topic, question, options, correct_answer)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    [(topic, question, json.dumps(options), correct) for question, options, correct in questions]
+                )
+                await db.commit()
+
+                ids = []
+                for question, _, _ in questions:
+                    async with db.execute(
+                        "SELECT id FROM quiz_questions WHERE topic = ? AND question = ?",
+                        (topic, question)
+                    ) as cursor:
+                        row = await cursor.fetchone()
+                    ids.append(row[0])
+                return ids
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (add_questions): {e}")
+            raise
+
+    async def next_question(self, tg_user_id: int, topic: str) -> Optional[dict]:
+        """
+        Returns the next question the user has not seen and marks it as seen.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            topic (str): Quiz topic.
+
+        Returns:
+            Optional[dict]: Question with 'id', 'question', 'options' and 'correct_answer',
+                or None if the user has seen every stored question of the topic.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    """
+                    SELECT id, question, options, correct_answer FROM quiz_questions
+                    WHERE topic = ? AND id > COALESCE(
+                        (SELECT last_question_id FROM quiz_progress WHERE tg_user_id = ? AND topic = ?), 0
+                    )
+                    AND id NOT IN (SELECT question_id FROM quiz_seen WHERE tg_user_id = ? AND topic = ?)
+                    ORDER BY id
+                    LIMIT 1
+                    """,
+                    (topic, tg_user_id, topic, tg_user_id, topic)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                if row is None:
+                    return None
+
+                # Every question between the old watermark and this one is in quiz_seen
+                await self._mark_seen(db, tg_user_id, topic, row[0])
+                await db.execute(
+                    "DELETE FROM quiz_seen WHERE tg_user_id = ? AND topic = ? AND question_id <= ?",
+                    (tg_user_id, topic, row[0])
+                )
+                await db.commit()
+
+            return {"id": row[0], "question": row[1], "options": json.loads(row[2]), "correct_answer": row[3]}
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (next_question): {e}")
+            raise
+
+    async def mark_seen(self, tg_user_id: int, topic: str, question_id: int) -> None:
+        """
+        Records a question served to the user outside `next_question`.
+
+        The watermark is left where it is, so unseen questions with lower IDs are
+        still served; the question is skipped when `next_question` reaches it.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            topic (str): Quiz topic.
+            question_id (int): ID of the question served to the user.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                await db.execute(
+                    """
+                    INSERT OR IGNORE INTO quiz_seen (tg_user_id, topic, question_id)
+                    SELECT ?, ?, ?
+                    WHERE ? > COALESCE(
+                        (SELECT last_question_id FROM quiz_progress WHERE tg_user_id = ? AND topic = ?), 0
+                    )
+                    """,
+                    (tg_user_id, topic, question_id, question_id, tg_user_id, topic)
+                )
+                await db.commit()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (mark_seen): {e}")
+            raise
+
+    async def count_stock(self, topic: str) -> int:
+        """
+        Counts questions of the topic not yet seen by the user who is furthest ahead.
+
+        Args:
+            topic (str): Quiz topic.
+
+        Returns:
+            int: Number of questions every user still has available.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    """
+                    SELECT COUNT(*) FROM quiz_questions
+                    WHERE topic = ? AND id > COALESCE(
+                        (SELECT MAX(last_question_id) FROM quiz_progress WHERE topic = ?), 0
+                    )
+                    """,
+                    (topic, topic)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                return row[0]
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (count_stock): {e}")
+            raise
+
+    @staticmethod
+    async def _mark_seen(db: aiosqlite.Connection, tg_user_id: int, topic: str, question_id: int) -> None:
+        """
+        Upserts the user's watermark, never moving it backwards.
+
+        Args:
+            db (aiosqlite.Connection): Open connection (the caller commits).
+            tg_user_id (int): Telegram user ID.
+            topic (str): Quiz topic.
+            question_id (int): ID of the question served to the user.
+        """
+        await db.execute(
+            """
+            INSERT INTO quiz_progress (tg_user_id, topic, last_question_id)
+            VALUES (?, ?, ?)
+            ON CONFLICT(tg_user_id, topic)
+            DO UPDATE SET last_question_id = MAX(last_question_id, excluded.last_question_id)
+            """,
+            (tg_user_id, topic, question_id)
+        )
@@ -0,0 +1,143 @@
+import argparse
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from db.compression import MESSAGE_TEXT_FUNCTION, MessageCodec
+from db.initializer import DatabaseInitializer
+from db.sharding import shard_for_user, shard_paths
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+_COPY_SESSIONS = """
+    INSERT INTO target.gpt_sessions (tg_user_id, mode, openai_thread_id, created_at, last_used_at, message_count)
+    SELECT tg_user_id, mode, openai_thread_id, created_at, last_used_at, message_count
+    FROM main.gpt_sessions WHERE openai_thread_id IN (SELECT openai_thread_id FROM temp.moving)
+"""
+
+_DELETE_SESSIONS = """
+    DELETE FROM {schema}.gpt_sessions WHERE openai_thread_id IN ({thread_ids})
+"""
+
+# Content is copied as text: compressed values refer to dictionaries of the source shard
+_COPY_MESSAGES = """
+    INSERT INTO target.gpt_messages (openai_thread_id, role, content, created_at)
+    SELECT openai_thread_id, role, message_text(content), created_at
+    FROM main.gpt_messages WHERE openai_thread_id IN (SELECT openai_thread_id FROM temp.moving)
+    ORDER BY id
+"""
+
+
+def rebalance_shards(db_path: Path, old_shards: int, new_shards: int, batch_size: int = 500) -> int:
+    """
+    Moves every user's sessions and messages to the shard they belong to with `new_shards` shards.
+
+    Run it with the bot stopped, then start the bot with the new number of shards. Sessions
+    are moved in batches; each batch is first removed from the target (in case an earlier
+    run was interrupted), copied, then deleted from the source, so running the tool again
+    after a failure is safe. Moved messages are stored uncompressed and get compressed by
+    the bot's background job. Files of shards beyond `new_shards` are left empty.
+
+    Args:
+        db_path (Path): Path to the main SQLite database (shard 0).
+        old_shards (int): Number of shards the data is spread over now.
+        new_shards (int): Number of shards to spread it over.
+        batch_size (int): Number of sessions moved per transaction.
+
+    Returns:
+        int: Number of sessions moved.
+
+    Raises:
+        sqlite3.Error: If a database error occurs (the current batch is rolled back).
+    """
+    old_paths = shard_paths(db_path, old_shards)
+    new_paths = shard_paths(db_path, new_shards)
+    DatabaseInitializer(db_path, shards=max(old_shards, new_shards)).migrate()
+
+    moved = 0
+    for source_index, source_path in enumerate(old_paths):
+        with closing(sqlite3.connect(source_path, isolation_level=None)) as conn:
+            conn.execute("PRAGMA foreign_keys = ON;")
+            conn.create_function(MESSAGE_TEXT_FUNCTION, 1, MessageCodec(source_path).decode, deterministic=True)
+            conn.execute("CREATE TEMP TABLE moving (openai_thread_id TEXT PRIMARY KEY);")
+
+            last_id = 0
+            while True:
+                rows = conn.execute(
+                    "SELECT id, tg_user_id, openai_thread_id FROM gpt_sessions WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                by_target: dict[int, list[str]] = {}
+                for _, tg_user_id, thread_id in rows:
+                    target_index = shard_for_user(tg_user_id, new_shards)
+                    if target_index != source_index:
+                        by_target.setdefault(target_index, []).append(thread_id)
+
+                for target_index, thread_ids in by_target.items():
+                    moved += _move_sessions(conn, new_paths[target_index], thread_ids)
+
+            logger.info(f"Shard {source_index} ({source_path.name}) rebalanced")
+
+    logger.info(f"Rebalanced {old_shards} → {new_shards} shards: moved {moved} sessions")
+    return moved
+
+
+def _move_sessions(conn: sqlite3.Connection, target_path: Path, thread_ids: list[str]) -> int:
+    """
+    Moves sessions and their messages from the connection's database to another shard.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the source shard (autocommit mode).
+        target_path (Path): Database file of the target shard.
+        thread_ids (list[str]): Thread IDs of the sessions to move.
+
+    Returns:
+        int: Number of sessions moved.
+
+    Raises:
+        sqlite3.Error: If a database error occurs (the move is rolled back).
+    """
+    placeholders = ", ".join("?" * len(thread_ids))
+
+    # Leftovers of an interrupted run (deleting a session deletes its messages). Done on a
+    # connection of the target, whose codec decodes the content for the full-text index.
+    with closing(sqlite3.connect(target_path)) as target:
+        target.execute("PRAGMA foreign_keys = ON;")
+        target.create_function(MESSAGE_TEXT_FUNCTION, 1, MessageCodec(target_path).decode, deterministic=True)
+        with target:
+            target.execute(_DELETE_SESSIONS.format(schema="main", thread_ids=placeholders), thread_ids)
+
+    conn.execute("ATTACH DATABASE ? AS target;", (str(target_path),))
+    try:
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            conn.execute("DELETE FROM temp.moving;")
+            conn.executemany("INSERT INTO temp.moving (openai_thread_id) VALUES (?)", [(t,) for t in thread_ids])
+            conn.execute(_COPY_SESSIONS)
+            conn.execute(_COPY_MESSAGES)
+            conn.execute(_DELETE_SESSIONS.format(schema="main", thread_ids=placeholders), thread_ids)
+            conn.execute("COMMIT;")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK;")
+            logger.error(f"Database Error (rebalance to {target_path.name}): {e}")
+            raise
+    finally:
+        conn.execute("DETACH DATABASE target;")
+    return len(thread_ids)
+
+
+if __name__ == "__main__":
+    from settings import config
+
+    parser = argparse.ArgumentParser(description="Moves chat history between shards after DB_SHARDS changes.")
+    parser.add_argument("--from-shards", type=int, required=True, help="number of shards the data is spread over now")
+    parser.add_argument("--to-shards", type=int, required=True, help="number of shards to spread it over")
+    parser.add_argument("--batch-size", type=int, default=500, help="sessions moved per transaction")
+    args = parser.parse_args()
+
+    print(f"Moved {rebalance_shards(config.path_to_db, args.from_shards, args.to_shards, args.batch_size)} sessions")
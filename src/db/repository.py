@@ -1,11 +1,72 @@
-from pathlib import Path
-from typing import List, Optional
+import asyncio
+import re
+import weakref
+from collections import Counter, OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Union
 import aiosqlite
+from db.compression import MAX_DICTIONARY_SIZE, MessageCodec
+from db.pool import ConnectionPool
 from settings import get_logger
 
 
 logger = get_logger(__name__)
 
+_INSERT_MESSAGE = """
+    INSERT INTO gpt_messages (openai_thread_id, role, content)
+    VALUES (?, ?, ?)
+"""
+
+_COUNT_MESSAGES = """
+    UPDATE gpt_sessions
+    SET message_count = message_count + ?, last_used_at = CURRENT_TIMESTAMP
+    WHERE openai_thread_id = ?
+"""
+
+_UPSERT_SESSION = """
+    INSERT INTO gpt_sessions (tg_user_id, mode, openai_thread_id, last_used_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(tg_user_id, mode) DO UPDATE SET last_used_at = CURRENT_TIMESTAMP
+    RETURNING openai_thread_id
+"""
+
+
+_SEARCH_MESSAGES = """
+    SELECT m.id, s.mode, m.role, snippet(gpt_messages_fts, 0, ?, ?, '…', ?), m.created_at
+    FROM gpt_messages_fts
+    JOIN gpt_messages AS m ON m.id = gpt_messages_fts.rowid
+    JOIN gpt_sessions AS s ON s.openai_thread_id = m.openai_thread_id
+    WHERE gpt_messages_fts MATCH ? AND s.tg_user_id = ?
+    ORDER BY rank
+    LIMIT ? OFFSET ?
+"""
+
+# Marks the matched terms in search snippets; never part of stored text
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+
+def _match_query(tg_user_id: int, text: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 query matching the user's messages that contain every word.
+
+    Each word is quoted, so FTS5 operators and punctuation in the text are taken
+    literally. The last word also matches as a prefix (e.g. while still typing).
+    The `owner` term restricts the match to the user inside the index.
+
+    Args:
+        tg_user_id (int): Telegram user ID.
+        text (str): Search text entered by the user.
+
+    Returns:
+        Optional[str]: The MATCH expression, or None if the text has no words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return f'owner : "u{int(tg_user_id)}" AND content : ({" ".join(terms)})'
+
 
 class GptThreadRepository:
     """
@@ -14,23 +75,79 @@ class GptThreadRepository:
     This class handles thread lookup/creation and stores all messages exchanged
     between the user and assistant in an OpenAI thread.
 
+    Messages are written behind: `add_message` buffers the row, and the buffer is
+    inserted with one `executemany` in a single transaction once `batch_size` rows are
+    waiting or `flush_interval_ms` has passed. Reads flush the buffer first, so they
+    always see every message added before them. Call `close` at shutdown to flush.
+
+    Thread IDs are cached in a bounded LRU by (user, mode), so looking up the thread
+    of an active user costs no SQL.
+
+    Message content goes through the pool's MessageCodec: long messages are stored
+    compressed and decoded on read. Rows stored before compression was enabled are
+    re-encoded in the background by `compress_stored_messages`. Likewise, messages
+    stored before the full-text index existed are indexed by `index_stored_messages`.
+
     Attributes:
-        _db_path (Path): Path to the SQLite database.
+        _pool (ConnectionPool): Pool of connections to the SQLite database.
+        _batch_size (int): Number of buffered messages that triggers a flush.
+        _flush_interval_s (float): Longest time a message stays in the buffer, in seconds.
+        _synchronous (bool): Write every message in its own transaction (no buffering).
+        _buffer (list[tuple[str, str, Union[str, bytes]]]): Encoded messages waiting to be inserted.
+        _flush_task (asyncio.Task | None): Scheduled or running flush, if any.
+        _flush_lock (asyncio.Lock): Serializes flushes, so messages are inserted in order.
+        _session_cache_size (int): Number of (user, mode) → thread ID entries kept in memory.
+        _sessions (OrderedDict[tuple[int, str], str]): Cached thread IDs, least recently used first.
+        _session_locks (weakref.WeakValueDictionary[tuple[int, str], asyncio.Lock]): Per-key locks
+            of `get_or_create_thread`, dropped when no caller holds them.
     """
 
-    def __init__(self, db_path: Path):
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        batch_size: int = 100,
+        flush_interval_ms: int = 50,
+        synchronous: bool = False,
+        session_cache_size: int = 10000
+    ):
         """
-        Initializes the repository with the given database path.
+        Initializes the repository with the given connection pool.
 
         Args:
-            db_path (Path): Path to the SQLite database.
+            pool (ConnectionPool): Pool of connections to the SQLite database.
+            batch_size (int): Number of buffered messages that triggers a flush.
+            flush_interval_ms (int): Longest time a message stays in the buffer, in milliseconds.
+            synchronous (bool): Write every message in its own transaction (e.g. for tests).
+            session_cache_size (int): Number of (user, mode) → thread ID entries kept in memory.
         """
-        self._db_path = db_path
+        self._pool = pool
+        self._batch_size = batch_size
+        self._flush_interval_s = flush_interval_ms / 1000
+        self._synchronous = synchronous
+
+        self._buffer: list[tuple[str, str, Union[str, bytes]]] = []
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+        self._session_cache_size = session_cache_size
+        self._sessions: OrderedDict[tuple[int, str], str] = OrderedDict()
+        self._session_locks: weakref.WeakValueDictionary[tuple[int, str], asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+
+    @property
+    def codec(self) -> MessageCodec:
+        """
+        MessageCodec: Codec of the stored message content (the pool's).
+        """
+        return self._pool.codec
 
     async def get_thread_id(self, tg_user_id: int, mode: str) -> Optional[str]:
         """
         Returns the OpenAI thread ID for a user and mode, if it exists.
 
+        Served from the in-memory cache when possible.
+
         Args:
             tg_user_id (int): Telegram user ID.
             mode (str): Chat mode (e.g. "gpt", "random").
@@ -41,108 +158,354 @@ class GptThreadRepository:
         Raises:
             aiosqlite.Error: If a database error occurs.
         """
-        try:
-            async with aiosqlite.connect(self._db_path) as db:
-                await db.execute("PRAGMA foreign_keys = ON;")
+        key = (tg_user_id, mode)
+        thread_id = self._sessions.get(key)
+        if thread_id is not None:
+            self._sessions.move_to_end(key)
+            return thread_id
 
-                cursor = await db.execute(
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
                     """
                     SELECT openai_thread_id FROM gpt_sessions
                     WHERE tg_user_id = ? AND mode = ?
                     """,
                     (tg_user_id, mode)
-                )
-                row = await cursor.fetchone()
-
-                return row[0] if row else None
+                ) as cursor:
+                    row = await cursor.fetchone()
         except aiosqlite.Error as e:
             logger.error(f"Database Error (get_thread_id): {e}")
             raise
 
-    async def create_thread(self, tg_user_id: int, mode: str, openai_thread_id: str) -> None:
+        if row is None:
+            return None
+        self._remember_session(key, row[0])
+        return row[0]
+
+    async def get_thread_owner(self, openai_thread_id: str) -> Optional[int]:
+        """
+        Returns the Telegram user ID of the session holding a thread, if it exists.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+
+        Returns:
+            Optional[int]: The Telegram user ID if found, else None.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    "SELECT tg_user_id FROM gpt_sessions WHERE openai_thread_id = ?",
+                    (openai_thread_id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (get_thread_owner): {e}")
+            raise
+
+        return row[0] if row else None
+
+    async def create_thread(self, tg_user_id: int, mode: str, openai_thread_id: str) -> str:
         """
         Creates a new thread record in the database.
 
+        If the user already has a thread in the mode (e.g. created concurrently),
+        the existing record is kept and its thread ID returned.
+
         Args:
             tg_user_id (int): Telegram user ID.
             mode (str): Chat mode.
             openai_thread_id (str): ID of the created OpenAI thread.
 
+        Returns:
+            str: The thread ID stored for the user and mode.
+
         Raises:
             aiosqlite.Error: If a database error occurs.
         """
         try:
-            async with aiosqlite.connect(self._db_path) as db:
-                await db.execute("PRAGMA foreign_keys = ON;")
-
-                await db.execute(
-                    """
-                    INSERT INTO gpt_sessions (tg_user_id, mode, openai_thread_id)
-                    VALUES (?, ?, ?)
-                    """,
-                    (tg_user_id, mode, openai_thread_id)
-                )
+            async with self._pool.acquire() as db:
+                async with db.execute(_UPSERT_SESSION, (tg_user_id, mode, openai_thread_id)) as cursor:
+                    row = await cursor.fetchone()
                 await db.commit()
         except aiosqlite.Error as e:
             logger.error(f"Database Error (create_thread): {e}")
             raise
 
+        if row[0] != openai_thread_id:
+            logger.warning(f"Thread {openai_thread_id} not stored: user {tg_user_id} already has {row[0]} in {mode}")
+        self._remember_session((tg_user_id, mode), row[0])
+        return row[0]
+
+    async def get_or_create_thread(
+        self,
+        tg_user_id: int,
+        mode: str,
+        factory: Callable[[], Awaitable[str]]
+    ) -> str:
+        """
+        Returns the user's thread ID for the mode, creating the thread on first use.
+
+        Cached thread IDs are returned without any SQL. On a miss, concurrent callers for
+        the same user and mode wait on one lock, so only one of them calls `factory`.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            mode (str): Chat mode.
+            factory (Callable[[], Awaitable[str]]): Creates a thread and returns its ID
+                (e.g. OpenAIClient.acquire_thread_id).
+
+        Returns:
+            str: The thread ID stored for the user and mode.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+            Exception: Whatever `factory` raises (e.g. OpenAIError).
+        """
+        key = (tg_user_id, mode)
+        thread_id = self._sessions.get(key)
+        if thread_id is not None:
+            self._sessions.move_to_end(key)
+            return thread_id
+
+        lock = self._session_locks.get(key)
+        if lock is None:
+            lock = self._session_locks[key] = asyncio.Lock()
+
+        async with lock:
+            thread_id = await self.get_thread_id(tg_user_id, mode)
+            if thread_id is None:
+                thread_id = await self.create_thread(tg_user_id, mode, await factory())
+            return thread_id
+
     async def add_message(self, openai_thread_id: str, role: str, content: str) -> None:
         """
         Adds a message to the thread's message history.
 
+        The message is buffered and written by the next flush, unless the
+        repository is synchronous.
+
         Args:
             openai_thread_id (str): OpenAI thread ID.
             role (str): Role of the message sender ("user", "assistant", "system").
             content (str): Message text content.
 
+        Raises:
+            aiosqlite.Error: If a database error occurs (synchronous mode only).
+        """
+        content = self.codec.encode(content)
+        if self._synchronous:
+            try:
+                async with self._pool.acquire() as db:
+                    await self._insert_messages(db, [(openai_thread_id, role, content)])
+                    await db.commit()
+            except aiosqlite.Error as e:
+                logger.error(f"Database Error (add_message): {e}")
+                raise
+            return
+
+        self._buffer.append((openai_thread_id, role, content))
+        if len(self._buffer) >= self._batch_size:
+            self._schedule_flush(0)
+        else:
+            self._schedule_flush(self._flush_interval_s)
+
+    async def flush(self) -> None:
+        """
+        Inserts all buffered messages in one transaction.
+
+        If the batch is rejected (e.g. a message refers to a deleted thread), the messages
+        are inserted one by one and only the failing ones are dropped. The write is shielded,
+        so cancelling the caller (e.g. a cancelled request) does not lose the batch.
+        """
+        await asyncio.shield(self._write_buffer())
+
+    async def close(self) -> None:
+        """
+        Stops the flush timer and writes the buffered messages.
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def get_messages(self, openai_thread_id: str) -> List[dict]:
+        """
+        Retrieves all messages for a given thread, in the order they were added.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+
+        Returns:
+            List[dict]: List of messages as dicts with 'role' and 'content'.
+
         Raises:
             aiosqlite.Error: If a database error occurs.
         """
+        await self.flush()
         try:
-            async with aiosqlite.connect(self._db_path) as db:
-                await db.execute(
+            async with self._pool.acquire() as db:
+                async with db.execute(
                     """
-                    INSERT INTO gpt_messages (openai_thread_id, role, content)
-                    VALUES (?, ?, ?)
+                    SELECT role, content FROM gpt_messages
+                    WHERE openai_thread_id = ?
+                    ORDER BY id
                     """,
-                    (openai_thread_id, role, content)
-                )
-                await db.commit()
+                    (openai_thread_id,)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+
+            decode = self.codec.decode
+            return [{"role": row[0], "content": decode(row[1])} for row in rows]
         except aiosqlite.Error as e:
-            logger.error(f"Database Error (add_message): {e}")
+            logger.error(f"Database Error (get_messages): {e}")
             raise
 
-    async def get_messages(self, openai_thread_id: str) -> List[dict]:
+    async def iter_messages(
+        self,
+        openai_thread_id: str,
+        after_id: Optional[int] = None,
+        batch: int = 500
+    ) -> AsyncIterator[dict]:
         """
-        Retrieves all messages for a given thread, ordered by time.
+        Streams a thread's messages in the order they were added, one page at a time.
+
+        Pages are read by keyset pagination on the message ID through the thread index,
+        so memory stays constant however long the history is. No connection is held
+        between pages.
 
         Args:
             openai_thread_id (str): OpenAI thread ID.
+            after_id (int, optional): Start after this message ID (e.g. to resume an export).
+            batch (int): Number of messages read per query.
+
+        Yields:
+            dict: Message with 'id', 'role' and 'content'.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        await self.flush()
+        last_id = after_id if after_id is not None else 0
+        while True:
+            try:
+                async with self._pool.acquire() as db:
+                    async with db.execute(
+                        """
+                        SELECT id, role, content FROM gpt_messages
+                        WHERE openai_thread_id = ? AND id > ?
+                        ORDER BY id
+                        LIMIT ?
+                        """,
+                        (openai_thread_id, last_id, batch)
+                    ) as cursor:
+                        rows = await cursor.fetchall()
+            except aiosqlite.Error as e:
+                logger.error(f"Database Error (iter_messages): {e}")
+                raise
+
+            decode = self.codec.decode
+            for row in rows:
+                yield {"id": row[0], "role": row[1], "content": decode(row[2])}
+
+            if len(rows) < batch:
+                return
+            last_id = rows[-1][0]
+
+    async def get_recent_messages(self, openai_thread_id: str, n: int) -> List[dict]:
+        """
+        Retrieves the last `n` messages of a thread, oldest first.
+
+        The rows are read newest-first through the thread index, so the cost
+        depends on `n`, not on the length of the history.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+            n (int): Number of messages.
 
         Returns:
-            List[dict]: List of messages as dicts with 'role' and 'content'.
+            List[dict]: Messages as dicts with 'id', 'role' and 'content'.
 
         Raises:
             aiosqlite.Error: If a database error occurs.
         """
+        await self.flush()
         try:
-            async with aiosqlite.connect(self._db_path) as db:
-                cursor = await db.execute(
+            async with self._pool.acquire() as db:
+                async with db.execute(
                     """
-                    SELECT role, content FROM gpt_messages
+                    SELECT id, role, content FROM gpt_messages
                     WHERE openai_thread_id = ?
-                    ORDER BY created_at
+                    ORDER BY id DESC
+                    LIMIT ?
                     """,
-                    (openai_thread_id,)
-                )
-                rows = await cursor.fetchall()
+                    (openai_thread_id, n)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (get_recent_messages): {e}")
+            raise
+
+        decode = self.codec.decode
+        return [{"id": row[0], "role": row[1], "content": decode(row[2])} for row in reversed(rows)]
+
+    async def search_messages(
+        self,
+        tg_user_id: int,
+        query: str,
+        limit: int = 5,
+        offset: int = 0,
+        snippet_tokens: int = 16
+    ) -> List[dict]:
+        """
+        Searches the messages of all the user's threads, best matches first.
+
+        Uses the FTS5 index `gpt_messages_fts`, restricted to the user inside the index,
+        so the cost depends on how many of the user's messages contain the words, not on
+        the size of the table. Matched terms
+        in the snippets are wrapped in HIGHLIGHT_START and HIGHLIGHT_END.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            query (str): Words to search for (free text, not FTS5 syntax).
+            limit (int): Maximum number of results.
+            offset (int): Number of best results to skip (for pagination).
+            snippet_tokens (int): Maximum number of words per snippet.
 
-            return [{"role": row[0], "content": row[1]} for row in rows]
+        Returns:
+            List[dict]: Results as dicts with 'id', 'mode', 'role', 'snippet' and 'created_at'.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        match = _match_query(tg_user_id, query)
+        if match is None:
+            return []
+
+        await self.flush()
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    _SEARCH_MESSAGES,
+                    (HIGHLIGHT_START, HIGHLIGHT_END, snippet_tokens, match, tg_user_id, limit, offset)
+                ) as cursor:
+                    rows = await cursor.fetchall()
         except aiosqlite.Error as e:
-            logger.error(f"Database Error (get_messages): {e}")
+            logger.error(f"Database Error (search_messages): {e}")
             raise
 
+        return [
+            {"id": row[0], "mode": row[1], "role": row[2], "snippet": row[3], "created_at": row[4]}
+            for row in rows
+        ]
+
     async def clear_thread(self, openai_thread_id: str) -> None:
         """Deletes all messages associated with a thread.
 
@@ -152,13 +515,277 @@ class GptThreadRepository:
         Raises:
             aiosqlite.Error: If a database error occurs.
         """
+        await self.flush()
         try:
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._pool.acquire() as db:
                 await db.execute(
                     "DELETE FROM gpt_messages WHERE openai_thread_id = ?",
                     (openai_thread_id,)
                 )
+                await db.execute(
+                    "UPDATE gpt_sessions SET message_count = 0 WHERE openai_thread_id = ?",
+                    (openai_thread_id,)
+                )
                 await db.commit()
         except aiosqlite.Error as e:
             logger.error(f"Database Error (clear_thread): {e}")
             raise
+
+    async def train_compression_dictionary(
+        self,
+        sample_size: int = 1000,
+        size: int = MAX_DICTIONARY_SIZE
+    ) -> Optional[int]:
+        """
+        Trains a compression dictionary on the latest messages and makes it the one used for encoding.
+
+        Args:
+            sample_size (int): Number of latest messages to learn from.
+            size (int): Maximum dictionary size, in bytes.
+
+        Returns:
+            Optional[int]: ID of the new dictionary, or None if the messages are too few
+                (less text than the dictionary size) or repeat nothing.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        codec = self.codec
+        samples = [message["content"] for message in await self._latest_messages(sample_size)]
+        if sum(len(sample) for sample in samples) < size:
+            return None
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, codec.train_dictionary, samples, size)
+        if not data:
+            return None
+
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    "INSERT INTO message_dictionaries (data) VALUES (?) RETURNING id",
+                    (data,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                await db.commit()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (train_compression_dictionary): {e}")
+            raise
+
+        codec.add_dictionary(row[0], data)
+        logger.info(f"Trained compression dictionary {row[0]} ({len(data)} bytes) on {len(samples)} messages")
+        return row[0]
+
+    async def compress_stored_messages(self, after_id: int = 0, batch_size: int = 500) -> Optional[int]:
+        """
+        Re-encodes one batch of stored messages with the current codec settings.
+
+        This is the online migration of existing rows: each call reads the next `batch_size`
+        messages by ID and rewrites those stored raw above the threshold, or compressed with
+        an older dictionary, in one short transaction. The text is unchanged, so the
+        full-text index is not touched. Compression runs in a worker thread.
+
+        Args:
+            after_id (int): Continue after this message ID (0 starts from the beginning).
+            batch_size (int): Number of messages read per call.
+
+        Returns:
+            Optional[int]: The ID to pass as `after_id` next time, or None when the pass is complete.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        codec = self.codec
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    "SELECT id, content FROM gpt_messages WHERE id > ? ORDER BY id LIMIT ?",
+                    (after_id, batch_size)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (compress_stored_messages): {e}")
+            raise
+
+        def reencode() -> list[tuple[Union[str, bytes], int]]:
+            updates = []
+            for message_id, content in rows:
+                if codec.needs_encoding(content):
+                    encoded = codec.encode(codec.decode(content))
+                    if encoded != content:
+                        updates.append((encoded, message_id))
+            return updates
+
+        loop = asyncio.get_running_loop()
+        updates = await loop.run_in_executor(None, reencode)
+
+        if updates:
+            try:
+                async with self._pool.acquire() as db:
+                    await db.executemany("UPDATE gpt_messages SET content = ? WHERE id = ?", updates)
+                    await db.commit()
+            except aiosqlite.Error as e:
+                logger.error(f"Database Error (compress_stored_messages): {e}")
+                raise
+
+        if len(rows) < batch_size:
+            return None
+        return rows[-1][0]
+
+    async def index_stored_messages(self, batch_size: int = 2000) -> Optional[int]:
+        """
+        Adds one batch of the messages stored before the full-text index existed to it.
+
+        The range still to index is kept in `gpt_messages_fts_pending` (see migration
+        version 4); each call indexes the next `batch_size` messages of it and moves the
+        start of the range in the same short transaction, so search gradually covers
+        the old history without blocking startup.
+
+        Args:
+            batch_size (int): Number of messages indexed per call.
+
+        Returns:
+            Optional[int]: ID of the last indexed message, or None when nothing is left to index.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute("SELECT rowid, after_id, last_id FROM gpt_messages_fts_pending") as cursor:
+                    pending = await cursor.fetchone()
+                if pending is None:
+                    return None
+                rowid, after_id, last_id = pending
+
+                async with db.execute(
+                    "SELECT id FROM gpt_messages WHERE id > ? AND id <= ? ORDER BY id LIMIT 1 OFFSET ?",
+                    (after_id, last_id, batch_size - 1)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                upper = row[0] if row else last_id
+
+                await db.execute(
+                    """
+                    INSERT INTO gpt_messages_fts(rowid, content, owner)
+                    SELECT id, content, owner FROM gpt_messages_search WHERE id > ? AND id <= ?
+                    """,
+                    (after_id, upper)
+                )
+                if upper >= last_id:
+                    await db.execute("DELETE FROM gpt_messages_fts_pending WHERE rowid = ?", (rowid,))
+                else:
+                    await db.execute("UPDATE gpt_messages_fts_pending SET after_id = ? WHERE rowid = ?", (upper, rowid))
+                await db.commit()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (index_stored_messages): {e}")
+            raise
+
+        return upper
+
+    async def _latest_messages(self, n: int) -> List[dict]:
+        """
+        Retrieves the last `n` messages of all threads, newest first.
+
+        Args:
+            n (int): Number of messages.
+
+        Returns:
+            List[dict]: Messages as dicts with 'id', 'role' and 'content'.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        await self.flush()
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    "SELECT id, role, content FROM gpt_messages ORDER BY id DESC LIMIT ?",
+                    (n,)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (latest_messages): {e}")
+            raise
+
+        decode = self.codec.decode
+        return [{"id": row[0], "role": row[1], "content": decode(row[2])} for row in rows]
+
+    def _schedule_flush(self, delay: float) -> None:
+        """
+        Makes sure a flush runs within `delay` seconds.
+
+        Args:
+            delay (float): Seconds to wait before flushing (0 flushes right away).
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            if delay > 0:
+                return
+            self._flush_task.cancel()
+        self._flush_task = asyncio.create_task(self._flush_after(delay))
+
+    async def _flush_after(self, delay: float) -> None:
+        """
+        Waits, then flushes the buffer, repeating while messages keep arriving.
+
+        Args:
+            delay (float): Seconds to wait before the first flush.
+        """
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.flush()
+        if self._buffer:
+            self._flush_task = None
+            self._schedule_flush(0 if len(self._buffer) >= self._batch_size else self._flush_interval_s)
+
+    async def _write_buffer(self) -> None:
+        """
+        Takes the buffered messages and inserts them; see `flush`.
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+
+            try:
+                async with self._pool.acquire() as db:
+                    await self._insert_messages(db, batch)
+                    await db.commit()
+                return
+            except aiosqlite.Error as e:
+                logger.warning(f"Database Error (flush): {e}; inserting {len(batch)} messages one by one")
+
+            async with self._pool.acquire() as db:
+                for row in batch:
+                    try:
+                        await self._insert_messages(db, [row])
+                        await db.commit()
+                    except aiosqlite.Error as e:
+                        logger.error(f"Database Error (flush): dropped message for thread {row[0]}: {e}")
+                        await db.rollback()
+
+    @staticmethod
+    async def _insert_messages(db: aiosqlite.Connection, rows: list[tuple[str, str, Union[str, bytes]]]) -> None:
+        """
+        Inserts messages and updates the message count and last use of their sessions.
+
+        Args:
+            db (aiosqlite.Connection): Open connection (the caller commits).
+            rows (list[tuple[str, str, Union[str, bytes]]]): Messages as (thread ID, role, encoded content), in order.
+        """
+        await db.executemany(_INSERT_MESSAGE, rows)
+        counts = Counter(thread_id for thread_id, _, _ in rows)
+        await db.executemany(_COUNT_MESSAGES, [(count, thread_id) for thread_id, count in counts.items()])
+
+    def _remember_session(self, key: tuple[int, str], thread_id: str) -> None:
+        """
+        Caches a thread ID, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (tuple[int, str]): Telegram user ID and chat mode.
+            thread_id (str): OpenAI thread ID.
+        """
+        self._sessions[key] = thread_id
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self._session_cache_size:
+            self._sessions.popitem(last=False)
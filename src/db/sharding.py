@@ -0,0 +1,328 @@
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from db.repository import GptThreadRepository
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping and Veach): maps a key to one of `buckets` buckets.
+
+    When the number of buckets grows from N to N + 1, only 1 / (N + 1) of the keys move,
+    all of them to the new bucket, so rebalancing copies as little as possible.
+
+    Args:
+        key (int): Key to place (taken modulo 2**64).
+        buckets (int): Number of buckets (at least 1).
+
+    Returns:
+        int: Bucket index in [0, buckets).
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_user(tg_user_id: int, shards: int) -> int:
+    """
+    Returns the shard holding a user's threads and messages.
+
+    Args:
+        tg_user_id (int): Telegram user ID.
+        shards (int): Number of shards.
+
+    Returns:
+        int: Shard index in [0, shards).
+    """
+    return jump_hash(tg_user_id, shards)
+
+
+def shard_paths(db_path: Path, shards: int) -> list[Path]:
+    """
+    Returns the database files of the shards.
+
+    Shard 0 is `db_path` itself (which also keeps the tables that are not sharded,
+    e.g. the quiz bank), and shard i is `<stem>.<i><suffix>` next to it, whatever the
+    number of shards, so a single-shard setup uses the usual file.
+
+    Args:
+        db_path (Path): Path to the main SQLite database.
+        shards (int): Number of shards.
+
+    Returns:
+        list[Path]: One path per shard, in shard order.
+    """
+    return [db_path] + [db_path.with_name(f"{db_path.stem}.{i}{db_path.suffix}") for i in range(1, shards)]
+
+
+class ShardedGptThreadRepository:
+    """
+    GptThreadRepository spread over several SQLite files, partitioned by Telegram user ID.
+
+    Each shard is a full GptThreadRepository with its own connection pool and write-behind
+    queue, so users on different shards never wait for the same database lock. Sessions
+    are placed with `shard_for_user`; calls that only carry a thread ID are routed through
+    an LRU of thread ID → shard filled by the session lookups, asking every shard for the
+    owner of an unknown thread.
+
+    The public methods are those of GptThreadRepository; compression runs per shard (see `shards`).
+
+    Attributes:
+        shards (list[GptThreadRepository]): Repository of each shard, in shard order.
+        _thread_cache_size (int): Number of thread ID → shard entries kept in memory.
+        _thread_shards (OrderedDict[str, int]): Shard of recently used threads, least recently used first.
+    """
+
+    def __init__(self, shards: list[GptThreadRepository], thread_cache_size: int = 10000):
+        """
+        Args:
+            shards (list[GptThreadRepository]): Repository of each shard, in shard order
+                (the files of `shard_paths`).
+            thread_cache_size (int): Number of thread ID → shard entries kept in memory.
+        """
+        self.shards = shards
+        self._thread_cache_size = thread_cache_size
+        self._thread_shards: OrderedDict[str, int] = OrderedDict()
+
+    async def get_thread_id(self, tg_user_id: int, mode: str) -> Optional[str]:
+        """
+        Returns the OpenAI thread ID for a user and mode, if it exists.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            mode (str): Chat mode (e.g. "gpt", "random").
+
+        Returns:
+            Optional[str]: The OpenAI thread ID if found, else None.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        index = shard_for_user(tg_user_id, len(self.shards))
+        thread_id = await self.shards[index].get_thread_id(tg_user_id, mode)
+        if thread_id is not None:
+            self._remember_thread(thread_id, index)
+        return thread_id
+
+    async def create_thread(self, tg_user_id: int, mode: str, openai_thread_id: str) -> str:
+        """
+        Creates a new thread record in the user's shard.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            mode (str): Chat mode.
+            openai_thread_id (str): ID of the created OpenAI thread.
+
+        Returns:
+            str: The thread ID stored for the user and mode.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        index = shard_for_user(tg_user_id, len(self.shards))
+        thread_id = await self.shards[index].create_thread(tg_user_id, mode, openai_thread_id)
+        self._remember_thread(thread_id, index)
+        return thread_id
+
+    async def get_or_create_thread(
+        self,
+        tg_user_id: int,
+        mode: str,
+        factory: Callable[[], Awaitable[str]]
+    ) -> str:
+        """
+        Returns the user's thread ID for the mode, creating the thread on first use.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            mode (str): Chat mode.
+            factory (Callable[[], Awaitable[str]]): Creates a thread and returns its ID.
+
+        Returns:
+            str: The thread ID stored for the user and mode.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+            Exception: Whatever `factory` raises (e.g. OpenAIError).
+        """
+        index = shard_for_user(tg_user_id, len(self.shards))
+        thread_id = await self.shards[index].get_or_create_thread(tg_user_id, mode, factory)
+        self._remember_thread(thread_id, index)
+        return thread_id
+
+    async def add_message(self, openai_thread_id: str, role: str, content: str) -> None:
+        """
+        Adds a message to the thread's message history, in the shard of the thread.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+            role (str): Role of the message sender ("user", "assistant", "system").
+            content (str): Message text content.
+
+        Raises:
+            ValueError: If no shard has the thread.
+            aiosqlite.Error: If a database error occurs.
+        """
+        shard = await self._shard_of_thread(openai_thread_id)
+        await shard.add_message(openai_thread_id, role, content)
+
+    async def flush(self) -> None:
+        """
+        Writes the buffered messages of every shard.
+        """
+        await asyncio.gather(*(shard.flush() for shard in self.shards))
+
+    async def close(self) -> None:
+        """
+        Stops the flush timers and writes the buffered messages of every shard.
+        """
+        await asyncio.gather(*(shard.close() for shard in self.shards))
+
+    async def get_messages(self, openai_thread_id: str) -> List[dict]:
+        """
+        Retrieves all messages for a given thread, in the order they were added.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+
+        Returns:
+            List[dict]: List of messages as dicts with 'role' and 'content'.
+
+        Raises:
+            ValueError: If no shard has the thread.
+            aiosqlite.Error: If a database error occurs.
+        """
+        shard = await self._shard_of_thread(openai_thread_id)
+        return await shard.get_messages(openai_thread_id)
+
+    async def iter_messages(
+        self,
+        openai_thread_id: str,
+        after_id: Optional[int] = None,
+        batch: int = 500
+    ) -> AsyncIterator[dict]:
+        """
+        Streams a thread's messages in the order they were added, one page at a time.
+
+        Message IDs are those of the thread's shard.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+            after_id (int, optional): Start after this message ID.
+            batch (int): Number of messages read per query.
+
+        Yields:
+            dict: Message with 'id', 'role' and 'content'.
+
+        Raises:
+            ValueError: If no shard has the thread.
+            aiosqlite.Error: If a database error occurs.
+        """
+        shard = await self._shard_of_thread(openai_thread_id)
+        async for message in shard.iter_messages(openai_thread_id, after_id=after_id, batch=batch):
+            yield message
+
+    async def get_recent_messages(self, openai_thread_id: str, n: int) -> List[dict]:
+        """
+        Retrieves the last `n` messages of a thread, oldest first.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+            n (int): Number of messages.
+
+        Returns:
+            List[dict]: Messages as dicts with 'id', 'role' and 'content'.
+
+        Raises:
+            ValueError: If no shard has the thread.
+            aiosqlite.Error: If a database error occurs.
+        """
+        shard = await self._shard_of_thread(openai_thread_id)
+        return await shard.get_recent_messages(openai_thread_id, n)
+
+    async def search_messages(
+        self,
+        tg_user_id: int,
+        query: str,
+        limit: int = 5,
+        offset: int = 0,
+        snippet_tokens: int = 16
+    ) -> List[dict]:
+        """
+        Searches the messages of all the user's threads, best matches first (in the user's shard).
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            query (str): Words to search for (free text, not FTS5 syntax).
+            limit (int): Maximum number of results.
+            offset (int): Number of best results to skip (for pagination).
+            snippet_tokens (int): Maximum number of words per snippet.
+
+        Returns:
+            List[dict]: Results as dicts with 'id', 'mode', 'role', 'snippet' and 'created_at'.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        shard = self.shards[shard_for_user(tg_user_id, len(self.shards))]
+        return await shard.search_messages(tg_user_id, query, limit=limit, offset=offset, snippet_tokens=snippet_tokens)
+
+    async def clear_thread(self, openai_thread_id: str) -> None:
+        """
+        Deletes all messages associated with a thread.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+
+        Raises:
+            ValueError: If no shard has the thread.
+            aiosqlite.Error: If a database error occurs.
+        """
+        shard = await self._shard_of_thread(openai_thread_id)
+        await shard.clear_thread(openai_thread_id)
+
+    async def _shard_of_thread(self, openai_thread_id: str) -> GptThreadRepository:
+        """
+        Returns the repository of the shard holding a thread.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+
+        Returns:
+            GptThreadRepository: The shard's repository.
+
+        Raises:
+            ValueError: If no shard has the thread.
+            aiosqlite.Error: If a database error occurs.
+        """
+        index = self._thread_shards.get(openai_thread_id)
+        if index is None:
+            owners = await asyncio.gather(*(shard.get_thread_owner(openai_thread_id) for shard in self.shards))
+            index = next((i for i, owner in enumerate(owners) if owner is not None), None)
+            if index is None:
+                raise ValueError(f"Unknown thread: {openai_thread_id}")
+
+        self._remember_thread(openai_thread_id, index)
+        return self.shards[index]
+
+    def _remember_thread(self, openai_thread_id: str, index: int) -> None:
+        """
+        Caches the shard of a thread, evicting the least recently used entry if the cache is full.
+
+        Args:
+            openai_thread_id (str): OpenAI thread ID.
+            index (int): Shard index.
+        """
+        self._thread_shards[openai_thread_id] = index
+        self._thread_shards.move_to_end(openai_thread_id)
+        while len(self._thread_shards) > self._thread_cache_size:
+            self._thread_shards.popitem(last=False)
@@ -0,0 +1,308 @@
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional
+import aiosqlite
+from db.pool import ConnectionPool
+from settings import get_logger
+
+
+logger = get_logger(__name__)
+
+
+def prompt_version(prompt: str) -> str:
+    """
+    Returns a short fingerprint of a prompt.
+
+    Editing the prompt changes the fingerprint, so translations made with
+    the old instructions are no longer served from the cache.
+
+    Args:
+        prompt (str): Prompt text.
+
+    Returns:
+        str: First 12 hex digits of the SHA-256 of the prompt.
+    """
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+class TranslationCache:
+    """
+    Content-addressed cache of translations: an in-memory LRU in front of a SQLite table.
+
+    Entries are keyed by a hash of the normalized source text, the target language,
+    the assistant ID and the version of the current prompt. They expire after `ttl_s`
+    seconds, and the least recently used entries are evicted when the table exceeds
+    `max_bytes`. Lookups only read: their use times and hit counts are kept in memory
+    and written in one statement, before `put` evicts or once `usage_batch_size`
+    entries are pending.
+
+    Attributes:
+        _pool (ConnectionPool): Pool of connections to the SQLite database.
+        _prompt (Callable[[], str]): Returns the current translation prompt.
+        _memory_size (int): Number of entries kept in memory.
+        _ttl_s (int): Lifetime of an entry, in seconds.
+        _max_bytes (int): Upper bound of the stored translations, in bytes.
+        _usage_batch_size (int): Number of pending use records that triggers a write.
+        _memory (OrderedDict[str, tuple[str, float]]): In-memory entries (translation, created_at) by key.
+        _usage (dict[str, tuple[float, int]]): Unwritten last use time and hit count by key.
+        _version (tuple[str, str] | None): Last prompt seen and its fingerprint.
+        memory_hits (int): Lookups answered from memory.
+        db_hits (int): Lookups answered from SQLite.
+        misses (int): Lookups that found nothing.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        prompt: Callable[[], str],
+        memory_size: int = 1024,
+        ttl_s: int = 30 * 24 * 3600,
+        max_bytes: int = 50 * 1024 * 1024,
+        usage_batch_size: int = 256
+    ):
+        """
+        Initializes the cache with the given connection pool.
+
+        Args:
+            pool (ConnectionPool): Pool of connections to the SQLite database.
+            prompt (Callable[[], str]): Returns the current translation prompt; called on every
+                lookup, so an edited prompt takes effect without a restart.
+            memory_size (int): Number of entries kept in memory.
+            ttl_s (int): Lifetime of an entry, in seconds.
+            max_bytes (int): Upper bound of the stored translations, in bytes.
+            usage_batch_size (int): Number of pending use records that triggers a write.
+        """
+        self._pool = pool
+        self._prompt = prompt
+        self._memory_size = memory_size
+        self._ttl_s = ttl_s
+        self._max_bytes = max_bytes
+        self._usage_batch_size = usage_batch_size
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._usage: dict[str, tuple[float, int]] = {}
+        self._version: tuple[str, str] | None = None
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def make_key(self, text: str, language: str, assistant_id: str) -> str:
+        """
+        Builds the cache key of a translation request.
+
+        The text is Unicode-normalized and stripped of leading and trailing whitespace,
+        so requests that differ only there share an entry. Line breaks and spacing
+        inside the text are kept: they shape the translation's layout.
+
+        Args:
+            text (str): Text to translate.
+            language (str): Target language.
+            assistant_id (str): ID of the translation assistant.
+
+        Returns:
+            str: Hex SHA-256 key.
+        """
+        normalized = unicodedata.normalize("NFC", text).strip()
+        payload = "\x1f".join((normalized, language.lower(), assistant_id, self._current_version()))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Returns a cached translation, if present and not expired.
+
+        Args:
+            key (str): Key from `make_key`.
+
+        Returns:
+            Optional[str]: Cached translation, or None.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            translation, created_at = entry
+            if now - created_at < self._ttl_s:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                await self._record_use(key, now)
+                return translation
+            del self._memory[key]
+
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    "SELECT translation, created_at FROM translation_cache WHERE key = ? AND created_at > ?",
+                    (key, now - self._ttl_s)
+                ) as cursor:
+                    row = await cursor.fetchone()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (translation_cache.get): {e}")
+            raise
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.db_hits += 1
+        self._remember(key, row[0], row[1])
+        await self._record_use(key, now)
+        return row[0]
+
+    async def put(self, key: str, language: str, translation: str) -> None:
+        """
+        Stores a translation and evicts expired and least recently used entries.
+
+        Args:
+            key (str): Key from `make_key`.
+            language (str): Target language (kept for inspection and statistics).
+            translation (str): Translated text.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        now = time.time()
+        try:
+            async with self._pool.acquire() as db:
+                # Eviction below orders by last_used_at, so pending uses are written first
+                await self._write_usage(db)
+                await db.execute(
+                    """
+                    INSERT OR REPLACE INTO translation_cache
+                        (key, language, translation, size_bytes, created_at, last_used_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, language.lower(), translation, len(translation.encode("utf-8")), now, now)
+                )
+                await db.execute(
+                    "DELETE FROM translation_cache WHERE created_at <= ?",
+                    (now - self._ttl_s,)
+                )
+                # Keep the most recently used entries that fit into max_bytes
+                await db.execute(
+                    """
+                    DELETE FROM translation_cache WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size_bytes) OVER (ORDER BY last_used_at DESC, key) AS total
+                            FROM translation_cache
+                        )
+                        WHERE total > ?
+                    )
+                    """,
+                    (self._max_bytes,)
+                )
+                await db.commit()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (translation_cache.put): {e}")
+            raise
+
+        self._remember(key, translation, now)
+
+    async def flush_usage(self) -> None:
+        """
+        Writes the pending use times and hit counts.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        if not self._usage:
+            return
+        try:
+            async with self._pool.acquire() as db:
+                await self._write_usage(db)
+                await db.commit()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (translation_cache.flush_usage): {e}")
+            raise
+
+    async def get_stats(self) -> dict:
+        """
+        Returns cache statistics.
+
+        Returns:
+            dict: Hits (memory and SQLite), misses, hit ratio, stored entries and bytes stored.
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        try:
+            async with self._pool.acquire() as db:
+                async with db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM translation_cache"
+                ) as cursor:
+                    entries, bytes_stored = await cursor.fetchone()
+        except aiosqlite.Error as e:
+            logger.error(f"Database Error (translation_cache.get_stats): {e}")
+            raise
+
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes_stored": bytes_stored,
+        }
+
+    def _current_version(self) -> str:
+        """
+        Returns the fingerprint of the current prompt, hashing it only when it changed.
+
+        Returns:
+            str: Prompt version (see `prompt_version`).
+        """
+        prompt = self._prompt()
+        if self._version is None or self._version[0] is not prompt:
+            self._version = (prompt, prompt_version(prompt))
+        return self._version[1]
+
+    async def _record_use(self, key: str, now: float) -> None:
+        """
+        Records a cache hit in memory, writing the batch once it is large enough.
+
+        Args:
+            key (str): Cache key.
+            now (float): Time of the hit (Unix time).
+
+        Raises:
+            aiosqlite.Error: If a database error occurs.
+        """
+        _, hits = self._usage.get(key, (now, 0))
+        self._usage[key] = (now, hits + 1)
+        if len(self._usage) >= self._usage_batch_size:
+            await self.flush_usage()
+
+    async def _write_usage(self, db: aiosqlite.Connection) -> None:
+        """
+        Applies the pending use records in one statement and clears them.
+
+        Args:
+            db (aiosqlite.Connection): Open connection (the caller commits).
+        """
+        if not self._usage:
+            return
+        usage, self._usage = self._usage, {}
+        await db.executemany(
+            "UPDATE translation_cache SET last_used_at = MAX(last_used_at, ?), hits = hits + ? WHERE key = ?",
+            [(last_used_at, hits, key) for key, (last_used_at, hits) in usage.items()]
+        )
+
+    def _remember(self, key: str, translation: str, created_at: float) -> None:
+        """
+        Puts an entry into the in-memory LRU, evicting the least recently used one if full.
+
+        Args:
+            key (str): Cache key.
+            translation (str): Translated text.
+            created_at (float): Creation time of the entry (Unix time).
+        """
+        self._memory[key] = (translation, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
@@ -1,9 +1,24 @@
+from datetime import time, timezone
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler
+from telegram.error import TelegramError
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, CallbackQueryHandler, ContextTypes
+from db.chat_menus import ChatMenuCache
+from db.compression import MessageCodec
 from db.initializer import DatabaseInitializer
+from db.maintenance import DatabaseMaintenance
+from db.media_cache import MediaCache
+from db.persistence import SqlitePersistence
+from db.pool import ConnectionPool
+from db.quiz_repository import QuizQuestionRepository
 from db.repository import GptThreadRepository
+from db.sharding import ShardedGptThreadRepository, shard_paths
+from db.translation_cache import TranslationCache
 from services import OpenAIClient, SpeechToText, TextToSpeech
-from settings.config import config
+from settings import config, get_logger, resources
+from bot.fact_pool import FactPool
+from bot.keyboards import keyboards
+from bot.message_sender import register_default_menu
+from bot.quiz_bank import QuizBank
 from bot.commands import (
     start,
     random,
@@ -13,10 +28,159 @@ from bot.commands import (
     translate_conv_handler,
     resume_handler,
     voice_chat_intro,
-    voice_handler
+    voice_handler,
+    history,
+    history_page
 )
 
 
+logger = get_logger(__name__)
+
+
+async def post_init(app: Application) -> None:
+    """
+    Starts background services once the event loop is running.
+
+    Args:
+        app (telegram.ext.Application): The running application.
+    """
+    db_pools: list[ConnectionPool] = app.bot_data["db_pools"]
+    for db_pool in db_pools:
+        await db_pool.open()
+
+    openai_client: OpenAIClient = app.bot_data["openai_client"]
+    await openai_client.start()
+
+    fact_pool: FactPool = app.bot_data["fact_pool"]
+    await fact_pool.load()
+
+    await register_main_menu(app)
+
+
+async def register_main_menu(app: Application) -> None:
+    """
+    Registers the main menu as the default command menu of every chat.
+
+    If Telegram cannot be reached, chats get the menu pushed individually by `show_menu`.
+
+    Args:
+        app (telegram.ext.Application): The running application.
+    """
+    chat_menus: ChatMenuCache = app.bot_data["chat_menus"]
+    try:
+        await register_default_menu(app.bot, resources.menu("main"), chat_menus)
+    except TelegramError as e:
+        chat_menus.default_hash = None
+        logger.warning(f"Default command menu not registered: {e}")
+
+
+async def post_shutdown(app: Application) -> None:
+    """
+    Releases resources held by long-lived services when the bot stops.
+
+    Args:
+        app (telegram.ext.Application): The running application.
+    """
+    fact_pool: FactPool = app.bot_data["fact_pool"]
+    await fact_pool.close()
+
+    translation_cache: TranslationCache = app.bot_data["translation_cache"]
+    await translation_cache.flush_usage()
+
+    openai_client: OpenAIClient = app.bot_data["openai_client"]
+    await openai_client.close()
+
+    # Write buffered chat messages before the connections are closed
+    thread_repository: GptThreadRepository = app.bot_data["thread_repository"]
+    await thread_repository.close()
+
+    db_pools: list[ConnectionPool] = app.bot_data["db_pools"]
+    for db_pool in db_pools:
+        await db_pool.close()
+
+
+async def compress_messages_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    JobQueue callback compressing the stored chat messages of one shard, one batch per run.
+
+    Trains the shard's first compression dictionary once there are enough messages, then
+    walks its message table. `job.data` holds the shard's repository and the position.
+    The job removes itself when the pass is complete.
+
+    Args:
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Job context.
+    """
+    repository: GptThreadRepository = context.job.data["repository"]
+
+    if repository.codec.dictionary_id is None and await repository.train_compression_dictionary() is not None:
+        context.job.data["after_id"] = 0
+
+    after_id = await repository.compress_stored_messages(
+        context.job.data["after_id"],
+        batch_size=config.db_compress_batch_size
+    )
+    if after_id is None:
+        logger.info(f"Stored messages are compressed ({context.job.name})")
+        context.job.schedule_removal()
+    else:
+        context.job.data["after_id"] = after_id
+
+
+async def index_messages_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    JobQueue callback adding stored chat messages of one shard (`job.data`) to the
+    full-text index, one batch per run. The job removes itself when none are left.
+
+    Args:
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Job context.
+    """
+    repository: GptThreadRepository = context.job.data
+
+    if await repository.index_stored_messages(batch_size=config.db_index_batch_size) is None:
+        logger.info(f"Stored messages are indexed for search ({context.job.name})")
+        context.job.schedule_removal()
+
+
+async def checkpoint_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    JobQueue callback running a passive WAL checkpoint on one database (`job.data`).
+
+    Args:
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Job context.
+    """
+    maintenance: DatabaseMaintenance = context.job.data
+    await maintenance.checkpoint("PASSIVE")
+
+
+async def maintenance_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    JobQueue callback running the off-peak maintenance of one database (`job.data`).
+
+    Args:
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Job context.
+    """
+    maintenance: DatabaseMaintenance = context.job.data
+    await maintenance.run_all()
+
+
+async def reload_resources_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    JobQueue callback reloading the resource files edited since they were loaded.
+
+    Args:
+        context (telegram.ext.ContextTypes.DEFAULT_TYPE): Job context.
+    """
+    try:
+        changed = resources.reload_changed()
+    except (OSError, ValueError) as e:
+        logger.error(f"Resources not reloaded: {e}")
+        return
+    if changed:
+        logger.info(f"Reloaded resources: {', '.join(changed)}")
+    if "menu/main" in changed:
+        await register_main_menu(context.application)
+
+
 def main():
     """
     Starts the Telegram bot application.
@@ -27,6 +191,7 @@ def main():
     Handlers:
        - /start: Initializes the bot interface.
        - /random: Triggers the assistant to return a random technical fact.
+       - /history: Searches the user's stored conversations.
        - CallbackQueryHandler: Supports menu button interactions for "start" and "random".
        - ConversationHandler:
          -- gpt_conv_handler: Handles free-form text input when in GPT mode.
@@ -40,36 +205,184 @@ def main():
            - OpenAI API key and model settings
            - Telegram bot token
            - Path to SQLite database
+
+    Jobs:
+       - quiz_bank.top_up_job: Periodically refills quiz topics whose stock of questions is low.
+       - compress_messages_job: Compresses chat messages stored before compression was enabled.
+       - checkpoint_job: Checkpoints the WAL of each database file.
+       - reload_resources_job: Reloads edited messages, images, menus and prompts.
+       - maintenance_job: Daily checkpoint, incremental vacuum and planner statistics of each database file.
     """
 
-    db_initializer = DatabaseInitializer(config.path_to_db)
-    db_initializer.create_tables()
+    stats = resources.load()
+    logger.info(
+        f"Loaded {stats['files']} resource files ({stats['bytes']:,} bytes, "
+        f"{stats['resident_bytes']:,} bytes in memory) in {stats['load_ms']:.1f} ms"
+    )
+
+    db_initializer = DatabaseInitializer(config.path_to_db, shards=config.db_shards)
+    db_initializer.migrate()
+
+    # One pool per shard; shard 0 is the main database, which also holds the quiz bank and translations
+    db_pools = [
+        ConnectionPool(
+            path,
+            size=config.db_pool_size,
+            cache_size_kib=config.db_cache_size_kib,
+            mmap_size=config.db_mmap_size,
+            codec=MessageCodec(
+                path,
+                enabled=config.db_compress_messages,
+                threshold_bytes=config.db_compress_threshold_bytes,
+                level=config.db_compress_level
+            )
+        )
+        for path in shard_paths(config.path_to_db, config.db_shards)
+    ]
+    db_pool = db_pools[0]
 
-    thread_repository = GptThreadRepository(config.path_to_db)
+    shard_repositories = [
+        GptThreadRepository(
+            pool,
+            batch_size=config.db_message_batch_size,
+            flush_interval_ms=config.db_message_flush_interval_ms,
+            session_cache_size=config.db_session_cache_size
+        )
+        for pool in db_pools
+    ]
+
+    if len(shard_repositories) == 1:
+        thread_repository = shard_repositories[0]
+    else:
+        thread_repository = ShardedGptThreadRepository(
+            shard_repositories,
+            thread_cache_size=config.db_session_cache_size
+        )
 
     openai_client = OpenAIClient(
         openai_api_key=config.openai_api_key,
         model=config.openai_model,
-        temperature=config.openai_model_temperature
+        temperature=config.openai_model_temperature,
+        thread_repository=thread_repository,
+        prompt_by_assistant=config.get_prompt_by_assistant(),
+        engine_by_mode=config.openai_engine_by_mode,
+        history_limits=config.openai_chat_history_limits,
+        run_poll_concurrency=config.openai_run_poll_concurrency,
+        priority_by_mode=config.openai_priority_by_mode,
+        requests_per_minute=config.openai_requests_per_minute,
+        tokens_per_minute=config.openai_tokens_per_minute,
+        max_concurrency=config.openai_max_concurrency,
+        thread_pool_size=config.openai_thread_pool_size,
+        thread_pool_path=config.path_to_thread_pool,
+        thread_pool_delete_on_shutdown=config.openai_thread_pool_delete_on_shutdown
+    )
+
+    quiz_bank = QuizBank(
+        repository=QuizQuestionRepository(db_pool),
+        openai_client=openai_client,
+        assistant_id=config.ai_assistant_quiz_mileshkin_id,
+        topics=keyboards.choices("quiz_topic"),
+        low_watermark=config.quiz_bank_low_watermark,
+        batch_size=config.quiz_bank_batch_size
+    )
+
+    fact_pool = FactPool(
+        openai_client=openai_client,
+        assistant_id=config.ai_assistant_random_mileshkin_id,
+        path=config.path_to_fact_pool,
+        size=config.fact_pool_size,
+        low_watermark=config.fact_pool_low_watermark,
+        refill_concurrency=config.fact_pool_refill_concurrency,
+        user_history=config.fact_pool_user_history
+    )
+
+    translation_cache = TranslationCache(
+        db_pool,
+        prompt=lambda: resources.prompt("translate"),
+        memory_size=config.translation_cache_memory_size,
+        ttl_s=config.translation_cache_ttl_s,
+        max_bytes=config.translation_cache_max_bytes
     )
 
+    media_cache = MediaCache(db_pool)
+
     speech_to_text = SpeechToText()
     text_to_speech = TextToSpeech()
 
-    app = ApplicationBuilder().token(config.tg_bot_api_key).build()
+    persistence = SqlitePersistence(db_pool, update_interval=config.persistence_update_interval_s)
 
+    app = (
+        ApplicationBuilder()
+        .token(config.tg_bot_api_key)
+        .persistence(persistence)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+
+    app.bot_data["db_pools"] = db_pools
     app.bot_data["openai_client"] = openai_client
     app.bot_data["thread_repository"] = thread_repository
+    app.bot_data["quiz_bank"] = quiz_bank
+    app.bot_data["fact_pool"] = fact_pool
+    app.bot_data["translation_cache"] = translation_cache
+    app.bot_data["media_cache"] = media_cache
+    app.bot_data["chat_menus"] = ChatMenuCache(db_pool)
 
     app.bot_data["speech_to_text"] = speech_to_text
     app.bot_data["text_to_speech"] = text_to_speech
 
+    # Keep the quiz question bank stocked in the background
+    app.job_queue.run_repeating(quiz_bank.top_up_job, interval=config.quiz_bank_refill_interval_s, first=1)
+
+    # Compress messages stored before compression was enabled, a batch at a time
+    if config.db_compress_messages:
+        for index, repository in enumerate(shard_repositories):
+            app.job_queue.run_repeating(
+                compress_messages_job,
+                interval=config.db_compress_interval_s,
+                first=30,
+                data={"repository": repository, "after_id": 0},
+                name=f"compress_messages_shard_{index}"
+            )
+
+    # Index messages stored before /history search existed, a batch at a time
+    for index, repository in enumerate(shard_repositories):
+        app.job_queue.run_repeating(
+            index_messages_job,
+            interval=config.db_index_interval_s,
+            first=1,
+            data=repository,
+            name=f"index_messages_shard_{index}"
+        )
+
+    # Pick up edited resource files without a restart
+    app.job_queue.run_repeating(reload_resources_job, interval=config.resources_reload_interval_s)
+
+    # Keep the database files and their WAL from growing, and the planner statistics fresh
+    for index, pool in enumerate(db_pools):
+        maintenance = DatabaseMaintenance(pool, budget_ms=config.db_maintenance_budget_ms)
+        app.job_queue.run_repeating(
+            checkpoint_job,
+            interval=config.db_checkpoint_interval_s,
+            data=maintenance,
+            name=f"checkpoint_shard_{index}"
+        )
+        app.job_queue.run_daily(
+            maintenance_job,
+            time=time(hour=config.db_maintenance_hour_utc, tzinfo=timezone.utc),
+            data=maintenance,
+            name=f"maintenance_shard_{index}"
+        )
+
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("random", random))
     app.add_handler(CommandHandler("voice_chat", voice_chat_intro))
+    app.add_handler(CommandHandler("history", history))
 
     app.add_handler(CallbackQueryHandler(start, pattern="^start$"))
     app.add_handler(CallbackQueryHandler(random, pattern="^random$"))
+    app.add_handler(CallbackQueryHandler(history_page, pattern=r"^history:\d+$"))
 
     app.add_handler(gpt_conv_handler)
     app.add_handler(talk_conv_handler)
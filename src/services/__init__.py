@@ -1,3 +1,4 @@
 from services.chatgpt.client import OpenAIClient
+from services.chatgpt.scheduler import RequestCancelledError, RequestMergedError
 from services.speech_to_text.client_stt import SpeechToText
 from services.text_to_speech.client_tts import TextToSpeech
\ No newline at end of file
@@ -0,0 +1,471 @@
+"""
+This module implements admission control for OpenAI requests.
+
+Every request first waits for a slot. Slots are granted from a fair priority queue
+when the request-per-minute and token-per-minute budgets allow it and fewer than
+`limit` requests are in flight. Each API call made for a request (including run status
+checks) then takes one unit of the request-per-minute budget. On 429 responses the limit
+is cut multiplicatively, new requests and calls are held back until Retry-After has passed,
+and the failed call is retried; each request that completes without a 429 then grows the
+limit back additively (AIMD). The OpenAI client itself does not retry, so 429s reach the
+controller at once; connection errors and 5xx responses are retried here as well.
+
+Main Components:
+- Priority: Request priority classes.
+- TokenBucket: Continuous-refill budget of requests or tokens per minute.
+- AdmissionController: Fair priority queue, AIMD concurrency limit and 429 handling.
+"""
+
+import asyncio
+import email.utils
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+from settings import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """
+    Request priority classes; lower values are admitted first.
+
+    Attributes:
+        HIGH (int): Interactive requests a user is waiting on (voice, chat).
+        NORMAL (int): Other user-initiated requests.
+        LOW (int): Background work (/random, quiz prefetch, pool refills).
+    """
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+def estimate_tokens(text: str, expected_output_tokens: int = 500) -> int:
+    """
+    Roughly estimates the tokens a request will use (about 4 characters per token).
+
+    Args:
+        text (str): Text sent to the model.
+        expected_output_tokens (int): Tokens reserved for the reply.
+
+    Returns:
+        int: Estimated total tokens.
+    """
+    return len(text) // 4 + expected_output_tokens
+
+
+class TokenBucket:
+    """
+    Budget that refills continuously at `rate_per_minute` up to `capacity`.
+
+    Attributes:
+        _rate (float): Refill rate per second.
+        _capacity (float): Maximum amount held.
+        _level (float): Amount currently available.
+        _updated_at (float): Monotonic time of the last refill.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        """
+        Initializes a full bucket.
+
+        Args:
+            rate_per_minute (float): Amount added per minute.
+            capacity (float, optional): Maximum amount held; defaults to one minute's worth.
+        """
+        self._rate = rate_per_minute / 60
+        self._capacity = capacity or rate_per_minute
+        self._level = self._capacity
+        self._updated_at = time.monotonic()
+
+    def time_until(self, amount: float) -> float:
+        """
+        Returns how long to wait until `amount` is available.
+
+        Amounts larger than the capacity are treated as the full capacity.
+
+        Args:
+            amount (float): Amount needed.
+
+        Returns:
+            float: Seconds to wait (0 if available now).
+        """
+        self._refill()
+        missing = min(amount, self._capacity) - self._level
+        return max(0.0, missing / self._rate)
+
+    def consume(self, amount: float) -> None:
+        """
+        Takes `amount` from the bucket.
+
+        Args:
+            amount (float): Amount to take (clamped to the capacity).
+        """
+        self._refill()
+        self._level -= min(amount, self._capacity)
+
+    def _refill(self) -> None:
+        """
+        Adds the amount accumulated since the last update.
+        """
+        now = time.monotonic()
+        self._level = min(self._capacity, self._level + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+
+@dataclass
+class _Waiter:
+    """
+    A request waiting for a slot.
+
+    Attributes:
+        priority (Priority): Priority class.
+        seq (int): Arrival order.
+        tokens (int): Estimated tokens.
+        enqueued_at (float): Monotonic arrival time.
+        future (asyncio.Future): Resolved when the slot is granted.
+    """
+    priority: Priority
+    seq: int
+    tokens: int
+    enqueued_at: float
+    future: asyncio.Future
+
+
+class AdmissionController:
+    """
+    Grants OpenAI request slots under rate budgets and an adaptive concurrency limit.
+
+    Attributes:
+        _requests (TokenBucket): Requests-per-minute budget.
+        _tokens (TokenBucket): Estimated tokens-per-minute budget.
+        _min_concurrency (int): Lower bound of the concurrency limit.
+        _max_concurrency (int): Upper bound of the concurrency limit.
+        _increase (float): Limit added per limit-worth of successful requests.
+        _decrease (float): Factor applied to the limit on a 429.
+        _aging_s (float): Waiting time that raises a request by one priority class.
+        _max_attempts (int): Attempts per API call when it is rate limited or fails transiently.
+        _limit (float): Current concurrency limit.
+        _in_flight (int): Granted slots.
+        _waiting (list[_Waiter]): Requests waiting for a slot.
+        _cooldown_until (float): Monotonic time before which no slot is granted.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 200_000,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        aging_s: float = 30.0,
+        max_attempts: int = 5,
+        default_retry_after: float = 1.0
+    ):
+        """
+        Initializes the controller with the full concurrency limit.
+
+        Args:
+            requests_per_minute (int): Requests allowed per minute.
+            tokens_per_minute (int): Estimated tokens allowed per minute.
+            max_concurrency (int): Upper bound (and initial value) of the concurrency limit.
+            min_concurrency (int): Lower bound of the concurrency limit.
+            increase (float): Limit added per limit-worth of successful requests.
+            decrease (float): Factor applied to the limit on a 429.
+            aging_s (float): Waiting time that raises a request by one priority class,
+                so low-priority work is delayed but never starved.
+            max_attempts (int): Attempts per API call when it is rate limited or fails transiently.
+            default_retry_after (float): Cooldown when a 429 has no Retry-After header,
+                doubled for each consecutive 429.
+        """
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._min_concurrency = min_concurrency
+        self._max_concurrency = max_concurrency
+        self._increase = increase
+        self._decrease = decrease
+        self._aging_s = aging_s
+        self._max_attempts = max_attempts
+        self._default_retry_after = default_retry_after
+
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._waiting: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._cooldown_until = 0.0
+        self._consecutive_limited = 0
+        self._wakeup: asyncio.TimerHandle | None = None
+        self._wakeup_at = 0.0
+
+        self._admitted = 0
+        self._rate_limited = 0
+        self._wait_total = 0.0
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.NORMAL, tokens: int = 0) -> AsyncIterator[None]:
+        """
+        Waits in the queue for a slot and holds it for the duration of the block.
+
+        Args:
+            priority (Priority): Priority class of the request.
+            tokens (int): Estimated tokens the request will use.
+        """
+        waiter = _Waiter(
+            priority=priority,
+            seq=next(self._seq),
+            tokens=tokens,
+            enqueued_at=time.monotonic(),
+            future=asyncio.get_running_loop().create_future()
+        )
+        self._waiting.append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(success=False)
+            elif waiter in self._waiting:
+                # `_dispatch` drops cancelled waiters it comes across
+                self._waiting.remove(waiter)
+            raise
+
+        self._wait_total += time.monotonic() - waiter.enqueued_at
+        limited_before = self._rate_limited
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            self._release(success=success and self._rate_limited == limited_before)
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """
+        Runs an API call under the request budget, retrying it when it is rate limited
+        (after the cooldown) or fails transiently (connection error, 5xx; with backoff).
+
+        Args:
+            func (Callable[..., Awaitable[T]]): Coroutine function making one API call.
+            *args: Positional arguments for `func`.
+            **kwargs: Keyword arguments for `func`.
+
+        Returns:
+            T: Result of the call.
+
+        Raises:
+            RateLimitError: If the quota is exhausted or every attempt was rate limited.
+            APIConnectionError | InternalServerError: If every attempt failed transiently.
+        """
+        for attempt in itertools.count(1):
+            await self.pace()
+            try:
+                result = await func(*args, **kwargs)
+                self._consecutive_limited = 0
+                return result
+            except RateLimitError as e:
+                if not self.should_retry(e, attempt):
+                    self.record_rate_limit(e)
+                    raise
+                await self.backoff(e)
+            except (APIConnectionError, InternalServerError) as e:
+                if attempt >= self._max_attempts:
+                    raise
+                delay = min(8.0, 0.5 * 2 ** (attempt - 1))
+                logger.info(f"OpenAI call failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def pace(self) -> None:
+        """
+        Waits until the request budget and any 429 cooldown allow one more API call, then takes it.
+        """
+        while True:
+            delay = max(self._cooldown_until - time.monotonic(), self._requests.time_until(1))
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        self._requests.consume(1)
+
+    def should_retry(self, error: RateLimitError, attempt: int) -> bool:
+        """
+        Checks whether a rate-limited call should be attempted again.
+
+        Args:
+            error (RateLimitError): The 429 error.
+            attempt (int): Number of the attempt that failed.
+
+        Returns:
+            bool: False once attempts are exhausted or the account is out of quota.
+        """
+        return attempt < self._max_attempts and getattr(error, "code", None) != "insufficient_quota"
+
+    async def backoff(self, error: RateLimitError) -> None:
+        """
+        Records a 429 and sleeps until its cooldown has passed.
+
+        Args:
+            error (RateLimitError): The 429 error.
+        """
+        self.record_rate_limit(error)
+        await asyncio.sleep(max(0.0, self._cooldown_until - time.monotonic()))
+
+    def record_rate_limit(self, error: RateLimitError) -> None:
+        """
+        Cuts the concurrency limit and pauses admissions for the Retry-After period.
+
+        429s arriving during an ongoing cooldown belong to the same overload
+        and do not cut the limit again.
+
+        Args:
+            error (RateLimitError): The 429 error.
+        """
+        now = time.monotonic()
+        self._rate_limited += 1
+        self._consecutive_limited += 1
+
+        if now >= self._cooldown_until:
+            self._limit = max(float(self._min_concurrency), self._limit * self._decrease)
+
+        retry_after = self._retry_after(error)
+        if retry_after is None:
+            retry_after = min(60.0, self._default_retry_after * 2 ** (self._consecutive_limited - 1))
+        self._cooldown_until = max(self._cooldown_until, now + retry_after)
+
+        logger.warning(
+            f"OpenAI rate limit hit; concurrency limit {self._limit:.1f}, "
+            f"pausing admissions for {retry_after:.1f}s"
+        )
+        self._dispatch()
+
+    def get_stats(self) -> dict:
+        """
+        Returns admission statistics.
+
+        Returns:
+            dict: Current limit, in-flight and waiting requests, admitted requests,
+                429s seen and average queue wait in seconds.
+        """
+        return {
+            "limit": round(self._limit, 2),
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiting),
+            "admitted": self._admitted,
+            "rate_limited": self._rate_limited,
+            "avg_wait_s": round(self._wait_total / self._admitted, 3) if self._admitted else 0.0,
+        }
+
+    def _dispatch(self) -> None:
+        """
+        Grants slots to waiting requests while the limit, budgets and cooldown allow.
+        """
+        while self._waiting and self._in_flight < int(self._limit):
+            now = time.monotonic()
+            if now < self._cooldown_until:
+                self._schedule_dispatch(self._cooldown_until - now)
+                return
+
+            waiter = min(self._waiting, key=lambda item: self._rank(item, now))
+            delay = max(self._requests.time_until(1), self._tokens.time_until(waiter.tokens))
+            if delay > 0:
+                self._schedule_dispatch(delay)
+                return
+
+            self._waiting.remove(waiter)
+            if waiter.future.done():
+                continue
+
+            # The request budget is taken per API call, in `pace`
+            self._tokens.consume(waiter.tokens)
+            self._in_flight += 1
+            self._admitted += 1
+            waiter.future.set_result(None)
+
+    def _rank(self, waiter: _Waiter, now: float) -> tuple[float, int]:
+        """
+        Returns the queue order of a waiter: priority class lowered by age, then arrival.
+
+        Args:
+            waiter (_Waiter): Waiting request.
+            now (float): Current monotonic time.
+
+        Returns:
+            tuple[float, int]: Sort key (smaller is admitted first).
+        """
+        return waiter.priority - (now - waiter.enqueued_at) / self._aging_s, waiter.seq
+
+    def _schedule_dispatch(self, delay: float) -> None:
+        """
+        Arranges for `_dispatch` to run again after `delay` seconds.
+
+        Args:
+            delay (float): Seconds until a slot may become available.
+        """
+        when = time.monotonic() + delay
+        if self._wakeup is not None and not self._wakeup.cancelled() and self._wakeup_at <= when:
+            return
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup_at = when
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        """
+        Timer callback that resumes dispatching.
+        """
+        self._wakeup = None
+        self._dispatch()
+
+    def _release(self, success: bool) -> None:
+        """
+        Frees a slot, grows the limit after a request without 429s and admits the next waiter.
+
+        Args:
+            success (bool): True if the request completed without being rate limited.
+        """
+        self._in_flight -= 1
+        if success:
+            self._limit = min(float(self._max_concurrency), self._limit + self._increase / self._limit)
+        self._dispatch()
+
+    @staticmethod
+    def _retry_after(error: RateLimitError) -> float | None:
+        """
+        Reads the Retry-After delay from a 429 response.
+
+        Args:
+            error (RateLimitError): The 429 error.
+
+        Returns:
+            float | None: Delay in seconds, or None if the response has no usable header.
+        """
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if not headers:
+            return None
+
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            parsed = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, parsed.timestamp() - time.time())
@@ -1,21 +1,84 @@
 import asyncio
-
-from openai import AsyncOpenAI, OpenAIError
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+
+from openai import AsyncOpenAI, BadRequestError, OpenAIError, RateLimitError
 from openai.types.beta import Thread
 
+from db.repository import GptThreadRepository
+from services.chatgpt.admission import AdmissionController, Priority, estimate_tokens
+from services.chatgpt.completions import ChatCompletionsEngine, OpenAIEngine
+from services.chatgpt.run_monitor import ACTIVE_RUN_STATUSES, RunMonitor
+from services.chatgpt.scheduler import RequestCancelledError, ThreadScheduler
+from services.chatgpt.thread_pool import ThreadPool
 from settings import get_logger
 
 logger = get_logger(__name__)
 
+_STREAM_END = object()
+
+
+@dataclass(eq=False)
+class _ActiveRequest:
+    """
+    A user request in flight, tracked so that it can be cancelled.
+
+    Attributes:
+        thread_id (str): ID of the conversation thread.
+        task (asyncio.Task | None): Task running the request.
+        run_id (str | None): ID of the current run (Assistants API only).
+        running (bool): True once the request reached OpenAI (run started or chat request sent).
+        cancelled (bool): True if the request was cancelled by `cancel_runs` or a newer request.
+        superseded (bool): True if the request was cancelled by a newer request.
+    """
+    thread_id: str
+    task: asyncio.Task | None = None
+    run_id: str | None = None
+    running: bool = False
+    cancelled: bool = False
+    superseded: bool = False
+
+
+# Request tracked in the current task, so `_run` and `_stream_run` can record the run ID
+_current_request: ContextVar[_ActiveRequest | None] = ContextVar("_current_request", default=None)
+
 
 class OpenAIClient:
     """
     Asynchronous client for interacting with OpenAI Assistants API.
 
     Provides methods to manage threads and communicate with assistants.
+    Modes listed in `engine_by_mode` as "chat" are answered by the Chat Completions
+    engine instead of the Assistants thread API, behind the same `ask` interface.
+    Every request goes through a shared AdmissionController, which queues requests by
+    priority under rate budgets and retries calls rejected with 429.
+    New conversations take pre-created threads from a ThreadPool (see `acquire_thread_id`).
+    Requests made on behalf of a user are tracked per (user, mode): a newer request cancels
+    the run still generating, and `cancel_runs` cancels everything when the user leaves the mode.
     """
 
-    def __init__(self, openai_api_key: str, model: str, temperature: float):
+    def __init__(
+        self,
+        openai_api_key: str,
+        model: str,
+        temperature: float,
+        thread_repository: GptThreadRepository | None = None,
+        prompt_by_assistant: dict[str, str] | None = None,
+        engine_by_mode: dict[str, str] | None = None,
+        history_limits: dict[str, int] | None = None,
+        run_poll_concurrency: int = 8,
+        priority_by_mode: dict[str, str] | None = None,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 200_000,
+        max_concurrency: int = 16,
+        thread_pool_size: int = 0,
+        thread_pool_path: Path | None = None,
+        thread_pool_delete_on_shutdown: bool = False
+    ):
         """
         Initializes the OpenAI async client.
 
@@ -23,10 +86,97 @@ class OpenAIClient:
             openai_api_key (str): OpenAI API key.
             model (str): Model name to use for assistant responses (e.g. "gpt-3.5-turbo").
             temperature (float): Sampling temperature for response creativity.
+            thread_repository (GptThreadRepository, optional): Message history used by the Chat Completions engine.
+                If omitted, every mode uses the Assistants API.
+            prompt_by_assistant (dict[str, str], optional): Prompt file name for each assistant ID.
+            engine_by_mode (dict[str, str], optional): Engine name ("assistants" or "chat") per mode.
+            history_limits (dict[str, int], optional): Stored messages sent as context per mode (chat engine only).
+            run_poll_concurrency (int): Maximum number of run status checks in flight across all requests.
+            priority_by_mode (dict[str, str], optional): Admission priority ("high", "normal" or "low") per mode.
+                Modes not listed are "normal"; background generation is always "low".
+            requests_per_minute (int): Requests admitted per minute.
+            tokens_per_minute (int): Estimated tokens admitted per minute.
+            max_concurrency (int): Upper bound of requests in flight (lowered automatically on 429).
+            thread_pool_size (int): Number of empty threads created ahead of time (0 disables the pool).
+            thread_pool_path (Path, optional): JSON file unused pooled thread IDs are persisted to.
+            thread_pool_delete_on_shutdown (bool): Delete unused pooled threads in `close` instead of keeping them.
         """
-        self._client = AsyncOpenAI(api_key=openai_api_key)
+        # Retries (429s included) are left to the AdmissionController, which owns backoff
+        self._client = AsyncOpenAI(api_key=openai_api_key, max_retries=0)
         self._model = model
         self._temperature = temperature
+        self._scheduler = ThreadScheduler()
+        self._admission = AdmissionController(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrency=max_concurrency
+        )
+        self._monitor = RunMonitor(self._client, self._admission, max_concurrency=run_poll_concurrency)
+        self._priority_by_mode = {
+            mode: Priority[name.upper()] for mode, name in (priority_by_mode or {}).items()
+        }
+
+        self._thread_pool = ThreadPool(
+            create=self._create_pooled_thread,
+            delete=self.delete_thread,
+            size=thread_pool_size,
+            path=thread_pool_path,
+            delete_on_shutdown=thread_pool_delete_on_shutdown
+        )
+        self._active: dict[tuple[int, str | None], set[_ActiveRequest]] = {}
+
+        self._engine_by_mode = engine_by_mode or {}
+        self._chat_engine = None
+        if thread_repository is not None:
+            self._chat_engine = ChatCompletionsEngine(
+                client=self._client,
+                model=model,
+                temperature=temperature,
+                thread_repository=thread_repository,
+                prompt_by_assistant=prompt_by_assistant or {},
+                history_limits=history_limits
+            )
+
+    def get_run_stats(self) -> dict:
+        """
+        Returns run polling statistics collected by the shared RunMonitor.
+
+        Returns:
+            dict: Polling counters and smoothed run latency per (assistant ID, mode).
+        """
+        return self._monitor.get_stats()
+
+    def get_thread_pool_stats(self) -> dict:
+        """
+        Returns statistics of the pre-created thread pool.
+
+        Returns:
+            dict: Ready threads, hits and misses.
+        """
+        return self._thread_pool.get_stats()
+
+    def get_admission_stats(self) -> dict:
+        """
+        Returns statistics of the shared AdmissionController.
+
+        Returns:
+            dict: Concurrency limit, queue length, admitted requests and 429s seen.
+        """
+        return self._admission.get_stats()
+
+    async def start(self) -> None:
+        """
+        Starts background work that needs a running event loop (filling the thread pool).
+        """
+        await self._thread_pool.start()
+
+    async def close(self) -> None:
+        """
+        Stops background polling, releases the thread pool and closes the underlying HTTP client.
+        """
+        await self._thread_pool.close()
+        await self._monitor.close()
+        await self._client.close()
 
     async def create_thread(self) -> Thread:
         """
@@ -39,13 +189,46 @@ class OpenAIClient:
             OpenAIError: If thread creation fails.
         """
         try:
-            thread = await self._client.beta.threads.create()
+            thread = await self._admission.call(self._client.beta.threads.create)
             logger.info(f"Created thread with ID: {thread.id}")
             return thread
         except OpenAIError as e:
             logger.error(f"OpenAI Error (create_thread): {e}")
             raise
 
+    async def acquire_thread_id(self) -> str:
+        """
+        Returns the ID of a new, empty thread for a conversation.
+
+        Takes a pre-created thread from the pool when one is ready,
+        otherwise creates a thread right away.
+
+        Returns:
+            str: ID of the thread.
+
+        Raises:
+            OpenAIError: If the pool is empty and thread creation fails.
+        """
+        thread_id = await self._thread_pool.acquire()
+        if thread_id is None:
+            thread = await self.create_thread()
+            thread_id = thread.id
+        return thread_id
+
+    async def _create_pooled_thread(self) -> str:
+        """
+        Creates a thread for the pool, admitted with low priority.
+
+        Returns:
+            str: ID of the created thread.
+
+        Raises:
+            OpenAIError: If thread creation fails.
+        """
+        async with self._admission.slot(Priority.LOW):
+            thread = await self.create_thread()
+        return thread.id
+
     async def retrieve_thread(self, thread_id: str) -> Thread:
         """
         Retrieves a thread by its ID.
@@ -60,7 +243,7 @@ class OpenAIClient:
             OpenAIError: If retrieval fails.
         """
         try:
-            return await self._client.beta.threads.retrieve(thread_id=thread_id)
+            return await self._admission.call(self._client.beta.threads.retrieve, thread_id=thread_id)
         except OpenAIError as e:
             logger.error(f"OpenAI Error (retrieve_thread): {e}")
             raise
@@ -79,90 +262,551 @@ class OpenAIClient:
             OpenAIError: If deletion fails.
         """
         try:
-            await self._client.beta.threads.delete(thread_id=thread_id)
+            await self._admission.call(self._client.beta.threads.delete, thread_id=thread_id)
             logger.info(f"Deleted thread with ID: {thread_id}")
             return True
         except OpenAIError as e:
             logger.error(f"OpenAI Error (delete_thread): {e}")
             return False
 
-    async def ask(self, assistant_id: str, thread_id: str, user_message: str, max_retries: int = 3) -> str:
+    async def cancel_runs(self, tg_user_id: int, mode: str | None = None) -> int:
+        """
+        Cancels the user's requests in flight and releases the handlers waiting for them.
+
+        Runs already started are cancelled on OpenAI, so they stop generating (and billing)
+        and the thread is free for the user's next message. Queued requests are dropped.
+        The cancelled callers get RequestCancelledError (not superseded), so their handlers end the conversation.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            mode (str, optional): Chat mode to cancel; all modes if omitted.
+
+        Returns:
+            int: Number of cancelled requests.
+        """
+        requests = [
+            request
+            for (user_id, request_mode), active in self._active.items()
+            if user_id == tg_user_id and (mode is None or request_mode == mode)
+            for request in active
+        ]
+        for request in requests:
+            await self._cancel(request)
+        return len(requests)
+
+    async def ask(
+        self,
+        assistant_id: str,
+        thread_id: str,
+        user_message: str,
+        max_retries: int = 3,
+        mode: str | None = None,
+        tg_user_id: int | None = None
+    ) -> str:
         """
         Sends a user message to an assistant and retrieves the response.
 
-        If there is an active run on the thread, it waits until it completes.
-        Implements retry logic for transient server errors.
+        If a run is already active on the thread, the message is queued and posted
+        together with other queued messages as one run when the current run completes.
+        The run then waits for an admission slot; calls rejected with 429 are retried
+        after the Retry-After delay. Implements retry logic for transient server errors.
+
+        With `tg_user_id` the request is tracked: it cancels the user's run still generating
+        in the same mode, and can itself be cancelled by a newer request or `cancel_runs`.
 
         Args:
             assistant_id (str): ID of the assistant to run.
             thread_id (str): ID of the conversation thread.
             user_message (str): User's message to send.
             max_retries (int): Number of retry attempts for failed runs.
+            mode (str, optional): Chat mode, used to select the engine and the admission priority.
+            tg_user_id (int, optional): Telegram user the request is made for.
 
         Returns:
             str: Assistant's reply as plain text.
 
         Raises:
             OpenAIError: If message creation or run execution fails.
+            RequestMergedError: If the message was merged into a run started by a later request.
+            RequestCancelledError: If the request was cancelled before it was answered.
         """
+        if tg_user_id is not None:
+            await self._supersede(tg_user_id, mode)
+            request_coro = self.ask(assistant_id, thread_id, user_message, max_retries, mode)
+            with self._tracking(tg_user_id, mode, thread_id, request_coro) as request:
+                return await request.task
+
+        priority = self._get_priority(mode)
+
+        if self._uses_chat_engine(mode):
+            async with self._admission.slot(priority, estimate_tokens(user_message)):
+                self._mark_running()
+                return await self._admission.call(self._chat_engine.ask, assistant_id, thread_id, user_message, mode)
+
         try:
-            runs = await self._client.beta.threads.runs.list(thread_id=thread_id, limit=1)
-            latest_run = runs.data[0] if runs.data else None
-
-            if latest_run and latest_run.status in ["queued", "in_progress"]:
-                logger.info(f"Waiting for previous run {latest_run.id} to complete...")
-                while latest_run.status in ["queued", "in_progress"]:
-                    await asyncio.sleep(1)
-                    latest_run = await self._client.beta.threads.runs.retrieve(
-                        thread_id=thread_id,
-                        run_id=latest_run.id
-                    )
-                if latest_run.status == "failed":
-                    raise OpenAIError(f"Previous run failed: {latest_run.last_error}")
-
-            await self._client.beta.threads.messages.create(
+            async with self._scheduler.slot(thread_id, user_message) as batch:
+                async with self._admission.slot(priority, estimate_tokens("\n\n".join(batch))):
+                    return await self._run(assistant_id, thread_id, batch, max_retries, mode)
+        except OpenAIError as e:
+            logger.error(f"OpenAI Error (ask): {e}")
+            raise
+
+    async def generate(self, assistant_id: str, user_message: str, mode: str | None = None) -> str:
+        """
+        Sends a one-off request that is not part of any user's conversation.
+
+        Used for background content generation (e.g. filling the quiz question bank),
+        so it is admitted with low priority. With the chat engine no history is sent; with the Assistants API a temporary
+        thread is created for the request and deleted afterwards.
+
+        Args:
+            assistant_id (str): ID of the assistant to run.
+            user_message (str): Request to send.
+            mode (str, optional): Chat mode, used to select the engine and the admission priority.
+
+        Returns:
+            str: Assistant's reply as plain text.
+
+        Raises:
+            OpenAIError: If the request fails.
+        """
+        async with self._admission.slot(Priority.LOW, estimate_tokens(user_message)):
+            if self._uses_chat_engine(mode):
+                return await self._admission.call(self._chat_engine.ask, assistant_id, "", user_message)
+
+            thread = await self.create_thread()
+            try:
+                return await self._run(assistant_id, thread.id, [user_message], max_retries=3, mode=mode)
+            finally:
+                await self.delete_thread(thread.id)
+
+    async def _run(
+        self,
+        assistant_id: str,
+        thread_id: str,
+        batch: list[str],
+        max_retries: int,
+        mode: str | None
+    ) -> str:
+        """
+        Posts a batch of user messages, runs the assistant and returns its reply.
+
+        The run is awaited through the shared RunMonitor rather than polled here.
+        Only a `completed` run produces a reply, read from the messages of that run;
+        runs failing with a server error are retried, any other final status is an error.
+
+        Args:
+            assistant_id (str): ID of the assistant to run.
+            thread_id (str): ID of the conversation thread.
+            batch (list[str]): User messages granted to this run by the scheduler.
+            max_retries (int): Number of retry attempts for failed runs.
+            mode (str, optional): Chat mode, used as part of the run latency statistics key.
+
+        Returns:
+            str: Assistant's reply as plain text.
+
+        Raises:
+            OpenAIError: If message creation fails or the run does not complete.
+        """
+        await self._post_message(thread_id, batch)
+
+        run = None
+        for attempt in range(1, max_retries + 1):
+            run = await self._admission.call(
+                self._client.beta.threads.runs.create,
                 thread_id=thread_id,
-                role="user",
-                content=user_message
+                assistant_id=assistant_id,
+                model=self._model,
+                temperature=self._temperature
             )
+            self._mark_running(run.id)
+
+            if run.status in ACTIVE_RUN_STATUSES:
+                run = await self._monitor.wait(thread_id, run.id, key=(assistant_id, mode))
+
+            if run.status == "completed":
+                break
+
+            if run.status == "failed":
+                error_code = getattr(run.last_error, "code", "")
+                error_msg = getattr(run.last_error, "message", "")
+                logger.warning(f"Run attempt {attempt} failed: {error_code} - {error_msg}")
+
+                if error_code == "server_error" and attempt < max_retries:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                raise OpenAIError(f"Run failed: {run.last_error}")
+
+            # cancelled, expired, incomplete, requires_action: there is no reply to read
+            raise OpenAIError(f"Run ended with status {run.status}: {run.last_error or run.incomplete_details}")
+
+        if run is None:
+            raise OpenAIError("Run was not started: max_retries must be at least 1")
+
+        messages = await self._admission.call(
+            self._client.beta.threads.messages.list,
+            thread_id=thread_id,
+            run_id=run.id
+        )
+        for message in messages.data:
+            if message.role == "assistant":
+                for content in message.content:
+                    if content.type == "text":
+                        return content.text.value
+
+        return ""
+
+    async def ask_stream(
+        self,
+        assistant_id: str,
+        thread_id: str,
+        user_message: str,
+        mode: str | None = None,
+        tg_user_id: int | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Sends a user message to an assistant and streams the response as it is generated.
+
+        Unlike `ask`, the run is not polled: text deltas are yielded straight from
+        the Assistants event stream, so the first chunk arrives as soon as the model starts answering.
+        With `tg_user_id` the request is tracked and cancellable, as in `ask`.
+
+        Args:
+            assistant_id (str): ID of the assistant to run.
+            thread_id (str): ID of the conversation thread.
+            user_message (str): User's message to send.
+            mode (str, optional): Chat mode, used to select the engine and the admission priority.
+            tg_user_id (int, optional): Telegram user the request is made for.
+
+        Yields:
+            str: Consecutive pieces of the assistant's reply.
+
+        Raises:
+            OpenAIError: If message creation fails or the run ends with an error.
+            RequestMergedError: If the message was merged into a run started by a later request.
+            RequestCancelledError: If the request was cancelled before the reply was complete.
+        """
+        if tg_user_id is not None:
+            await self._supersede(tg_user_id, mode)
+            chunks = self.ask_stream(assistant_id, thread_id, user_message, mode)
+            async for chunk in self._stream_tracked(tg_user_id, mode, thread_id, chunks):
+                yield chunk
+            return
+
+        priority = self._get_priority(mode)
+
+        if self._uses_chat_engine(mode):
+            async with self._admission.slot(priority, estimate_tokens(user_message)):
+                self._mark_running()
+                chunks = self._stream_with_retry(
+                    lambda: self._chat_engine.ask_stream(assistant_id, thread_id, user_message, mode)
+                )
+                async for chunk in chunks:
+                    yield chunk
+            return
+
+        try:
+            async with self._scheduler.slot(thread_id, user_message) as batch:
+                async with self._admission.slot(priority, estimate_tokens("\n\n".join(batch))):
+                    await self._post_message(thread_id, batch)
+
+                    chunks = self._stream_with_retry(lambda: self._stream_run(assistant_id, thread_id))
+                    async for chunk in chunks:
+                        yield chunk
+
+        except OpenAIError as e:
+            logger.error(f"OpenAI Error (ask_stream): {e}")
+            raise
+
+    async def _stream_run(self, assistant_id: str, thread_id: str) -> AsyncIterator[str]:
+        """
+        Starts a streamed run on the thread and yields its text deltas.
+
+        Args:
+            assistant_id (str): ID of the assistant to run.
+            thread_id (str): ID of the conversation thread.
+
+        Yields:
+            str: Consecutive pieces of the assistant's reply.
+
+        Raises:
+            OpenAIError: If the run ends with an error.
+        """
+        async with self._client.beta.threads.runs.stream(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            model=self._model,
+            temperature=self._temperature
+        ) as stream:
+            async for event in stream:
+                if event.event == "thread.run.created":
+                    self._mark_running(event.data.id)
+
+                elif event.event == "thread.message.delta":
+                    for content in event.data.delta.content or []:
+                        if content.type == "text" and content.text and content.text.value:
+                            yield content.text.value
+
+                elif event.event in ("thread.run.failed", "thread.run.expired"):
+                    raise OpenAIError(f"Run failed: {event.data.last_error}")
+
+                elif event.event in ("thread.run.cancelled", "thread.run.incomplete", "thread.run.requires_action"):
+                    raise OpenAIError(f"Run ended with status {event.data.status}")
+
+                elif event.event == "error":
+                    raise OpenAIError(f"Stream error: {event.data}")
+
+    async def _stream_with_retry(self, open_stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Yields from a stream, reopening it after the cooldown if it is rate limited before the first chunk.
+
+        Args:
+            open_stream (Callable[[], AsyncIterator[str]]): Starts a new stream of reply chunks.
+
+        Yields:
+            str: Consecutive pieces of the reply.
+
+        Raises:
+            RateLimitError: If the stream was rate limited after it started or on every attempt.
+        """
+        for attempt in itertools.count(1):
+            started = False
+            await self._admission.pace()
+            try:
+                async for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+            except RateLimitError as e:
+                if started or not self._admission.should_retry(e, attempt):
+                    self._admission.record_rate_limit(e)
+                    raise
+                await self._admission.backoff(e)
+
+    @contextmanager
+    def _tracking(
+        self,
+        tg_user_id: int,
+        mode: str | None,
+        thread_id: str,
+        request_coro: Awaitable
+    ) -> Iterator[_ActiveRequest]:
+        """
+        Runs a request in its own task and registers it under (user, mode) while it is in flight.
 
-            for attempt in range(1, max_retries + 1):
-                run = await self._client.beta.threads.runs.create(
-                    thread_id=thread_id,
-                    assistant_id=assistant_id,
-                    model=self._model,
-                    temperature=self._temperature
+        Running the request in a separate task lets `cancel_runs` cancel it without
+        cancelling the caller; the caller gets RequestCancelledError instead.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            mode (str, optional): Chat mode.
+            thread_id (str): ID of the conversation thread.
+            request_coro (Awaitable): The request to run.
+
+        Yields:
+            _ActiveRequest: The tracked request; await `task` for its result.
+
+        Raises:
+            RequestCancelledError: If the request was cancelled through `_cancel`.
+        """
+        key = (tg_user_id, mode)
+        request = _ActiveRequest(thread_id=thread_id)
+        request.task = asyncio.create_task(self._run_tracked(request, request_coro))
+        active = self._active.setdefault(key, set())
+        active.add(request)
+
+        try:
+            yield request
+        except asyncio.CancelledError:
+            if request.cancelled and not asyncio.current_task().cancelling():
+                raise RequestCancelledError(
+                    f"Request on thread {thread_id} was cancelled",
+                    superseded=request.superseded
+                ) from None
+            raise
+        finally:
+            request.task.cancel()
+            active.discard(request)
+            if not active and self._active.get(key) is active:
+                del self._active[key]
+
+    async def _stream_tracked(
+        self,
+        tg_user_id: int,
+        mode: str | None,
+        thread_id: str,
+        chunks: AsyncIterator[str]
+    ) -> AsyncIterator[str]:
+        """
+        Consumes a stream in a tracked task and yields its chunks to the caller.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            mode (str, optional): Chat mode.
+            thread_id (str): ID of the conversation thread.
+            chunks (AsyncIterator[str]): Stream of reply chunks.
+
+        Yields:
+            str: Consecutive pieces of the reply.
+
+        Raises:
+            RequestCancelledError: If the request was cancelled before the stream ended.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def produce() -> None:
+            async for chunk in chunks:
+                queue.put_nowait(chunk)
+
+        with self._tracking(tg_user_id, mode, thread_id, produce()) as request:
+            request.task.add_done_callback(lambda _: queue.put_nowait(_STREAM_END))
+            while (chunk := await queue.get()) is not _STREAM_END:
+                yield chunk
+            await request.task
+
+    @staticmethod
+    async def _run_tracked(request: _ActiveRequest, request_coro: Awaitable):
+        """
+        Makes the request visible to `_mark_running` and runs it.
+
+        Args:
+            request (_ActiveRequest): The tracked request.
+            request_coro (Awaitable): The request to run.
+
+        Returns:
+            The result of the request.
+        """
+        _current_request.set(request)
+        return await request_coro
+
+    @staticmethod
+    def _mark_running(run_id: str | None = None) -> None:
+        """
+        Records that the tracked request of the current task reached OpenAI.
+
+        Args:
+            run_id (str, optional): ID of the run started for the request.
+        """
+        request = _current_request.get()
+        if request is not None:
+            request.running = True
+            if run_id is not None:
+                request.run_id = run_id
+
+    async def _supersede(self, tg_user_id: int, mode: str | None) -> None:
+        """
+        Cancels the user's requests in the mode that are already generating a reply.
+
+        Queued requests are left alone: their messages are merged into the new request's run.
+
+        Args:
+            tg_user_id (int): Telegram user ID.
+            mode (str, optional): Chat mode.
+        """
+        for request in list(self._active.get((tg_user_id, mode), ())):
+            if request.running:
+                await self._cancel(request, superseded=True)
+
+    async def _cancel(self, request: _ActiveRequest, superseded: bool = False) -> None:
+        """
+        Cancels the request's run on OpenAI, then the task waiting for it.
+
+        The run is cancelled first, so the next request on the thread does not
+        find it still active.
+
+        Args:
+            request (_ActiveRequest): The request to cancel.
+            superseded (bool): True if a newer request of the user replaces it.
+        """
+        if request.cancelled:
+            return
+        request.cancelled = True
+        request.superseded = superseded
+
+        if request.run_id is not None:
+            try:
+                await self._admission.call(
+                    self._client.beta.threads.runs.cancel,
+                    run_id=request.run_id,
+                    thread_id=request.thread_id
                 )
+                logger.info(f"Cancelled run {request.run_id} on thread {request.thread_id}")
+            except OpenAIError as e:
+                # Usually the run has just finished
+                logger.info(f"Run {request.run_id} was not cancelled: {e}")
+
+        request.task.cancel()
+
+    def _get_priority(self, mode: str | None) -> Priority:
+        """
+        Returns the admission priority of requests for the mode.
+
+        Args:
+            mode (str, optional): Chat mode.
 
-                while run.status in ["queued", "in_progress"]:
-                    await asyncio.sleep(1)
-                    run = await self._client.beta.threads.runs.retrieve(
-                        thread_id=thread_id,
-                        run_id=run.id
-                    )
+        Returns:
+            Priority: Configured priority, NORMAL if the mode is not listed.
+        """
+        return self._priority_by_mode.get(mode, Priority.NORMAL)
 
-                if run.status == "completed":
-                    break
+    def _uses_chat_engine(self, mode: str | None) -> bool:
+        """
+        Checks whether requests for the mode are answered by the Chat Completions engine.
 
-                if run.status == "failed":
-                    error_code = getattr(run.last_error, "code", "")
-                    error_msg = getattr(run.last_error, "message", "")
-                    logger.warning(f"Run attempt {attempt} failed: {error_code} - {error_msg}")
+        Args:
+            mode (str, optional): Chat mode.
 
-                    if error_code == "server_error" and attempt < max_retries:
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    raise OpenAIError(f"Run failed: {run.last_error}")
+        Returns:
+            bool: True if the chat engine is configured and selected for the mode.
+        """
+        return (
+            self._chat_engine is not None
+            and self._engine_by_mode.get(mode, OpenAIEngine.ASSISTANTS.value) == OpenAIEngine.CHAT.value
+        )
 
-            messages = await self._client.beta.threads.messages.list(thread_id=thread_id)
-            for message in messages.data:
-                if message.role == "assistant":
-                    for content in message.content:
-                        if content.type == "text":
-                            return content.text.value
+    async def _post_message(self, thread_id: str, batch: list[str]) -> None:
+        """
+        Posts a batch of user messages to the thread as a single message.
 
-            return ""
+        Runs started by this process are serialized by the scheduler, so the thread
+        is normally free. A run left over from outside the scheduler (e.g. before a restart)
+        makes OpenAI reject the message; in that case it waits for that run and retries once.
 
-        except OpenAIError as e:
-            logger.error(f"OpenAI Error (ask): {e}")
-            raise
\ No newline at end of file
+        Args:
+            thread_id (str): ID of the conversation thread.
+            batch (list[str]): User messages to post, in arrival order.
+
+        Raises:
+            OpenAIError: If message creation fails.
+        """
+        content = "\n\n".join(batch)
+        create_message = self._client.beta.threads.messages.create
+        try:
+            await self._admission.call(create_message, thread_id=thread_id, role="user", content=content)
+        except BadRequestError as e:
+            if "active" not in str(e):
+                raise
+            await self._wait_for_active_run(thread_id)
+            await self._admission.call(create_message, thread_id=thread_id, role="user", content=content)
+
+    async def _wait_for_active_run(self, thread_id: str) -> None:
+        """
+        Waits until the latest run on the thread is no longer queued or in progress.
+
+        Used as a fallback when OpenAI reports an active run that was not started
+        through the scheduler.
+
+        Args:
+            thread_id (str): ID of the conversation thread.
+
+        Raises:
+            OpenAIError: If the previous run failed.
+        """
+        runs = await self._admission.call(self._client.beta.threads.runs.list, thread_id=thread_id, limit=1)
+        latest_run = runs.data[0] if runs.data else None
+
+        if latest_run and latest_run.status in ACTIVE_RUN_STATUSES:
+            logger.info(f"Waiting for previous run {latest_run.id} to complete...")
+            latest_run = await self._monitor.wait(thread_id, latest_run.id, key=(latest_run.assistant_id, None))
+            if latest_run.status == "failed":
+                raise OpenAIError(f"Previous run failed: {latest_run.last_error}")
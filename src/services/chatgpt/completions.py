@@ -0,0 +1,203 @@
+"""
+This module implements a Chat Completions engine for the OpenAI client.
+
+Instead of posting a message to an Assistants thread, starting a run and polling it,
+the engine builds the prompt locally from the assistant's instructions
+(`resources/prompts/*.txt`) and the history already stored in `gpt_messages`,
+then answers with a single `chat.completions` call.
+
+Main Components:
+- OpenAIEngine: Names of the engines that can be selected per mode.
+- ChatCompletionsEngine: Builds the prompt and calls the Chat Completions API.
+"""
+
+from enum import Enum
+from typing import AsyncIterator
+
+from openai import AsyncOpenAI, OpenAIError
+
+from db.repository import GptThreadRepository
+from settings import get_logger, resources
+
+logger = get_logger(__name__)
+
+
+class OpenAIEngine(Enum):
+    """
+    Enumeration of engines used to answer user messages.
+
+    Attributes:
+        ASSISTANTS (str): Assistants API (threads, messages, runs).
+        CHAT (str): Chat Completions API with locally stored history.
+    """
+    ASSISTANTS = "assistants"
+    CHAT = "chat"
+
+
+class ChatCompletionsEngine:
+    """
+    Answers user messages with one Chat Completions call per request.
+
+    The system prompt is the prompt file the assistant was created from,
+    and the conversation history is read from the local SQLite database.
+
+    Attributes:
+        _client (AsyncOpenAI): Shared OpenAI async client.
+        _model (str): Model name used for completions.
+        _temperature (float): Sampling temperature.
+        _thread_repository (GptThreadRepository): Source of the stored message history.
+        _prompt_by_assistant (dict[str, str]): Prompt file name for each assistant ID.
+        _history_limits (dict[str, int]): Number of stored messages sent as context, per mode.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        temperature: float,
+        thread_repository: GptThreadRepository,
+        prompt_by_assistant: dict[str, str],
+        history_limits: dict[str, int] | None = None
+    ):
+        """
+        Initializes the Chat Completions engine.
+
+        Args:
+            client (AsyncOpenAI): Shared OpenAI async client.
+            model (str): Model name used for completions.
+            temperature (float): Sampling temperature.
+            thread_repository (GptThreadRepository): Source of the stored message history.
+            prompt_by_assistant (dict[str, str]): Prompt file name (without extension) for each assistant ID.
+            history_limits (dict[str, int], optional): Number of stored messages sent as context, per mode.
+                Modes that are not listed are treated as stateless.
+        """
+        self._client = client
+        self._model = model
+        self._temperature = temperature
+        self._thread_repository = thread_repository
+        self._prompt_by_assistant = prompt_by_assistant
+        self._history_limits = history_limits or {}
+
+    async def ask(self, assistant_id: str, thread_id: str, user_message: str, mode: str | None = None) -> str:
+        """
+        Sends a user message with the assistant's instructions and returns the reply.
+
+        Args:
+            assistant_id (str): ID of the assistant whose instructions are used as the system prompt.
+            thread_id (str): ID of the conversation thread used to look up stored history.
+            user_message (str): User's message to send.
+            mode (str, optional): Chat mode, used to pick the history limit.
+
+        Returns:
+            str: Assistant's reply as plain text.
+
+        Raises:
+            OpenAIError: If the completion request fails.
+        """
+        messages = await self._build_messages(assistant_id, thread_id, user_message, mode)
+
+        try:
+            completion = await self._client.chat.completions.create(
+                model=self._model,
+                temperature=self._temperature,
+                messages=messages
+            )
+        except OpenAIError as e:
+            logger.error(f"OpenAI Error (chat ask): {e}")
+            raise
+
+        return completion.choices[0].message.content or ""
+
+    async def ask_stream(
+        self,
+        assistant_id: str,
+        thread_id: str,
+        user_message: str,
+        mode: str | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Same as `ask`, but yields the reply in pieces as it is generated.
+
+        Args:
+            assistant_id (str): ID of the assistant whose instructions are used as the system prompt.
+            thread_id (str): ID of the conversation thread used to look up stored history.
+            user_message (str): User's message to send.
+            mode (str, optional): Chat mode, used to pick the history limit.
+
+        Yields:
+            str: Consecutive pieces of the assistant's reply.
+
+        Raises:
+            OpenAIError: If the completion request fails.
+        """
+        messages = await self._build_messages(assistant_id, thread_id, user_message, mode)
+
+        try:
+            stream = await self._client.chat.completions.create(
+                model=self._model,
+                temperature=self._temperature,
+                messages=messages,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except OpenAIError as e:
+            logger.error(f"OpenAI Error (chat ask_stream): {e}")
+            raise
+
+    async def _build_messages(
+        self,
+        assistant_id: str,
+        thread_id: str,
+        user_message: str,
+        mode: str | None
+    ) -> list[dict]:
+        """
+        Builds the Chat Completions message list: instructions, recent history, user message.
+
+        Handlers usually save the user message before asking, so a trailing stored copy
+        of the same message is dropped to avoid sending it twice.
+
+        Args:
+            assistant_id (str): ID of the assistant whose instructions are used.
+            thread_id (str): ID of the conversation thread.
+            user_message (str): User's message to send.
+            mode (str, optional): Chat mode, used to pick the history limit.
+
+        Returns:
+            list[dict]: Messages with 'role' and 'content'.
+        """
+        messages = [{"role": "system", "content": await self._get_instructions(assistant_id)}]
+
+        history_limit = self._history_limits.get(mode, 0)
+        if history_limit > 0:
+            # One extra row in case the last stored message is this user message
+            history = await self._thread_repository.get_recent_messages(thread_id, history_limit + 1)
+            if history and history[-1]["role"] == "user" and history[-1]["content"] == user_message:
+                history = history[:-1]
+            messages.extend(
+                {"role": message["role"], "content": message["content"]} for message in history[-history_limit:]
+            )
+
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    async def _get_instructions(self, assistant_id: str) -> str:
+        """
+        Returns the prompt text the assistant was created from (kept in memory, see ResourceBundle).
+
+        Args:
+            assistant_id (str): ID of the assistant.
+
+        Returns:
+            str: Contents of the prompt file.
+
+        Raises:
+            OpenAIError: If no prompt is configured for the assistant.
+        """
+        prompt_name = self._prompt_by_assistant.get(assistant_id)
+        if prompt_name is None:
+            raise OpenAIError(f"No prompt configured for assistant {assistant_id}")
+
+        return resources.prompt(prompt_name)
@@ -0,0 +1,335 @@
+"""
+This module implements a shared poller for OpenAI Assistants runs.
+
+Instead of every `ask` call polling its own run once per second, callers register
+the run with a single background monitor and await a future. The monitor polls all
+registered runs under a global concurrency cap and adapts each run's schedule to the
+latency observed for its assistant and mode: the first check is timed close to the
+expected completion, then checks start fast and back off exponentially with jitter.
+Checks go through the shared AdmissionController, so they count against the request
+budget and pause while OpenAI is rate limiting.
+
+Main Components:
+- RunMonitor: Registers runs, polls them in the background and resolves their futures.
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from openai import AsyncOpenAI, OpenAIError
+from openai.types.beta.threads import Run
+
+from services.chatgpt.admission import AdmissionController
+from settings import get_logger
+
+logger = get_logger(__name__)
+
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "cancelling")
+
+
+@dataclass
+class _WatchedRun:
+    """
+    A run registered with the monitor.
+
+    Attributes:
+        thread_id (str): ID of the run's thread.
+        run_id (str): ID of the run.
+        key (tuple): Latency statistics key (assistant ID, mode).
+        future (asyncio.Future): Resolved with the final Run object.
+        registered_at (float): Monotonic registration time.
+        next_poll_at (float): Monotonic time of the next check.
+        interval (float): Current delay between checks.
+        polls (int): Number of status checks made so far.
+        errors (int): Consecutive failed checks.
+        polling (bool): True while a check is in flight.
+    """
+    thread_id: str
+    run_id: str
+    key: tuple
+    future: asyncio.Future
+    registered_at: float
+    next_poll_at: float
+    interval: float
+    polls: int = 0
+    errors: int = 0
+    polling: bool = field(default=False)
+
+
+class RunMonitor:
+    """
+    Background poller shared by all in-flight runs.
+
+    Attributes:
+        _client (AsyncOpenAI): OpenAI async client used for `runs.retrieve`.
+        _admission (AdmissionController): Request budget and 429 handling shared with the client.
+        _semaphore (asyncio.Semaphore): Global cap on concurrent status checks.
+        _min_interval (float): Delay of the fast early checks, in seconds.
+        _max_interval (float): Upper bound of the backoff delay, in seconds.
+        _backoff (float): Multiplier applied to the delay after each check.
+        _jitter (float): Relative random spread applied to every delay.
+        _max_errors (int): Consecutive failed checks after which the run is given up.
+        _runs (dict[str, _WatchedRun]): Registered runs by run ID.
+        _latency (dict[tuple, float]): Smoothed run latency per (assistant ID, mode).
+        poll_counts (OrderedDict[str, int]): Number of checks made for recently finished runs.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        admission: AdmissionController,
+        max_concurrency: int = 8,
+        min_interval: float = 0.25,
+        max_interval: float = 4.0,
+        backoff: float = 1.6,
+        jitter: float = 0.2,
+        max_errors: int = 5,
+        history_size: int = 1000
+    ):
+        """
+        Initializes the monitor. The polling task starts on the first registration.
+
+        Args:
+            client (AsyncOpenAI): OpenAI async client.
+            admission (AdmissionController): Request budget and 429 handling shared with the client.
+            max_concurrency (int): Maximum number of status checks in flight.
+            min_interval (float): Delay of the fast early checks, in seconds.
+            max_interval (float): Upper bound of the backoff delay, in seconds.
+            backoff (float): Multiplier applied to the delay after each check.
+            jitter (float): Relative random spread applied to every delay (0.2 = ±20%).
+            max_errors (int): Consecutive failed checks after which the run is given up.
+            history_size (int): Number of finished runs kept in `poll_counts`.
+        """
+        self._client = client
+        self._admission = admission
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._jitter = jitter
+        self._max_errors = max_errors
+        self._history_size = history_size
+
+        self._runs: dict[str, _WatchedRun] = {}
+        self._latency: dict[tuple, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._poll_tasks: set[asyncio.Task] = set()
+
+        self.poll_counts: OrderedDict[str, int] = OrderedDict()
+        self._polls_total = 0
+        self._runs_finished = 0
+
+    async def wait(self, thread_id: str, run_id: str, key: tuple = ()) -> Run:
+        """
+        Registers a run and waits until it leaves the queued/in-progress states.
+
+        Args:
+            thread_id (str): ID of the run's thread.
+            run_id (str): ID of the run.
+            key (tuple): Latency statistics key, usually (assistant ID, mode).
+
+        Returns:
+            Run: The run object in its final state.
+
+        Raises:
+            OpenAIError: If the run status could not be retrieved repeatedly.
+        """
+        return await self.register(thread_id, run_id, key)
+
+    def register(self, thread_id: str, run_id: str, key: tuple = ()) -> asyncio.Future:
+        """
+        Registers a run for polling.
+
+        Args:
+            thread_id (str): ID of the run's thread.
+            run_id (str): ID of the run.
+            key (tuple): Latency statistics key, usually (assistant ID, mode).
+
+        Returns:
+            asyncio.Future: Resolved with the final Run object.
+        """
+        if run_id in self._runs:
+            return self._runs[run_id].future
+
+        now = time.monotonic()
+        expected = self._latency.get(key)
+        first_delay = max(self._min_interval, expected * 0.7) if expected else self._min_interval
+
+        watched = _WatchedRun(
+            thread_id=thread_id,
+            run_id=run_id,
+            key=key,
+            future=asyncio.get_running_loop().create_future(),
+            registered_at=now,
+            next_poll_at=now + self._with_jitter(first_delay),
+            interval=self._min_interval
+        )
+        self._runs[run_id] = watched
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+        self._wakeup.set()
+
+        return watched.future
+
+    def get_stats(self) -> dict:
+        """
+        Returns polling statistics.
+
+        Returns:
+            dict: Number of watched runs, total checks, finished runs, average checks
+                per finished run and smoothed latency per (assistant ID, mode).
+        """
+        return {
+            "watched": len(self._runs),
+            "polls_total": self._polls_total,
+            "runs_finished": self._runs_finished,
+            "avg_polls_per_run": round(sum(self.poll_counts.values()) / len(self.poll_counts), 2)
+            if self.poll_counts else 0.0,
+            "latency": {key: round(value, 2) for key, value in self._latency.items()},
+        }
+
+    async def close(self) -> None:
+        """
+        Stops the polling task and cancels the futures of runs still being watched.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for task in list(self._poll_tasks):
+            task.cancel()
+
+        for watched in self._runs.values():
+            if not watched.future.done():
+                watched.future.cancel()
+        self._runs.clear()
+
+    async def _loop(self) -> None:
+        """
+        Sleeps until the next run is due, then starts its status check.
+        Exits when no runs are left; `register` starts it again.
+        """
+        while self._runs:
+            now = time.monotonic()
+            due = [
+                watched for watched in self._runs.values()
+                if not watched.polling and watched.next_poll_at <= now
+            ]
+
+            for watched in due:
+                if watched.future.done():
+                    # The caller gave up waiting (e.g. the handler was cancelled)
+                    self._runs.pop(watched.run_id, None)
+                    continue
+                watched.polling = True
+                task = asyncio.create_task(self._poll(watched))
+                self._poll_tasks.add(task)
+                task.add_done_callback(self._poll_tasks.discard)
+
+            pending = [watched.next_poll_at for watched in self._runs.values() if not watched.polling]
+            timeout = max(0.0, min(pending) - time.monotonic()) if pending else None
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, watched: _WatchedRun) -> None:
+        """
+        Checks the status of one run and either resolves it or schedules the next check.
+
+        Args:
+            watched (_WatchedRun): The run to check.
+        """
+        try:
+            async with self._semaphore:
+                run = await self._admission.call(
+                    self._client.beta.threads.runs.retrieve,
+                    thread_id=watched.thread_id,
+                    run_id=watched.run_id
+                )
+        except OpenAIError as e:
+            watched.errors += 1
+            logger.warning(f"Run status check failed for {watched.run_id} ({watched.errors}): {e}")
+            if watched.errors >= self._max_errors:
+                self._finish(watched, error=e)
+            else:
+                self._schedule_next(watched)
+            return
+        finally:
+            watched.polls += 1
+            self._polls_total += 1
+
+        watched.errors = 0
+        if run.status in ACTIVE_RUN_STATUSES:
+            self._schedule_next(watched)
+        else:
+            self._finish(watched, run=run)
+
+    def _schedule_next(self, watched: _WatchedRun) -> None:
+        """
+        Schedules the next check with exponential backoff and jitter.
+
+        Args:
+            watched (_WatchedRun): The run to reschedule.
+        """
+        watched.next_poll_at = time.monotonic() + self._with_jitter(watched.interval)
+        watched.interval = min(self._max_interval, watched.interval * self._backoff)
+        watched.polling = False
+        self._wakeup.set()
+
+    def _finish(self, watched: _WatchedRun, run: Run | None = None, error: Exception | None = None) -> None:
+        """
+        Resolves the run's future and records its latency and number of checks.
+
+        Args:
+            watched (_WatchedRun): The finished run.
+            run (Run, optional): Final run object.
+            error (Exception, optional): Error to raise to the caller instead.
+        """
+        self._runs.pop(watched.run_id, None)
+        self._wakeup.set()
+
+        elapsed = time.monotonic() - watched.registered_at
+        self._runs_finished += 1
+        self.poll_counts[watched.run_id] = watched.polls
+        while len(self.poll_counts) > self._history_size:
+            self.poll_counts.popitem(last=False)
+
+        if run is not None and run.status == "completed":
+            previous = self._latency.get(watched.key)
+            self._latency[watched.key] = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+
+        logger.info(
+            f"Run {watched.run_id} finished "
+            f"({run.status if run is not None else 'error'}) after {watched.polls} polls in {elapsed:.2f}s"
+        )
+
+        if watched.future.done():
+            return
+        if error is not None:
+            watched.future.set_exception(error)
+        else:
+            watched.future.set_result(run)
+
+    def _with_jitter(self, delay: float) -> float:
+        """
+        Applies random jitter to a delay.
+
+        Args:
+            delay (float): Base delay in seconds.
+
+        Returns:
+            float: Delay spread by ±`jitter`.
+        """
+        return delay * random.uniform(1 - self._jitter, 1 + self._jitter)
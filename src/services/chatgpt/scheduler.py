@@ -0,0 +1,170 @@
+"""
+This module implements an in-process request scheduler for OpenAI threads.
+
+OpenAI allows only one active run per thread. Instead of asking the API whether a run
+is active and sleeping until it ends, requests for the same thread are queued locally:
+messages that arrive while a run is in progress are collected and posted together
+as one run once the current run completes.
+
+Main Components:
+- RequestMergedError: Raised to callers whose message was merged into a later request.
+- RequestCancelledError: Raised to callers whose request was cancelled before it was answered.
+- ThreadScheduler: Grants one run slot per thread and batches waiting messages.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+
+class RequestMergedError(Exception):
+    """
+    Raised when a user message was merged into a run started by a later request.
+
+    The message is still sent to the assistant; the reply is delivered to the
+    handler of the last message in the batch, so this caller has nothing to answer.
+    """
+
+
+class RequestCancelledError(Exception):
+    """
+    Raised when a request was cancelled before it was answered.
+
+    Happens when the user ends the conversation, switches mode or sends a newer
+    message while the run was in progress, so this caller has nothing to answer.
+
+    Attributes:
+        superseded (bool): True if a newer message of the user replaced the request,
+            False if the user left the conversation (the handler should end it).
+    """
+
+    def __init__(self, message: str = "", superseded: bool = False):
+        """
+        Initializes the error.
+
+        Args:
+            message (str): Error message.
+            superseded (bool): True if a newer message of the user replaced the request.
+        """
+        super().__init__(message)
+        self.superseded = superseded
+
+
+@dataclass
+class _ThreadQueue:
+    """
+    Scheduling state of a single thread.
+
+    Attributes:
+        busy (bool): True while a run slot on the thread is held.
+        pending (list[tuple[str, asyncio.Future]]): Messages waiting for the next run and their callers.
+    """
+    busy: bool = False
+    pending: list[tuple[str, asyncio.Future]] = field(default_factory=list)
+
+
+class ThreadScheduler:
+    """
+    Serializes runs per thread and merges messages that arrive while a run is active.
+
+    Attributes:
+        _queues (dict[str, _ThreadQueue]): Scheduling state by thread ID (only for active threads).
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty scheduler.
+        """
+        self._queues: dict[str, _ThreadQueue] = {}
+
+    def is_busy(self, thread_id: str) -> bool:
+        """
+        Checks whether a run slot on the thread is currently held.
+
+        Args:
+            thread_id (str): ID of the conversation thread.
+
+        Returns:
+            bool: True if a run is in progress on the thread.
+        """
+        queue = self._queues.get(thread_id)
+        return queue is not None and queue.busy
+
+    @asynccontextmanager
+    async def slot(self, thread_id: str, user_message: str) -> AsyncIterator[list[str]]:
+        """
+        Waits for the thread to become free and yields the batch of messages to post.
+
+        If the thread is idle, the caller gets the slot immediately with its own message.
+        Otherwise the message is queued; when the current run completes, all queued
+        messages form one batch. The caller that queued last receives the batch and
+        runs it, while the others get RequestMergedError.
+
+        Args:
+            thread_id (str): ID of the conversation thread.
+            user_message (str): User's message to send.
+
+        Yields:
+            list[str]: Messages to post in this run, in arrival order.
+
+        Raises:
+            RequestMergedError: If the message was merged into another caller's run.
+        """
+        queue = self._queues.setdefault(thread_id, _ThreadQueue())
+        future = asyncio.get_running_loop().create_future()
+        queue.pending.append((user_message, future))
+
+        if not queue.busy:
+            self._dispatch(queue)
+
+        try:
+            messages = await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was granted right before cancellation; pass it on
+                self._release(thread_id, queue)
+            else:
+                queue.pending = [item for item in queue.pending if item[1] is not future]
+                if not queue.busy and not queue.pending and self._queues.get(thread_id) is queue:
+                    del self._queues[thread_id]
+            raise
+
+        try:
+            yield messages
+        finally:
+            self._release(thread_id, queue)
+
+    def _dispatch(self, queue: _ThreadQueue) -> None:
+        """
+        Takes all pending messages as one batch and hands the slot to the last caller.
+
+        Args:
+            queue (_ThreadQueue): State of the thread being dispatched.
+        """
+        batch = [(message, future) for message, future in queue.pending if not future.done()]
+        queue.pending = []
+        if not batch:
+            return
+
+        queue.busy = True
+        messages = [message for message, _ in batch]
+        *merged, (_, leader) = batch
+
+        for _, future in merged:
+            future.set_exception(RequestMergedError(f"Merged into a run of {len(messages)} messages"))
+        leader.set_result(messages)
+
+    def _release(self, thread_id: str, queue: _ThreadQueue) -> None:
+        """
+        Frees the thread's slot and starts the next batch, if any.
+
+        Args:
+            thread_id (str): ID of the conversation thread.
+            queue (_ThreadQueue): State of the thread.
+        """
+        queue.busy = False
+        if queue.pending:
+            self._dispatch(queue)
+        elif self._queues.get(thread_id) is queue:
+            del self._queues[thread_id]
@@ -0,0 +1,189 @@
+"""
+This module implements a pool of pre-created OpenAI threads.
+
+Creating a thread is a remote round trip that new users (and users entering a mode
+for the first time) would otherwise pay before their first question. The pool creates
+empty threads in the background and hands them out instantly; unused thread IDs are
+saved to a JSON file so they survive restarts.
+
+Main Components:
+- ThreadPool: Keeps up to `size` empty threads ready, refills in the background and persists them.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import aiofiles
+from openai import OpenAIError
+
+from settings import get_logger
+
+logger = get_logger(__name__)
+
+
+class ThreadPool:
+    """
+    Pool of empty OpenAI threads ready to be assigned to a user and mode.
+
+    Attributes:
+        _create (Callable[[], Awaitable[str]]): Creates a thread and returns its ID.
+        _delete (Callable[[str], Awaitable[bool]]): Deletes a thread by ID.
+        _size (int): Number of threads kept ready.
+        _path (Path | None): JSON file unused thread IDs are persisted to.
+        _delete_on_shutdown (bool): Delete unused threads on close instead of persisting them.
+        _max_age_s (float): Age after which a pooled thread is not handed out any more.
+        _threads (deque[tuple[str, float]]): Ready thread IDs with their creation time, oldest first.
+        _refill_task (asyncio.Task | None): Running refill, if any.
+        _save_lock (asyncio.Lock): Serializes writes of the JSON file.
+    """
+
+    def __init__(
+        self,
+        create: Callable[[], Awaitable[str]],
+        delete: Callable[[str], Awaitable[bool]],
+        size: int = 10,
+        path: Path | None = None,
+        delete_on_shutdown: bool = False,
+        max_age_s: float = 30 * 24 * 3600
+    ):
+        """
+        Initializes an empty pool. Call `start` to restore persisted threads and start filling.
+
+        Args:
+            create (Callable[[], Awaitable[str]]): Creates a thread and returns its ID.
+            delete (Callable[[str], Awaitable[bool]]): Deletes a thread by ID.
+            size (int): Number of threads kept ready (0 disables the pool).
+            path (Path, optional): JSON file unused thread IDs are persisted to.
+            delete_on_shutdown (bool): Delete unused threads on close instead of persisting them.
+            max_age_s (float): Age after which a pooled thread is discarded.
+        """
+        self._create = create
+        self._delete = delete
+        self._size = size
+        self._path = path
+        self._delete_on_shutdown = delete_on_shutdown
+        self._max_age_s = max_age_s
+
+        self._threads: deque[tuple[str, float]] = deque()
+        self._refill_task: asyncio.Task | None = None
+        self._save_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self) -> None:
+        """
+        Restores persisted thread IDs and starts filling the pool.
+        """
+        if self._path is not None and self._path.exists():
+            try:
+                async with aiofiles.open(self._path, mode="r", encoding="utf-8") as file:
+                    saved = json.loads(await file.read())
+                now = time.time()
+                self._threads = deque(
+                    (item["id"], item["created_at"]) for item in saved
+                    if now - item["created_at"] < self._max_age_s
+                )
+                logger.info(f"Thread pool: restored {len(self._threads)} threads from {self._path}")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Thread pool: could not load {self._path}: {e}")
+
+        self._start_refill()
+
+    async def acquire(self) -> str | None:
+        """
+        Takes a ready thread out of the pool and triggers a background refill.
+
+        The pool file is rewritten before the thread is handed out, so a thread
+        assigned to a user can never be handed out again after a restart.
+
+        Returns:
+            str | None: Thread ID, or None if the pool is empty.
+        """
+        now = time.time()
+        while self._threads:
+            thread_id, created_at = self._threads.popleft()
+            if now - created_at < self._max_age_s:
+                self.hits += 1
+                await self._save()
+                self._start_refill()
+                return thread_id
+
+        self.misses += 1
+        self._start_refill()
+        return None
+
+    def get_stats(self) -> dict:
+        """
+        Returns pool statistics.
+
+        Returns:
+            dict: Ready threads, hits and misses.
+        """
+        return {"ready": len(self._threads), "hits": self.hits, "misses": self.misses}
+
+    async def close(self) -> None:
+        """
+        Stops refilling, then persists the unused threads or deletes them if configured.
+        """
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+
+        if self._delete_on_shutdown:
+            threads = list(self._threads)
+            self._threads.clear()
+            await asyncio.gather(*(self._delete(thread_id) for thread_id, _ in threads))
+            logger.info(f"Thread pool: deleted {len(threads)} unused threads")
+
+        await self._save()
+
+    def _start_refill(self) -> None:
+        """
+        Starts a background refill unless one is running or the pool is full.
+        """
+        if len(self._threads) >= self._size:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        """
+        Creates threads one at a time until the pool is full, then persists it.
+        Stops at the first failure; the next `acquire` starts it again.
+        """
+        while len(self._threads) < self._size:
+            try:
+                thread_id = await self._create()
+            except OpenAIError as e:
+                logger.warning(f"Thread pool: could not create a thread: {e}")
+                break
+            self._threads.append((thread_id, time.time()))
+
+        await self._save()
+
+    async def _save(self) -> None:
+        """
+        Writes the unused thread IDs to the JSON file atomically.
+        """
+        if self._path is None:
+            return
+
+        async with self._save_lock:
+            data = [{"id": thread_id, "created_at": created_at} for thread_id, created_at in self._threads]
+            tmp_path = self._path.with_suffix(".tmp")
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                async with aiofiles.open(tmp_path, mode="w", encoding="utf-8") as file:
+                    await file.write(json.dumps(data))
+                os.replace(tmp_path, self._path)
+            except OSError as e:
+                logger.warning(f"Thread pool: could not save {self._path}: {e}")
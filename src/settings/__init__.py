@@ -1,2 +1,3 @@
 from settings.config import config, BASE_DIR
-from settings.logging_config import get_logger
\ No newline at end of file
+from settings.logging_config import get_logger
+from settings.resources import resources
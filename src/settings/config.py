@@ -32,6 +32,55 @@ class AppConfig(BaseSettings):
         ai_assistant_translate_mileshkin_id (str): Assistant ID for text translation
         ai_assistant_resume_mileshkin_id (str): Assistant ID for creating resume
 
+        openai_engine_by_mode (dict[str, str]): Engine per mode: "assistants" (thread API) or "chat"
+            (Chat Completions with locally stored history). Modes not listed use "assistants".
+        openai_chat_history_limits (dict[str, int]): Number of stored messages sent as context per mode
+            when the "chat" engine is used. Modes not listed are stateless.
+        openai_run_poll_concurrency (int): Maximum number of run status checks in flight across all users.
+        openai_priority_by_mode (dict[str, str]): Admission priority ("high", "normal" or "low") per mode.
+            Modes not listed are "normal"; background generation (quiz bank, fact pool) is always "low".
+        openai_requests_per_minute (int): OpenAI requests admitted per minute.
+        openai_tokens_per_minute (int): Estimated OpenAI tokens admitted per minute.
+        openai_max_concurrency (int): Upper bound of OpenAI requests in flight; halved on 429 and regrown gradually.
+        openai_thread_pool_size (int): Number of empty OpenAI threads created ahead of time (0 disables the pool).
+        openai_thread_pool_delete_on_shutdown (bool): Delete unused pooled threads on shutdown instead of keeping them.
+
+        stream_edit_interval_ms (int): Minimum delay between edits of a streamed Telegram message.
+
+        quiz_bank_low_watermark (int): Number of unseen questions below which a topic is refilled.
+        quiz_bank_batch_size (int): Number of questions generated per refill.
+        quiz_bank_refill_interval_s (int): Interval of the background job that checks the stock, in seconds.
+
+        fact_pool_size (int): Number of prefetched /random facts kept ready.
+        fact_pool_low_watermark (int): Number of ready facts below which the pool refills.
+        fact_pool_refill_concurrency (int): Number of facts generated in parallel during a refill.
+        fact_pool_user_history (int): Number of recently served facts remembered per user.
+
+        translation_cache_memory_size (int): Number of translations kept in the in-memory LRU.
+        translation_cache_ttl_s (int): Lifetime of a cached translation, in seconds.
+        translation_cache_max_bytes (int): Upper bound of translations stored in SQLite, in bytes.
+        db_pool_size (int): Number of long-lived SQLite connections shared by the repositories.
+        db_cache_size_kib (int): SQLite page cache size per connection, in KiB.
+        db_mmap_size (int): Bytes of the database file memory-mapped per connection (0 disables mmap).
+        db_message_batch_size (int): Buffered chat messages that trigger a group commit.
+        db_message_flush_interval_ms (int): Longest time a chat message waits in the buffer, in milliseconds.
+        db_session_cache_size (int): Number of (user, mode) → thread ID entries cached in memory.
+        db_compress_messages (bool): Store long chat messages zlib-compressed.
+        db_compress_threshold_bytes (int): Minimum message size worth compressing, in bytes.
+        db_compress_level (int): zlib compression level (1-9).
+        db_compress_batch_size (int): Stored messages re-encoded per run of the background compression job.
+        db_compress_interval_s (int): Interval of the background compression job, in seconds.
+        db_index_batch_size (int): Stored messages added to the full-text index per run of the background indexing job.
+        db_index_interval_s (int): Interval of the background indexing job, in seconds.
+        db_shards (int): Number of database files the chat history is spread over, by Telegram user ID.
+        db_checkpoint_interval_s (int): Seconds between passive WAL checkpoints.
+        db_maintenance_hour_utc (int): Hour (UTC) of the daily off-peak maintenance (checkpoint, vacuum, statistics).
+        db_maintenance_budget_ms (int): Time budget of each maintenance task, in milliseconds.
+        resources_reload_interval_s (int): Seconds between checks of the resource files for edits.
+        persistence_update_interval_s (int): Seconds between writes of changed user data and conversation states.
+
+        history_page_size (int): Number of /history search results shown per page.
+
         path_to_messages (Path): Path to directory containing HTML message templates.
         path_to_images (Path): Path to image assets (e.g., for UI).
         path_to_menus (Path): Path to JSON files defining menu buttons.
@@ -39,6 +88,8 @@ class AppConfig(BaseSettings):
 
         path_to_logs (Path): Path to store application logs.
         path_to_db (Path): Path to SQLite database for thread/message history.
+        path_to_fact_pool (Path): Path to the JSON file with prefetched /random facts.
+        path_to_thread_pool (Path): Path to the JSON file with unused pre-created OpenAI threads.
 
         model_config (SettingsConfigDict): Pydantic settings for loading `.env` file.
     """
@@ -59,6 +110,54 @@ class AppConfig(BaseSettings):
     ai_assistant_resume_mileshkin_id: str
     ai_assistant_voice_chat_mileshkin_id: str
 
+    openai_engine_by_mode: dict[str, str] = {"random": "chat", "quiz": "chat", "translate": "chat"}
+    openai_chat_history_limits: dict[str, int] = {"gpt": 20, "talk": 20, "VOICE_CHAT": 20}
+    openai_run_poll_concurrency: int = 8
+    openai_priority_by_mode: dict[str, str] = {
+        "VOICE_CHAT": "high", "gpt": "high", "talk": "high", "translate": "high", "random": "low"
+    }
+    openai_requests_per_minute: int = 500
+    openai_tokens_per_minute: int = 200_000
+    openai_max_concurrency: int = 16
+    openai_thread_pool_size: int = 10
+    openai_thread_pool_delete_on_shutdown: bool = False
+
+    stream_edit_interval_ms: int = 1000
+
+    quiz_bank_low_watermark: int = 10
+    quiz_bank_batch_size: int = 10
+    quiz_bank_refill_interval_s: int = 300
+
+    fact_pool_size: int = 20
+    fact_pool_low_watermark: int = 10
+    fact_pool_refill_concurrency: int = 2
+    fact_pool_user_history: int = 50
+
+    translation_cache_memory_size: int = 1024
+    translation_cache_ttl_s: int = 30 * 24 * 3600
+    translation_cache_max_bytes: int = 50 * 1024 * 1024
+    db_pool_size: int = 4
+    db_cache_size_kib: int = 16 * 1024
+    db_mmap_size: int = 64 * 1024 * 1024
+    db_message_batch_size: int = 100
+    db_message_flush_interval_ms: int = 50
+    db_session_cache_size: int = 10000
+    db_compress_messages: bool = True
+    db_compress_threshold_bytes: int = 256
+    db_compress_level: int = 6
+    db_compress_batch_size: int = 500
+    db_compress_interval_s: int = 10
+    db_index_batch_size: int = 2000
+    db_index_interval_s: int = 5
+    db_shards: int = 1
+    db_checkpoint_interval_s: int = 300
+    db_maintenance_hour_utc: int = 4
+    db_maintenance_budget_ms: int = 200
+    persistence_update_interval_s: int = 60
+    resources_reload_interval_s: int = 5
+
+    history_page_size: int = 5
+
     path_to_messages: Path =  BASE_DIR / "resources" / "messages"
     path_to_images: Path =  BASE_DIR / "resources" / "images"
     path_to_menus: Path = BASE_DIR / "resources" / "menus"
@@ -72,6 +171,28 @@ class AppConfig(BaseSettings):
 
     path_to_logs: Path = BASE_DIR / "logs"
     path_to_db: Path = BASE_DIR / "storage" / "chat_sessions.db"
+    path_to_fact_pool: Path = BASE_DIR / "storage" / "fact_pool.json"
+    path_to_thread_pool: Path = BASE_DIR / "storage" / "thread_pool.json"
+
+    def get_prompt_by_assistant(self) -> dict[str, str]:
+        """
+        Maps each configured assistant ID to the prompt file it was created from.
+
+        Returns:
+            dict[str, str]: Prompt file name (without extension) keyed by assistant ID.
+        """
+        return {
+            self.ai_assistant_random_mileshkin_id: "random",
+            self.ai_assistant_gpt_mileshkin_id: "gpt",
+            self.ai_assistant_talk_einstein_mileshkin_id: "einstein",
+            self.ai_assistant_talk_king_mileshkin_id: "king",
+            self.ai_assistant_talk_napoleon_mileshkin_id: "napoleon",
+            self.ai_assistant_talk_mercury_mileshkin_id: "mercury",
+            self.ai_assistant_quiz_mileshkin_id: "quiz",
+            self.ai_assistant_translate_mileshkin_id: "translate",
+            self.ai_assistant_resume_mileshkin_id: "resume",
+            self.ai_assistant_voice_chat_mileshkin_id: "voice_chat",
+        }
 
     model_config = SettingsConfigDict(
         env_file=str(BASE_DIR / ".env"),
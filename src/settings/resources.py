@@ -0,0 +1,288 @@
+"""In-memory bundle of the bot's resource files.
+
+This module keeps the HTML messages, intro images, JSON menus and assistant prompts
+under `resources/` in memory, so handlers read them without any file I/O. Edited files
+are picked up by `ResourceBundle.reload_changed`, which the bot runs periodically.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from settings.config import config
+
+
+@dataclass(frozen=True)
+class Resource:
+    """
+    One loaded resource file.
+
+    Attributes:
+        value (Any): Parsed content: `str` for messages and prompts, `bytes` for images,
+            a read-only mapping for menus.
+        content_hash (str): Hex SHA-256 of the file content.
+        size (int): File size, in bytes.
+        mtime_ns (int): Modification time the content was read at.
+    """
+    value: Any
+    content_hash: str
+    size: int
+    mtime_ns: int
+
+
+class ResourceBundle:
+    """
+    Messages, images, menus and prompts loaded into memory once and served without I/O.
+
+    Every file of each kind's directory is read by `load` (or on first access). Values
+    are immutable and shared by all callers: strings, bytes, and menus as read-only
+    mappings. `reload_changed` compares the directories' files with what was loaded, by
+    modification time and size, and re-reads only the ones that changed; the new
+    snapshot replaces the old one at once, so readers never see a half-reloaded bundle.
+
+    Attributes:
+        _directories (dict[str, tuple[Path, str]]): Directory and file extension of each kind.
+        _resources (dict[tuple[str, str], Resource]): Loaded resources by (kind, name).
+        _loaded (bool): Whether the files have been read.
+        _lock (threading.Lock): Serializes loading and reloading.
+    """
+
+    def __init__(self, messages: Path, images: Path, menus: Path, prompts: Path):
+        """
+        Args:
+            messages (Path): Directory of the HTML messages (`<name>.html`).
+            images (Path): Directory of the images (`<name>.jpg`).
+            menus (Path): Directory of the JSON menus (`<name>.json`).
+            prompts (Path): Directory of the assistant prompts (`<name>.txt`).
+        """
+        self._directories = {
+            "message": (messages, ".html"),
+            "image": (images, ".jpg"),
+            "menu": (menus, ".json"),
+            "prompt": (prompts, ".txt"),
+        }
+        self._resources: dict[tuple[str, str], Resource] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        """
+        Reads every resource file into memory.
+
+        Returns:
+            dict: 'files', 'bytes' (size of the files), 'resident_bytes' (memory held
+                by the loaded values) and 'load_ms'.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._resources = self._scan({})
+            self._loaded = True
+        stats = self.stats()
+        stats["load_ms"] = (time.perf_counter() - started) * 1000
+        return stats
+
+    def reload_changed(self) -> list[str]:
+        """
+        Re-reads the files that were added, edited or removed since they were loaded.
+
+        Returns:
+            list[str]: "kind/name" of each resource that changed.
+        """
+        with self._lock:
+            previous = self._resources
+            resources = self._scan(previous)
+            changed = sorted(
+                f"{kind}/{name}"
+                for kind, name in previous.keys() | resources.keys()
+                if previous.get((kind, name)) is not resources.get((kind, name))
+            )
+            self._resources = resources
+            self._loaded = True
+        return changed
+
+    def stats(self) -> dict:
+        """
+        Returns the number of loaded files and their size on disk and in memory.
+
+        Returns:
+            dict: 'files', 'bytes' and 'resident_bytes'.
+        """
+        resources = self._snapshot()
+        resident = 0
+        for resource in resources.values():
+            resident += sys.getsizeof(resource.value)
+            if isinstance(resource.value, Mapping):
+                resident += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in resource.value.items())
+        return {
+            "files": len(resources),
+            "bytes": sum(resource.size for resource in resources.values()),
+            "resident_bytes": resident,
+        }
+
+    def message(self, name: str) -> str:
+        """
+        Returns an HTML message.
+
+        Args:
+            name (str): The base filename (without extension) of the message.
+
+        Returns:
+            str: The message HTML.
+
+        Raises:
+            FileNotFoundError: If there is no such message.
+        """
+        return self._get("message", name).value
+
+    def image(self, name: str) -> bytes:
+        """
+        Returns an image's content.
+
+        Args:
+            name (str): The base filename (without extension) of the image.
+
+        Returns:
+            bytes: The image content.
+
+        Raises:
+            FileNotFoundError: If there is no such image.
+        """
+        return self._get("image", name).value
+
+    def image_hash(self, name: str) -> str:
+        """
+        Returns the hash of an image's content.
+
+        Args:
+            name (str): The base filename (without extension) of the image.
+
+        Returns:
+            str: Hex SHA-256 of the image content.
+
+        Raises:
+            FileNotFoundError: If there is no such image.
+        """
+        return self._get("image", name).content_hash
+
+    def menu(self, name: str) -> Mapping[str, Any]:
+        """
+        Returns a menu definition.
+
+        Args:
+            name (str): The base filename (without extension) of the menu.
+
+        Returns:
+            Mapping[str, Any]: Read-only mapping of the parsed JSON object (command names
+                to labels for command menus, keyboard rows for `keyboards`).
+
+        Raises:
+            FileNotFoundError: If there is no such menu.
+        """
+        return self._get("menu", name).value
+
+    def prompt(self, name: str) -> str:
+        """
+        Returns an assistant prompt.
+
+        Args:
+            name (str): The base filename (without extension) of the prompt.
+
+        Returns:
+            str: The prompt text.
+
+        Raises:
+            FileNotFoundError: If there is no such prompt.
+        """
+        return self._get("prompt", name).value
+
+    def _get(self, kind: str, name: str) -> Resource:
+        """
+        Returns a loaded resource.
+
+        Args:
+            kind (str): "message", "image", "menu" or "prompt".
+            name (str): The base filename (without extension).
+
+        Returns:
+            Resource: The resource.
+
+        Raises:
+            FileNotFoundError: If there is no such resource.
+        """
+        try:
+            return self._snapshot()[(kind, name)]
+        except KeyError:
+            directory, extension = self._directories[kind]
+            raise FileNotFoundError(f"No such resource: {directory / (name + extension)}") from None
+
+    def _snapshot(self) -> dict[tuple[str, str], Resource]:
+        """
+        Returns the current resources, loading them on first use.
+        """
+        if not self._loaded:
+            self.load()
+        return self._resources
+
+    def _scan(self, previous: dict[tuple[str, str], Resource]) -> dict[tuple[str, str], Resource]:
+        """
+        Lists the resource files and reads those not in `previous` with the same mtime and size.
+
+        Args:
+            previous (dict[tuple[str, str], Resource]): Resources loaded before.
+
+        Returns:
+            dict[tuple[str, str], Resource]: All resources, unchanged ones reused from `previous`.
+        """
+        resources = {}
+        for kind, (directory, extension) in self._directories.items():
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.is_file() or not entry.name.endswith(extension):
+                    continue
+                key = (kind, entry.name[:-len(extension)])
+                stat = entry.stat()
+                resource = previous.get(key)
+                if resource is None or (resource.mtime_ns, resource.size) != (stat.st_mtime_ns, stat.st_size):
+                    resource = self._read(kind, Path(entry.path), stat.st_mtime_ns)
+                resources[key] = resource
+        return resources
+
+    @staticmethod
+    def _read(kind: str, path: Path, mtime_ns: int) -> Resource:
+        """
+        Reads and parses one resource file.
+
+        Args:
+            kind (str): "message", "image", "menu" or "prompt".
+            path (Path): File path.
+            mtime_ns (int): Modification time from the directory listing.
+
+        Returns:
+            Resource: The loaded resource.
+        """
+        data = path.read_bytes()
+        if kind == "image":
+            value = data
+        elif kind == "menu":
+            value = MappingProxyType(json.loads(data.decode("utf-8")))
+        else:
+            value = data.decode("utf-8")
+        return Resource(value, hashlib.sha256(data).hexdigest(), len(data), mtime_ns)
+
+
+resources = ResourceBundle(
+    messages=config.path_to_messages,
+    images=config.path_to_images,
+    menus=config.path_to_menus,
+    prompts=config.path_to_prompts,
+)
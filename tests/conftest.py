@@ -0,0 +1,27 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The settings are read on import; tests never reach Telegram or OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("TG_BOT_API_KEY", "123456:test")
+for _assistant in (
+    "RANDOM", "GPT", "TALK_EINSTEIN", "TALK_KING", "TALK_NAPOLEON",
+    "TALK_MERCURY", "QUIZ", "TRANSLATE", "RESUME", "VOICE_CHAT"
+):
+    os.environ.setdefault(f"AI_ASSISTANT_{_assistant}_MILESHKIN_ID", f"asst_{_assistant.lower()}")
+os.environ.setdefault("PATH_TO_LOGS", tempfile.mkdtemp(prefix="bot-test-logs-"))
+
+from db.initializer import DatabaseInitializer  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path: Path) -> Path:
+    """
+    Path to a database file migrated to the current schema.
+    """
+    path = tmp_path / "chat_sessions.db"
+    DatabaseInitializer(path).migrate()
+    return path
@@ -0,0 +1,154 @@
+import asyncio
+import email.utils
+import time
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from services.chatgpt.admission import AdmissionController
+
+
+def _rate_limit_error(headers: dict[str, str] | None = None, code: str | None = None) -> RateLimitError:
+    response = httpx.Response(429, headers=headers or {}, request=httpx.Request("POST", "https://api.openai.com/v1"))
+    body = {"code": code} if code else None
+    return RateLimitError("Rate limit reached", response=response, body=body)
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"retry-after-ms": "1500"}, 1.5),
+        ({"retry-after": "7"}, 7.0),
+        ({"retry-after-ms": "250", "retry-after": "7"}, 0.25),
+        ({"retry-after-ms": "soon", "retry-after": "3"}, 3.0),
+        ({}, None),
+        ({"retry-after": "not a date"}, None),
+    ]
+)
+def test_retry_after_header(headers, expected):
+    assert AdmissionController._retry_after(_rate_limit_error(headers)) == expected
+
+
+def test_retry_after_http_date():
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    delay = AdmissionController._retry_after(_rate_limit_error({"retry-after": date}))
+    assert 25 <= delay <= 30
+
+
+def test_retry_after_date_in_the_past_is_zero():
+    date = email.utils.formatdate(time.time() - 30, usegmt=True)
+    assert AdmissionController._retry_after(_rate_limit_error({"retry-after": date})) == 0.0
+
+
+def test_rate_limit_cuts_limit_once_per_cooldown():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=16, decrease=0.5)
+        admission.record_rate_limit(_rate_limit_error({"retry-after": "60"}))
+        after_first = admission.get_stats()["limit"]
+        # Same overload: the cooldown is still running
+        admission.record_rate_limit(_rate_limit_error({"retry-after": "60"}))
+        return after_first, admission.get_stats()
+
+    after_first, stats = asyncio.run(scenario())
+    assert after_first == 8
+    assert stats["limit"] == 8
+    assert stats["rate_limited"] == 2
+
+
+def test_rate_limit_never_cuts_below_minimum():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=2, min_concurrency=1, decrease=0.5)
+        for _ in range(3):
+            admission._cooldown_until = 0.0
+            admission.record_rate_limit(_rate_limit_error({"retry-after": "0"}))
+        return admission.get_stats()["limit"]
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_successful_requests_grow_limit_additively():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=16, increase=1.0, decrease=0.5)
+        admission.record_rate_limit(_rate_limit_error({"retry-after": "0"}))
+        cut = admission.get_stats()["limit"]
+        for _ in range(8):
+            async with admission.slot():
+                pass
+        return cut, admission.get_stats()["limit"]
+
+    cut, grown = asyncio.run(scenario())
+    # One limit-worth of successes adds about `increase`
+    assert cut == 8
+    assert 8.9 <= grown <= 9.0
+
+
+def test_limit_never_grows_above_maximum():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=4)
+        for _ in range(10):
+            async with admission.slot():
+                pass
+        return admission.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["limit"] == 4
+    assert stats["admitted"] == 10
+    assert stats["in_flight"] == 0
+
+
+def test_call_retries_after_rate_limit():
+    async def scenario():
+        admission = AdmissionController()
+        attempts = []
+
+        async def api_call(value):
+            attempts.append(value)
+            if len(attempts) == 1:
+                raise _rate_limit_error({"retry-after-ms": "10"})
+            return value
+
+        return await admission.call(api_call, "ok"), attempts, admission.get_stats()
+
+    result, attempts, stats = asyncio.run(scenario())
+    assert result == "ok"
+    assert attempts == ["ok", "ok"]
+    assert stats["rate_limited"] == 1
+
+
+def test_call_does_not_retry_exhausted_quota():
+    async def scenario():
+        admission = AdmissionController()
+        attempts = []
+
+        async def api_call():
+            attempts.append(1)
+            raise _rate_limit_error({"retry-after-ms": "10"}, code="insufficient_quota")
+
+        with pytest.raises(RateLimitError):
+            await admission.call(api_call)
+        return attempts
+
+    assert asyncio.run(scenario()) == [1]
+
+
+def test_cancelled_waiter_already_dropped_by_dispatch():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1)
+
+        async def wait_for_slot():
+            async with admission.slot():
+                pass
+
+        async with admission.slot():
+            waiter = asyncio.create_task(wait_for_slot())
+            await asyncio.sleep(0)
+            waiter.cancel()
+        # Releasing the slot dispatched (and dropped) the cancelled waiter before it resumed
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return admission.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["waiting"] == 0
+    assert stats["in_flight"] == 0
@@ -0,0 +1,115 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from db.compression import FORMAT_ZLIB, FORMAT_ZLIB_DICTIONARY, MessageCodec
+from db.pool import ConnectionPool
+from db.repository import GptThreadRepository
+
+_LONG = "The quick brown fox jumps over the lazy dog. " * 20
+
+
+def _stored_contents(db_path) -> list:
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT content FROM gpt_messages ORDER BY id")]
+
+
+async def _with_repository(db_path, scenario, codec=None):
+    pool = ConnectionPool(db_path, codec=codec)
+    repository = GptThreadRepository(pool, synchronous=True)
+    try:
+        return await scenario(repository)
+    finally:
+        await repository.close()
+        await pool.close()
+
+
+def test_short_text_is_stored_as_is(db_path):
+    assert MessageCodec(db_path).encode("hello") == "hello"
+
+
+def test_long_text_roundtrips_compressed(db_path):
+    codec = MessageCodec(db_path)
+    value = codec.encode(_LONG)
+    assert isinstance(value, bytes)
+    assert value[0] == FORMAT_ZLIB
+    assert len(value) < len(_LONG)
+    assert codec.decode(value) == _LONG
+
+
+def test_disabled_codec_still_decodes(db_path):
+    value = MessageCodec(db_path).encode(_LONG)
+    disabled = MessageCodec(db_path, enabled=False)
+    assert disabled.encode(_LONG) == _LONG
+    assert disabled.decode(value) == _LONG
+
+
+def test_corrupt_content_raises_value_error(db_path):
+    codec = MessageCodec(db_path)
+    with pytest.raises(ValueError):
+        codec.decode(bytes([FORMAT_ZLIB]) + b"not deflate")
+    with pytest.raises(ValueError):
+        codec.decode(b"\x7fwhatever")
+
+
+def test_repository_stores_compressed_and_reads_text(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        await repository.add_message("thread_1", "user", "hi")
+        await repository.add_message("thread_1", "assistant", _LONG)
+        return await repository.get_messages("thread_1")
+
+    messages = asyncio.run(_with_repository(db_path, scenario, codec=MessageCodec(db_path)))
+    assert [message["content"] for message in messages] == ["hi", _LONG]
+    assert [type(value) for value in _stored_contents(db_path)] == [str, bytes]
+
+
+def test_stored_messages_are_compressed_in_batches(db_path):
+    async def store(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        for i in range(5):
+            await repository.add_message("thread_1", "user", f"{i} {_LONG}")
+
+    async def compress(repository):
+        progress, after_id = [], 0
+        while (after_id := await repository.compress_stored_messages(after_id, batch_size=2)) is not None:
+            progress.append(after_id)
+        return progress, await repository.get_messages("thread_1")
+
+    asyncio.run(_with_repository(db_path, store))
+    assert all(isinstance(value, str) for value in _stored_contents(db_path))
+
+    progress, messages = asyncio.run(_with_repository(db_path, compress, codec=MessageCodec(db_path)))
+    assert progress == [2, 4]
+    assert all(isinstance(value, bytes) for value in _stored_contents(db_path))
+    assert [message["content"] for message in messages] == [f"{i} {_LONG}" for i in range(5)]
+
+
+def test_trained_dictionary_is_used_and_found_by_other_codecs(db_path):
+    samples = [f'{{"question": "Q{i}", "answer": "A{i}", "explanation": "because {i}"}}' for i in range(200)]
+
+    async def scenario(repository):
+        await repository.create_thread(1, "quiz", "thread_1")
+        for sample in samples:
+            await repository.add_message("thread_1", "assistant", sample)
+        return await repository.train_compression_dictionary(sample_size=200, size=1024)
+
+    codec = MessageCodec(db_path, threshold_bytes=16)
+    dictionary_id = asyncio.run(_with_repository(db_path, scenario, codec=codec))
+    assert dictionary_id is not None
+    assert codec.dictionary_id == dictionary_id
+
+    value = codec.encode(samples[0])
+    assert value[0] == FORMAT_ZLIB_DICTIONARY
+    # Another process reads the dictionary from the database
+    assert MessageCodec(db_path).decode(value) == samples[0]
+
+
+def test_too_few_messages_train_no_dictionary(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        await repository.add_message("thread_1", "user", "hello")
+        return await repository.train_compression_dictionary()
+
+    assert asyncio.run(_with_repository(db_path, scenario, codec=MessageCodec(db_path))) is None
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+from telegram import Update
+from telegram.ext import Application, DictPersistence, PersistenceInput
+from telegram.request import BaseRequest
+
+from bot.commands.gpt import gpt_conv_handler
+from db.media_cache import MediaCache
+from db.pool import ConnectionPool
+from db.repository import GptThreadRepository
+from services import OpenAIClient
+
+_USER = {"id": 1, "is_bot": False, "first_name": "User"}
+_CHAT = {"id": 1, "type": "private"}
+_SENT = {
+    "message_id": 1000,
+    "date": 0,
+    "chat": _CHAT,
+    "text": "sent",
+    "photo": [{"file_id": "photo", "file_unique_id": "photo", "width": 1, "height": 1}],
+}
+
+
+class _FakeTelegram(BaseRequest):
+    """
+    Answers every Bot API call locally.
+    """
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None) -> tuple[int, bytes]:
+        name = url.rsplit("/", 1)[-1]
+        if name == "getMe":
+            result = {"id": 99, "is_bot": True, "first_name": "Bot", "username": "test_bot"}
+        elif name.startswith(("send", "edit")):
+            result = _SENT
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class _Assistant:
+    """
+    Stands in for the OpenAI run stream: the first reply never finishes, later ones do.
+    """
+
+    def __init__(self):
+        self.streams = 0
+
+    async def stream_run(self, assistant_id: str, thread_id: str):
+        self.streams += 1
+        OpenAIClient._mark_running()
+        if self.streams == 1:
+            yield "Thinking"
+            await asyncio.Event().wait()
+        yield "Done"
+
+
+def _update(update_id: int, text: str) -> dict:
+    message = {"message_id": update_id, "date": 0, "chat": _CHAT, "from": _USER, "text": text}
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"update_id": update_id, "message": message}
+
+
+async def _run_conversation(db_path, texts: list[str]) -> int:
+    """
+    Feeds the messages to the /gpt conversation and returns how many replies were generated.
+    """
+    pool = ConnectionPool(db_path)
+    repository = GptThreadRepository(pool)
+    await repository.create_thread(1, "gpt", "thread_1")
+
+    openai_client = OpenAIClient(openai_api_key="sk-test", model="gpt-4o-mini", temperature=0.5)
+    assistant = _Assistant()
+
+    async def post_message(thread_id: str, batch: list[str]) -> None:
+        pass
+
+    openai_client._post_message = post_message
+    openai_client._stream_run = assistant.stream_run
+
+    app = (
+        Application.builder()
+        .token("123456:test")
+        .request(_FakeTelegram())
+        .get_updates_request(_FakeTelegram())
+        .persistence(DictPersistence(store_data=PersistenceInput(bot_data=False)))
+        .updater(None)
+        .build()
+    )
+    app.add_handler(gpt_conv_handler)
+    await app.initialize()
+    app.bot_data.update(
+        openai_client=openai_client,
+        thread_repository=repository,
+        media_cache=MediaCache(pool),
+    )
+    try:
+        for update_id, text in enumerate(["/gpt", *texts], start=1):
+            await app.process_update(Update.de_json(_update(update_id, text), app.bot))
+            await asyncio.sleep(0.1)
+        return assistant.streams
+    finally:
+        await app.shutdown()
+        await repository.close()
+        await pool.close()
+
+
+def test_stop_during_pending_reply_ends_the_conversation(db_path):
+    # The message after /stop must not reach the GPT handler any more
+    assert asyncio.run(_run_conversation(db_path, ["hello", "/stop", "still there?"])) == 1
+
+
+def test_newer_message_keeps_the_conversation(db_path):
+    # The second message supersedes the pending reply; the chat goes on
+    assert asyncio.run(_run_conversation(db_path, ["hello", "hello again", "and again"])) == 3
@@ -0,0 +1,93 @@
+import asyncio
+import itertools
+import json
+
+from openai import OpenAIError
+
+from bot.fact_pool import FactPool, fact_hash
+
+
+class _Generator:
+    """
+    Stands in for OpenAIClient.generate, answering with the given replies in turn.
+    """
+
+    def __init__(self, replies):
+        self._replies = iter(replies)
+
+    async def generate(self, assistant_id: str, user_message: str, mode: str | None = None) -> str:
+        reply = next(self._replies)
+        if isinstance(reply, BaseException):
+            raise reply
+        return reply
+
+
+async def _filled_pool(tmp_path, replies, **kwargs) -> FactPool:
+    pool = FactPool(_Generator(replies), "asst_random", tmp_path / "facts.json", **kwargs)
+    await pool.load()
+    await pool._refill_task
+    return pool
+
+
+def test_fact_hash_ignores_case_and_whitespace():
+    assert fact_hash("Water  boils at 100 C.") == fact_hash(" water\nboils at 100 c. ")
+
+
+def test_pool_fills_and_serves_each_fact_once(tmp_path):
+    async def scenario():
+        replies = (f"Fact {n}" for n in itertools.count())
+        pool = await _filled_pool(tmp_path, replies, size=3, low_watermark=0)
+        served = [pool.take(1) for _ in range(3)]
+        stats = pool.get_stats()
+        await pool.close()
+        return served, stats, pool.take(1)
+
+    served, stats, after = asyncio.run(scenario())
+    assert served == ["Fact 0", "Fact 1", "Fact 2"]
+    assert stats["hits"] == 3
+    assert after is None
+
+
+def test_duplicates_are_dropped_and_seen_facts_skipped(tmp_path):
+    async def scenario():
+        pool = await _filled_pool(tmp_path, ["Fact A", "fact a", "Fact B"], size=2)
+        pool.remember(1, "Fact A")
+        fact = pool.take(1)
+        stats = pool.get_stats()
+        await pool.close()
+        return fact, stats
+
+    fact, stats = asyncio.run(scenario())
+    assert fact == "Fact B"
+    assert stats["duplicates"] == 1
+
+
+def test_failed_generations_are_logged_not_raised(tmp_path, caplog):
+    async def scenario():
+        pool = await _filled_pool(tmp_path, [OpenAIError("down"), RuntimeError("bug")], size=2)
+        stats = pool.get_stats()
+        await pool.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["ready"] == 0
+    assert "generation failed: down" in caplog.text
+    assert "unexpected error while generating: bug" in caplog.text
+
+
+def test_pool_survives_restart(tmp_path):
+    async def scenario():
+        pool = await _filled_pool(tmp_path, ["Fact A", "Fact B"], size=2, low_watermark=0)
+        pool.take(7)
+        await pool.close()
+
+        restored = FactPool(_Generator([]), "asst_random", tmp_path / "facts.json", size=1, low_watermark=0)
+        await restored.load()
+        ready, fact = restored.get_stats()["ready"], restored.take(7)
+        await restored.close()
+        return ready, fact
+
+    ready, fact = asyncio.run(scenario())
+    assert (ready, fact) == (1, "Fact B")
+    saved = json.loads((tmp_path / "facts.json").read_text(encoding="utf-8"))
+    assert saved["recent"]["7"] == [fact_hash("Fact A"), fact_hash("Fact B")]
@@ -0,0 +1,168 @@
+import asyncio
+import sqlite3
+from contextlib import closing
+
+from db.compression import MESSAGE_TEXT_FUNCTION, MessageCodec
+from db.initializer import MIGRATIONS, DatabaseInitializer
+from db.pool import ConnectionPool
+from db.repository import GptThreadRepository
+
+# Schema created by the first release, before versioned migrations (user_version 0)
+_BASELINE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS gpt_sessions (
+        id INTEGER PRIMARY KEY,
+        tg_user_id INTEGER NOT NULL,
+        mode TEXT NOT NULL,
+        openai_thread_id TEXT NOT NULL UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(tg_user_id, mode)
+    );
+    CREATE TABLE IF NOT EXISTS gpt_messages (
+        id INTEGER PRIMARY KEY,
+        openai_thread_id TEXT NOT NULL,
+        role TEXT NOT NULL CHECK(role IN ('user', 'assistant', 'system')),
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(openai_thread_id) REFERENCES gpt_sessions(openai_thread_id) ON DELETE CASCADE
+    );
+"""
+
+
+def _create_baseline(path) -> None:
+    with closing(sqlite3.connect(path)) as conn:
+        conn.executescript(_BASELINE_SCHEMA)
+        conn.execute("INSERT INTO gpt_sessions (tg_user_id, mode, openai_thread_id) VALUES (42, 'gpt', 'thread_old')")
+        conn.executemany(
+            "INSERT INTO gpt_messages (openai_thread_id, role, content) VALUES (?, ?, ?)",
+            [
+                ("thread_old", "user", "What is the capital of France?"),
+                ("thread_old", "assistant", "Paris is the capital of France. " * 20),
+            ]
+        )
+        conn.commit()
+
+
+def _schema(path) -> tuple[int, set[str], set[str]]:
+    with closing(sqlite3.connect(path)) as conn:
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        session_columns = {row[1] for row in conn.execute("PRAGMA table_info(gpt_sessions);")}
+    return version, tables, session_columns
+
+
+def test_new_database_gets_latest_schema(tmp_path):
+    path = tmp_path / "new.db"
+    assert DatabaseInitializer(path).migrate() == len(MIGRATIONS)
+
+    version, tables, _ = _schema(path)
+    assert version == len(MIGRATIONS)
+    assert {"gpt_sessions", "gpt_messages", "quiz_questions", "quiz_seen", "gpt_messages_fts"} <= tables
+
+
+def test_baseline_database_is_upgraded_with_its_data(tmp_path):
+    path = tmp_path / "baseline.db"
+    _create_baseline(path)
+
+    assert DatabaseInitializer(path).migrate() == len(MIGRATIONS)
+
+    version, tables, session_columns = _schema(path)
+    assert version == len(MIGRATIONS)
+    assert {"translation_cache", "quiz_progress", "quiz_seen", "gpt_messages_fts", "ptb_conversations",
+            "media_cache", "chat_menus"} <= tables
+    assert {"last_used_at", "message_count"} <= session_columns
+
+    async def read_back():
+        pool = ConnectionPool(path)
+        repository = GptThreadRepository(pool, synchronous=True)
+        try:
+            thread_id = await repository.get_thread_id(42, "gpt")
+            messages = await repository.get_messages("thread_old")
+            while await repository.index_stored_messages() is not None:
+                pass
+            found = await repository.search_messages(42, "capital")
+            await repository.add_message("thread_old", "user", "And of Italy?")
+            return thread_id, messages, found, await repository.get_messages("thread_old")
+        finally:
+            await pool.close()
+
+    thread_id, messages, found, after_write = asyncio.run(read_back())
+    assert thread_id == "thread_old"
+    assert messages == [
+        {"role": "user", "content": "What is the capital of France?"},
+        {"role": "assistant", "content": "Paris is the capital of France. " * 20},
+    ]
+    # Messages stored before the full-text index existed are indexed in the background
+    assert len(found) == 2
+    assert after_write[-1] == {"role": "user", "content": "And of Italy?"}
+
+
+def test_migration_is_idempotent(tmp_path):
+    path = tmp_path / "baseline.db"
+    _create_baseline(path)
+    DatabaseInitializer(path).migrate()
+
+    assert DatabaseInitializer(path).migrate() == len(MIGRATIONS)
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM gpt_messages").fetchone()[0] == 2
+
+
+def test_newer_database_is_left_untouched(tmp_path):
+    path = tmp_path / "future.db"
+    DatabaseInitializer(path).migrate()
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute(f"PRAGMA user_version = {len(MIGRATIONS) + 1};")
+
+    assert DatabaseInitializer(path).migrate() == len(MIGRATIONS) + 1
+
+
+def _check_index(path) -> None:
+    with closing(sqlite3.connect(path)) as conn:
+        conn.create_function(MESSAGE_TEXT_FUNCTION, 1, MessageCodec(path).decode, deterministic=True)
+        conn.execute("INSERT INTO gpt_messages_fts(gpt_messages_fts) VALUES ('integrity-check');")
+
+
+def test_stored_messages_are_indexed_in_batches(tmp_path):
+    path = tmp_path / "baseline.db"
+    _create_baseline(path)
+    DatabaseInitializer(path).migrate()
+
+    async def scenario():
+        pool = ConnectionPool(path)
+        repository = GptThreadRepository(pool, synchronous=True)
+        try:
+            before = await repository.search_messages(42, "capital")
+            # Added after the migration: indexed right away, and not again by the backfill
+            await repository.add_message("thread_old", "user", "Capital of Spain?")
+            after_new = await repository.search_messages(42, "capital")
+            # Removed before the backfill reached it: never indexed, nothing to remove
+            await repository.clear_thread("thread_old")
+            await repository.add_message("thread_old", "user", "Capital of Italy?")
+
+            progress = []
+            while (last_id := await repository.index_stored_messages(batch_size=1)) is not None:
+                progress.append(last_id)
+            return before, after_new, progress, await repository.search_messages(42, "capital")
+        finally:
+            await pool.close()
+
+    before, after_new, progress, found = asyncio.run(scenario())
+    assert before == []
+    assert len(after_new) == 1
+    # The emptied table reused ID 1 inside the pending range, so the backfill indexed it
+    assert progress == [1, 2]
+    assert [result["snippet"] for result in found] == ["\x02Capital\x03 of Italy?"]
+    _check_index(path)
+
+
+def test_new_database_has_nothing_to_index(tmp_path):
+    path = tmp_path / "new.db"
+    DatabaseInitializer(path).migrate()
+
+    async def scenario():
+        pool = ConnectionPool(path)
+        try:
+            return await GptThreadRepository(pool).index_stored_messages()
+        finally:
+            await pool.close()
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+
+from openai import OpenAIError
+
+from bot.quiz_bank import QuizBank, parse_quiz_questions
+from db.pool import ConnectionPool
+from db.quiz_repository import QuizQuestionRepository
+
+
+def _question(n: int) -> tuple[str, dict[str, str], str]:
+    return f"Question {n}?", {"A": "one", "B": "two", "C": "three", "D": "four"}, "A"
+
+
+def _reply(*numbers: int) -> str:
+    return "\n\n".join(
+        f"Question: Question {n}?\nA) one\nB) two\nC) three\nD) four\nCorrect Answer: A" for n in numbers
+    )
+
+
+class _Generator:
+    """
+    Stands in for OpenAIClient.generate.
+    """
+
+    def __init__(self, reply: str | None):
+        self.reply = reply
+        self.calls = 0
+
+    async def generate(self, assistant_id: str, user_message: str, mode: str | None = None) -> str:
+        self.calls += 1
+        if self.reply is None:
+            raise OpenAIError("unavailable")
+        return self.reply
+
+
+async def _with_bank(db_path, scenario, reply: str | None = None):
+    pool = ConnectionPool(db_path)
+    repository = QuizQuestionRepository(pool)
+    bank = QuizBank(repository, _Generator(reply), "asst_quiz", ["science"], low_watermark=2, batch_size=3)
+    try:
+        return await scenario(bank, repository)
+    finally:
+        await pool.close()
+
+
+def test_parse_quiz_questions_skips_malformed_blocks():
+    text = _reply(1) + "\n\nQuestion: broken\nA) only one option\n\n" + _reply(2)
+    assert [question for question, _, _ in parse_quiz_questions(text)] == ["Question 1?", "Question 2?"]
+
+
+def test_questions_are_served_in_order_once(db_path):
+    async def scenario(bank, repository):
+        await repository.add_questions("science", [_question(1), _question(2)])
+        served = [await bank.next_question(1, "science") for _ in range(3)]
+        other_user = await bank.next_question(2, "science")
+        return served, other_user
+
+    served, other_user = asyncio.run(_with_bank(db_path, scenario))
+    assert [item["question"] if item else None for item in served] == ["Question 1?", "Question 2?", None]
+    assert other_user["question"] == "Question 1?"
+
+
+def test_duplicates_are_stored_once(db_path):
+    async def scenario(bank, repository):
+        first = await repository.add_questions("science", [_question(1), _question(2)])
+        second = await repository.add_questions("science", [_question(2), _question(3)])
+        return first, second, await repository.count_stock("science")
+
+    first, second, stock = asyncio.run(_with_bank(db_path, scenario))
+    assert second[0] == first[1]
+    assert stock == 3
+
+
+def test_live_question_does_not_skip_unseen_bank_questions(db_path):
+    async def scenario(bank, repository):
+        await repository.add_questions("science", [_question(1)])
+        # While the user waits for a live question, a refill stores another one
+        await repository.add_questions("science", [_question(2)])
+        await bank.add_served_question(1, "science", _question(3))
+        return [await bank.next_question(1, "science") for _ in range(3)]
+
+    served = asyncio.run(_with_bank(db_path, scenario))
+    assert [item["question"] if item else None for item in served] == ["Question 1?", "Question 2?", None]
+
+
+def test_seen_question_below_watermark_is_not_recorded(db_path):
+    async def scenario(bank, repository):
+        [question_id] = await repository.add_questions("science", [_question(1)])
+        await bank.next_question(1, "science")
+        await repository.mark_seen(1, "science", question_id)
+
+    asyncio.run(_with_bank(db_path, scenario))
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM quiz_seen").fetchone()[0] == 0
+
+
+def test_top_up_stores_generated_questions(db_path):
+    async def scenario(bank, repository):
+        needed = await bank.needs_top_up("science")
+        added = await bank.top_up("science")
+        return needed, added, await bank.needs_top_up("science"), await repository.count_stock("science")
+
+    needed, added, still_needed, stock = asyncio.run(_with_bank(db_path, scenario, reply=_reply(1, 2, 3)))
+    assert needed and not still_needed
+    assert added == stock == 3
+
+
+def test_top_up_failure_is_not_raised(db_path):
+    async def scenario(bank, repository):
+        return await bank.top_up("science"), await repository.count_stock("science")
+
+    assert asyncio.run(_with_bank(db_path, scenario, reply=None)) == (0, 0)
@@ -0,0 +1,154 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from db.pool import ConnectionPool
+from db.repository import GptThreadRepository
+
+
+def _stored_contents(db_path) -> list[str]:
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT content FROM gpt_messages ORDER BY id")]
+
+
+async def _with_repository(db_path, scenario, **kwargs):
+    pool = ConnectionPool(db_path)
+    repository = GptThreadRepository(pool, **kwargs)
+    try:
+        return await scenario(repository)
+    finally:
+        await repository.close()
+        await pool.close()
+
+
+def test_synchronous_mode_writes_each_message_immediately(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        await repository.add_message("thread_1", "user", "hello")
+        # No flush: the row is already committed
+        return _stored_contents(db_path)
+
+    assert asyncio.run(_with_repository(db_path, scenario, synchronous=True)) == ["hello"]
+
+
+def test_synchronous_mode_raises_on_unknown_thread(db_path):
+    async def scenario(repository):
+        await repository.add_message("missing", "user", "hello")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        asyncio.run(_with_repository(db_path, scenario, synchronous=True))
+
+
+def test_messages_are_buffered_until_flush(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        await repository.add_message("thread_1", "user", "first")
+        await repository.add_message("thread_1", "assistant", "second")
+        before = _stored_contents(db_path)
+        await repository.flush()
+        return before, _stored_contents(db_path)
+
+    before, after = asyncio.run(_with_repository(db_path, scenario, flush_interval_ms=60_000))
+    assert before == []
+    assert after == ["first", "second"]
+
+
+def test_reads_flush_the_buffer_first(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        await repository.add_message("thread_1", "user", "hello")
+        return await repository.get_messages("thread_1")
+
+    messages = asyncio.run(_with_repository(db_path, scenario, flush_interval_ms=60_000))
+    assert messages == [{"role": "user", "content": "hello"}]
+
+
+def test_buffer_is_flushed_by_the_timer(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        await repository.add_message("thread_1", "user", "hello")
+        await asyncio.sleep(0.2)
+        return _stored_contents(db_path)
+
+    assert asyncio.run(_with_repository(db_path, scenario, flush_interval_ms=10)) == ["hello"]
+
+
+def test_full_batch_is_flushed_without_waiting(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        for i in range(3):
+            await repository.add_message("thread_1", "user", f"message {i}")
+        await asyncio.sleep(0.05)
+        return _stored_contents(db_path)
+
+    stored = asyncio.run(_with_repository(db_path, scenario, batch_size=3, flush_interval_ms=60_000))
+    assert stored == ["message 0", "message 1", "message 2"]
+
+
+def test_rejected_batch_falls_back_to_single_inserts(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        await repository.add_message("thread_1", "user", "kept before")
+        # The thread does not exist, so the foreign key rejects the whole batch
+        await repository.add_message("deleted_thread", "user", "dropped")
+        await repository.add_message("thread_1", "assistant", "kept after")
+        await repository.flush()
+        return _stored_contents(db_path)
+
+    stored = asyncio.run(_with_repository(db_path, scenario, flush_interval_ms=60_000))
+    assert stored == ["kept before", "kept after"]
+
+
+def test_close_flushes_the_buffer(db_path):
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        await repository.add_message("thread_1", "user", "hello")
+
+    asyncio.run(_with_repository(db_path, scenario, flush_interval_ms=60_000))
+    assert _stored_contents(db_path) == ["hello"]
+
+
+def test_concurrent_first_use_creates_one_thread(db_path):
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return f"thread_{len(calls)}"
+
+    async def scenario(repository):
+        return await asyncio.gather(*(repository.get_or_create_thread(1, "gpt", factory) for _ in range(5)))
+
+    assert asyncio.run(_with_repository(db_path, scenario)) == ["thread_1"] * 5
+    assert len(calls) == 1
+
+
+def test_existing_thread_is_reused(db_path):
+    async def factory():
+        raise AssertionError("the thread already exists")
+
+    async def scenario(repository):
+        await repository.create_thread(1, "gpt", "thread_1")
+        return await repository.get_or_create_thread(1, "gpt", factory)
+
+    assert asyncio.run(_with_repository(db_path, scenario)) == "thread_1"
+
+
+def test_cached_thread_needs_no_database(db_path):
+    class _ClosedPool:
+        def acquire(self):
+            raise AssertionError("the session cache should answer")
+
+    async def factory():
+        return "thread_1"
+
+    async def scenario(repository):
+        await repository.get_or_create_thread(1, "gpt", factory)
+        pool, repository._pool = repository._pool, _ClosedPool()
+        try:
+            return await repository.get_or_create_thread(1, "gpt", factory)
+        finally:
+            repository._pool = pool
+
+    assert asyncio.run(_with_repository(db_path, scenario)) == "thread_1"
@@ -0,0 +1,83 @@
+import asyncio
+
+from services.chatgpt.scheduler import RequestMergedError, ThreadScheduler
+
+
+def test_idle_thread_runs_message_alone():
+    async def scenario():
+        scheduler = ThreadScheduler()
+        async with scheduler.slot("thread_1", "hello") as batch:
+            assert scheduler.is_busy("thread_1")
+        return batch, scheduler.is_busy("thread_1")
+
+    batch, busy = asyncio.run(scenario())
+    assert batch == ["hello"]
+    assert not busy
+
+
+def test_messages_queued_during_a_run_are_merged_into_the_last_caller():
+    async def scenario():
+        scheduler = ThreadScheduler()
+        release = asyncio.Event()
+        batches = {}
+
+        async def request(name: str):
+            async with scheduler.slot("thread_1", name) as batch:
+                batches[name] = batch
+                if name == "first":
+                    await release.wait()
+
+        first = asyncio.create_task(request("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(request("second"))
+        third = asyncio.create_task(request("third"))
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(first, second, third, return_exceptions=True)
+        return batches, results, scheduler.is_busy("thread_1")
+
+    batches, (first, second, third), busy = asyncio.run(scenario())
+    assert batches == {"first": ["first"], "third": ["second", "third"]}
+    assert first is None and third is None
+    assert isinstance(second, RequestMergedError)
+    assert not busy
+
+
+def test_threads_are_scheduled_independently():
+    async def scenario():
+        scheduler = ThreadScheduler()
+        async with scheduler.slot("thread_1", "a"):
+            async with scheduler.slot("thread_2", "b") as batch:
+                return batch
+
+    assert asyncio.run(scenario()) == ["b"]
+
+
+def test_cancelled_waiter_is_not_merged():
+    async def scenario():
+        scheduler = ThreadScheduler()
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("thread_1", "first"):
+                await release.wait()
+
+        async def wait(message: str):
+            async with scheduler.slot("thread_1", message) as batch:
+                return batch
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(wait("cancelled"))
+        last = asyncio.create_task(wait("last"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await holder
+        return await last, cancelled.cancelled()
+
+    batch, was_cancelled = asyncio.run(scenario())
+    assert was_cancelled
+    assert batch == ["last"]
@@ -0,0 +1,124 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from db.compression import MessageCodec
+from db.initializer import DatabaseInitializer
+from db.pool import ConnectionPool
+from db.rebalance import rebalance_shards
+from db.repository import GptThreadRepository
+from db.sharding import ShardedGptThreadRepository, jump_hash, shard_for_user, shard_paths
+
+_USERS = range(1, 41)
+
+
+def _sessions(path: Path) -> dict[int, str]:
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute("SELECT tg_user_id, openai_thread_id FROM gpt_sessions"))
+
+
+def _message_count(path: Path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM gpt_messages").fetchone()[0]
+
+
+async def _with_sharded_repository(db_path: Path, shards: int, scenario):
+    pools = [ConnectionPool(path, codec=MessageCodec(path)) for path in shard_paths(db_path, shards)]
+    repository = ShardedGptThreadRepository([GptThreadRepository(pool, synchronous=True) for pool in pools])
+    try:
+        return await scenario(repository)
+    finally:
+        await repository.close()
+        for pool in pools:
+            await pool.close()
+
+
+async def _store_history(repository) -> None:
+    for user in _USERS:
+        await repository.create_thread(user, "gpt", f"thread_{user}")
+        await repository.add_message(f"thread_{user}", "user", f"question of user {user}")
+        await repository.add_message(f"thread_{user}", "assistant", f"answer for user {user} " * 30)
+
+
+def test_jump_hash_only_moves_keys_to_the_new_bucket():
+    for buckets in range(1, 10):
+        for key in range(500):
+            before, after = jump_hash(key, buckets), jump_hash(key, buckets + 1)
+            assert 0 <= before < buckets
+            assert after in (before, buckets)
+
+
+def test_shard_paths_keep_the_main_database_first(tmp_path):
+    db_path = tmp_path / "chat_sessions.db"
+    assert shard_paths(db_path, 1) == [db_path]
+    assert shard_paths(db_path, 3) == [
+        db_path, tmp_path / "chat_sessions.1.db", tmp_path / "chat_sessions.2.db"
+    ]
+
+
+def test_threads_are_stored_in_the_shard_of_their_user(tmp_path):
+    db_path = tmp_path / "chat_sessions.db"
+    DatabaseInitializer(db_path, shards=3).migrate()
+
+    asyncio.run(_with_sharded_repository(db_path, 3, _store_history))
+
+    assert {shard_for_user(user, 3) for user in _USERS} == {0, 1, 2}
+    for index, path in enumerate(shard_paths(db_path, 3)):
+        users = set(_sessions(path))
+        assert users == {user for user in _USERS if shard_for_user(user, 3) == index}
+        assert _message_count(path) == 2 * len(users)
+
+
+def test_unknown_threads_are_looked_up_in_every_shard(tmp_path):
+    db_path = tmp_path / "chat_sessions.db"
+    DatabaseInitializer(db_path, shards=3).migrate()
+
+    async def scenario(repository):
+        # A fresh repository knows no thread yet
+        return [await repository.get_messages(f"thread_{user}") for user in _USERS]
+
+    asyncio.run(_with_sharded_repository(db_path, 3, _store_history))
+    histories = asyncio.run(_with_sharded_repository(db_path, 3, scenario))
+    assert [history[0]["content"] for history in histories] == [f"question of user {user}" for user in _USERS]
+
+    async def missing(repository):
+        await repository.get_messages("thread_missing")
+
+    with pytest.raises(ValueError):
+        asyncio.run(_with_sharded_repository(db_path, 3, missing))
+
+
+def test_rebalance_moves_users_to_their_new_shard(tmp_path):
+    db_path = tmp_path / "chat_sessions.db"
+    DatabaseInitializer(db_path).migrate()
+    asyncio.run(_with_sharded_repository(db_path, 1, _store_history))
+
+    moved = rebalance_shards(db_path, 1, 3, batch_size=7)
+    assert moved == sum(1 for user in _USERS if shard_for_user(user, 3) != 0)
+    # A second run finds everything in place
+    assert rebalance_shards(db_path, 1, 3) == 0
+
+    for index, path in enumerate(shard_paths(db_path, 3)):
+        assert set(_sessions(path)) == {user for user in _USERS if shard_for_user(user, 3) == index}
+
+    async def scenario(repository):
+        return [await repository.get_messages(f"thread_{user}") for user in _USERS]
+
+    histories = asyncio.run(_with_sharded_repository(db_path, 3, scenario))
+    assert [[message["content"] for message in history] for history in histories] == [
+        [f"question of user {user}", f"answer for user {user} " * 30] for user in _USERS
+    ]
+
+
+def test_rebalance_back_to_one_shard(tmp_path):
+    db_path = tmp_path / "chat_sessions.db"
+    DatabaseInitializer(db_path, shards=3).migrate()
+    asyncio.run(_with_sharded_repository(db_path, 3, _store_history))
+
+    rebalance_shards(db_path, 3, 1)
+
+    assert set(_sessions(db_path)) == set(_USERS)
+    assert _message_count(db_path) == 2 * len(_USERS)
+    assert [_message_count(path) for path in shard_paths(db_path, 3)[1:]] == [0, 0]
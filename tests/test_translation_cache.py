@@ -0,0 +1,112 @@
+import asyncio
+import sqlite3
+
+from db.pool import ConnectionPool
+from db.translation_cache import TranslationCache, prompt_version
+
+
+def _stored(db_path) -> dict[str, tuple[float, int]]:
+    with sqlite3.connect(db_path) as conn:
+        return {
+            key: (last_used_at, hits)
+            for key, last_used_at, hits in conn.execute("SELECT key, last_used_at, hits FROM translation_cache")
+        }
+
+
+async def _with_cache(db_path, scenario, **kwargs):
+    pool = ConnectionPool(db_path)
+    kwargs.setdefault("prompt", lambda: "Translate the text.")
+    try:
+        return await scenario(TranslationCache(pool, **kwargs))
+    finally:
+        await pool.close()
+
+
+def test_key_ignores_surrounding_whitespace_but_keeps_line_breaks(db_path):
+    async def scenario(cache):
+        return (
+            cache.make_key("  Hello  \n", "EN", "asst"),
+            cache.make_key("Hello", "en", "asst"),
+            cache.make_key("Hel\nlo", "en", "asst"),
+        )
+
+    stripped, plain, broken = asyncio.run(_with_cache(db_path, scenario))
+    assert stripped == plain
+    assert broken != plain
+
+
+def test_edited_prompt_changes_the_key(db_path):
+    prompts = ["Translate the text."]
+
+    async def scenario(cache):
+        before = cache.make_key("Hello", "en", "asst")
+        prompts[0] = "Translate the text formally."
+        return before, cache.make_key("Hello", "en", "asst")
+
+    before, after = asyncio.run(_with_cache(db_path, scenario, prompt=lambda: prompts[0]))
+    assert before != after
+    assert prompt_version("a") != prompt_version("b")
+
+
+def test_put_then_get_from_memory_and_from_sqlite(db_path):
+    async def scenario(cache):
+        key = cache.make_key("Hello", "en", "asst")
+        missing = await cache.get(key)
+        await cache.put(key, "en", "Hallo")
+        from_memory = await cache.get(key)
+        # A fresh instance only has the SQLite table
+        fresh = TranslationCache(cache._pool, prompt=lambda: "Translate the text.")
+        from_db = await fresh.get(key)
+        return missing, from_memory, from_db, cache.memory_hits, fresh.db_hits
+
+    assert asyncio.run(_with_cache(db_path, scenario)) == (None, "Hallo", "Hallo", 1, 1)
+
+
+def test_expired_entries_are_not_served(db_path):
+    async def scenario(cache):
+        key = cache.make_key("Hello", "en", "asst")
+        await cache.put(key, "en", "Hallo")
+        return await cache.get(key)
+
+    assert asyncio.run(_with_cache(db_path, scenario, ttl_s=0)) is None
+
+
+def test_lookups_do_not_write_until_flushed(db_path):
+    async def scenario(cache):
+        key = cache.make_key("Hello", "en", "asst")
+        await cache.put(key, "en", "Hallo")
+        await cache.get(key)
+        await cache.get(key)
+        before = _stored(db_path)[key][1]
+        await cache.flush_usage()
+        return before, _stored(db_path)[key][1]
+
+    assert asyncio.run(_with_cache(db_path, scenario)) == (0, 2)
+
+
+def test_usage_is_written_once_the_batch_is_full(db_path):
+    async def scenario(cache):
+        keys = [cache.make_key(text, "en", "asst") for text in ("one", "two")]
+        for key in keys:
+            await cache.put(key, "en", "x")
+        await cache.get(keys[0])
+        pending = _stored(db_path)[keys[0]][1]
+        await cache.get(keys[1])
+        stored = _stored(db_path)
+        return pending, stored[keys[0]][1], stored[keys[1]][1]
+
+    assert asyncio.run(_with_cache(db_path, scenario, usage_batch_size=2)) == (0, 1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(db_path):
+    async def scenario(cache):
+        keys = [cache.make_key(text, "en", "asst") for text in ("one", "two", "three")]
+        await cache.put(keys[0], "en", "aaaa")
+        await cache.put(keys[1], "en", "bbbb")
+        # Using the first entry makes the second one the least recently used
+        await cache.get(keys[0])
+        await cache.put(keys[2], "en", "cccc")
+        return keys, set(_stored(db_path))
+
+    keys, stored = asyncio.run(_with_cache(db_path, scenario, max_bytes=8))
+    assert stored == {keys[0], keys[2]}